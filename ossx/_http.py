@@ -1,5 +1,6 @@
 import asyncio
 import base64
+import collections
 import logging
 from typing import Any, AsyncIterator, Callable, Coroutine, Optional
 
@@ -21,8 +22,11 @@ class Session:
         adapter: Optional[AsyncBaseTransport] = None,
         timeout: float = defaults.connect_timeout,
         proxies: Optional[dict] = None,
+        chunk_size: Optional[int] = None,
     ):
+        self.chunk_size = chunk_size
         psize = pool_size or defaults.connection_pool_size
+        self.pool_size = psize
         limits = httpx.Limits(max_connections=psize, max_keepalive_connections=psize)
         if adapter is None:
             adapter = httpx.AsyncHTTPTransport(limits=limits)
@@ -52,7 +56,7 @@ class Session:
             async def co():
                 return await self.session.send(request=request, stream=True)
 
-            return AwaitResponse(co)
+            return AwaitResponse(co, self.chunk_size)
         except httpx.HTTPError as err:
             raise exceptions.RequestError(err)
 
@@ -106,16 +110,31 @@ _CHUNK_SIZE = 8 * 1024
 
 
 class AwaitResponse(object):
-    def __init__(self, response: Callable[..., Coroutine[Any, Any, httpx.Response]]):
+    """httpx流式响应的封装，await之后可以得到状态码和头部，再通过 `read` 、 `readinto` 或者异步迭代读取响应体。
+
+    从网络收到的数据按收到时的大小保存在一个块列表中，读取时只复制取走的部分，剩余的数据不会被移动。
+
+    :param response: 发送请求并返回 `httpx.Response` 的协程函数
+    :param int chunk_size: 异步迭代时每次返回的字节数，默认为8KiB
+    """
+
+    def __init__(
+        self,
+        response: Callable[..., Coroutine[Any, Any, httpx.Response]],
+        chunk_size: Optional[int] = None,
+    ):
         self._co = response
         self.response = None
         self.status = 0
         self.headers = {}
         self.request_id = ""
+        self.chunk_size = chunk_size or _CHUNK_SIZE
 
-        self.__all_read = False
-        self.__iter = None
-        self.chunker = bytearray()
+        self.__stream = None
+        self.__eof = False
+        self.__chunks = collections.deque()
+        self.__offset = 0
+        self.__buffered = 0
 
     def __iter__(self):
         return self
@@ -150,43 +169,96 @@ class AwaitResponse(object):
         )
         return self
 
-    async def read(self, amt: Optional[int] = None):
-        if self.__all_read:
-            return b""
-
-        if amt is None:
-            content_list = [bytes(self.chunker)]
-            async for chunk in self._iter:
-                content_list.append(chunk)
-            content = b"".join(content_list)
-            self.chunker = bytearray()
-            self.__all_read = True
-            return content
-        else:
-            while len(self.chunker) <= amt:
-                try:
-                    self.chunker.extend(await self._iter.__anext__())
-                except StopAsyncIteration:
-                    break
-
-            chunk = bytes(self.chunker[:amt])
-            del self.chunker[:amt]
-
-            if not self.chunker:
-                self.__all_read = True
-            return chunk
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        """读取最多 `amt` 个字节，不指定 `amt` 时读取剩余的全部内容，读到末尾时返回空bytes。"""
+        if amt is None or amt < 0:
+            while await self.__fill():
+                pass
+            return self.__take(self.__buffered)
+
+        while self.__buffered < amt and await self.__fill():
+            pass
+        return self.__take(min(amt, self.__buffered))
+
+    async def readinto(self, b) -> int:
+        """读取数据直接填充 `b` ，返回读取的字节数，读到末尾时返回0。
+
+        `b` 可以是bytearray、mmap、numpy数组等任何可写的缓冲区。除非读到末尾，总是填满 `b` ；
+        从网络收到的数据只复制一次，放不下的部分留给下一次读取。
+        """
+        view = memoryview(b).cast("B")
+        n = 0
+        while n < len(view):
+            if not self.__buffered and not await self.__fill():
+                break
+
+            chunk = self.__chunks[0]
+            size = min(len(chunk) - self.__offset, len(view) - n)
+            view[n : n + size] = memoryview(chunk)[self.__offset : self.__offset + size]
+            self.__consume(size)
+            n += size
+
+        return n
+
+    async def iter_chunks(self, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """异步迭代响应体，除最后一块外每次返回 `chunk_size` 个字节，默认为 `self.chunk_size` 。
+
+        下载大文件时可以使用更大的 `chunk_size` （比如1MiB），减少每一块的额外开销。
+        """
+        chunk_size = chunk_size or self.chunk_size
+        while True:
+            chunk = await self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
 
     async def close(self):
         await self.response.aclose()
 
-    @property
-    def _iter(self):
-        if self.__iter is None:
-            self.__iter = self.__aiter__()
-        return self.__iter
+    async def __fill(self) -> bool:
+        """从网络读取下一块数据放入缓冲区，响应体已经读完时返回False。"""
+        if self.__eof:
+            return False
+
+        if self.__stream is None:
+            self.__stream = self.response.aiter_bytes()
+        try:
+            chunk = await self.__stream.__anext__()
+        except StopAsyncIteration:
+            self.__eof = True
+            return False
+
+        if chunk:
+            self.__chunks.append(chunk)
+            self.__buffered += len(chunk)
+        return True
+
+    def __take(self, n: int) -> bytes:
+        """从缓冲区取走 `n` 个字节，取走的恰好是一整块时不复制。"""
+        parts = []
+        while n > 0:
+            chunk = self.__chunks[0]
+            size = min(len(chunk) - self.__offset, n)
+            if size == len(chunk):
+                parts.append(chunk)
+            else:
+                parts.append(memoryview(chunk)[self.__offset : self.__offset + size])
+            self.__consume(size)
+            n -= size
+
+        if len(parts) == 1 and isinstance(parts[0], bytes):
+            return parts[0]
+        return b"".join(parts)
+
+    def __consume(self, size: int):
+        self.__offset += size
+        self.__buffered -= size
+        if self.__offset == len(self.__chunks[0]):
+            self.__chunks.popleft()
+            self.__offset = 0
 
     def __aiter__(self) -> AsyncIterator[bytes]:
-        return self.response.aiter_bytes(_CHUNK_SIZE)
+        return self.iter_chunks()
 
     async def __aenter__(self):
         return self
@@ -1,8 +1,11 @@
 import types
+from contextlib import contextmanager
 from pathlib import Path
 from typing import (
     IO,
+    TYPE_CHECKING,
     Any,
+    AsyncIterator,
     Callable,
     Dict,
     List,
@@ -15,6 +18,7 @@ from typing import (
 )
 
 import aiofiles
+import httpx
 from oss2 import Auth, Bucket, Service, compat, exceptions, utils, xml_utils
 from oss2.api import _Base, _make_range_string, logger
 from oss2.exceptions import ClientError
@@ -22,7 +26,13 @@ from oss2.select_params import SelectParameters
 
 from . import _http as http
 from . import models
+from .cache import BlockCache, MetadataCache, ObjectCache, _make_get_object_result
 from .utils import async_copyfileobj, warp_async_data
+from .xml_stream import ListObjectsParser
+
+if TYPE_CHECKING:
+    from .object_file import AsyncObjectFile
+    from .transfer import FileTransferResult, SyncAction
 
 T = TypeVar("T")
 ObjectPermission = Literal["default", "private", "public-read", "public-read-write"]
@@ -39,11 +49,34 @@ async def _async_parse_result(
 ) -> T:
     resp = await co
     result = klass(resp)
+    if parse_func in _INCREMENTAL_PARSE_FUNCS:
+        await _async_parse_list_objects(resp, result)
+        return result
+
     data = await resp.read()
     parse_func(result, data)
     return result
 
 
+#: 这些响应可能有几百KB，边接收边解析，参见 :class:`ossx.xml_stream.ListObjectsParser`
+_INCREMENTAL_PARSE_FUNCS = (xml_utils.parse_list_objects, xml_utils.parse_list_objects_v2)
+
+
+async def _async_parse_list_objects(resp: http.AwaitResponse, result):
+    parser = ListObjectsParser(result)
+
+    def add(entries):
+        for entry in entries:
+            if entry.is_prefix():
+                result.prefix_list.append(entry.key)
+            else:
+                result.object_list.append(entry)
+
+    async for chunk in resp:
+        add(parser.feed(chunk))
+    add(parser.close())
+
+
 class _AsyncBase(_Base):
     def _async_do(self, method, bucket_name, key, **kwargs):
         key = compat.to_string(key)
@@ -238,6 +271,9 @@ class AsyncBucket(Bucket, _AsyncBase):
         cloudbox_id: Optional[str] = None,
         is_path_style: bool = False,
         is_verify_object_strict: bool = True,
+        meta_cache: Optional[MetadataCache] = None,
+        object_cache: Optional[ObjectCache] = None,
+        block_cache: Optional[BlockCache] = None,
     ):
         super().__init__(
             auth,
@@ -257,6 +293,13 @@ class AsyncBucket(Bucket, _AsyncBase):
         if session is None:
             self.session = http.Session(timeout=self.timeout, proxies=proxies)
 
+        #: 文件元信息的缓存，参见 :class:`ossx.cache.MetadataCache` ，为None时不缓存。
+        self.meta_cache = meta_cache
+        #: 文件内容的磁盘缓存，参见 :class:`ossx.cache.ObjectCache` ，为None时不缓存。
+        self.object_cache = object_cache
+        #: 范围读取的内存块缓存，参见 :class:`ossx.cache.BlockCache` ，为None时不缓存。
+        self.block_cache = block_cache
+
     _do = _AsyncBase._async_do
     _do_url = _AsyncBase._async_do_url
     _parse_result = staticmethod(_async_parse_result)
@@ -293,6 +336,56 @@ class AsyncBucket(Bucket, _AsyncBase):
             headers,
         )
 
+    async def list_objects_stream(
+        self,
+        prefix: str = "",
+        delimiter: str = "",
+        marker: str = "",
+        max_keys: int = 100,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> models.ListObjectsStreamResult:
+        """同 :meth:`list_objects` ，但是返回的结果需要异步迭代，边接收响应边返回文件和公共前缀。"""
+        resp = await self.__do_bucket(
+            "GET",
+            params={
+                "prefix": prefix,
+                "delimiter": delimiter,
+                "marker": marker,
+                "max-keys": str(max_keys),
+                "encoding-type": "url",
+            },
+            headers=http.CaseInsensitiveDict(headers),
+        )
+        return models.ListObjectsStreamResult(resp)
+
+    async def list_objects_v2_stream(
+        self,
+        prefix: str = "",
+        delimiter: str = "",
+        continuation_token: str = "",
+        start_after: str = "",
+        fetch_owner: bool = False,
+        encoding_type: str = "url",
+        max_keys: int = 100,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> models.ListObjectsV2StreamResult:
+        """同 :meth:`list_objects_v2` ，但是返回的结果需要异步迭代，边接收响应边返回文件和公共前缀。"""
+        resp = await self.__do_bucket(
+            "GET",
+            params={
+                "list-type": "2",
+                "prefix": prefix,
+                "delimiter": delimiter,
+                "continuation-token": continuation_token,
+                "start-after": start_after,
+                "fetch-owner": str(fetch_owner).lower(),
+                "max-keys": str(max_keys),
+                "encoding-type": encoding_type,
+            },
+            headers=http.CaseInsensitiveDict(headers),
+        )
+        return models.ListObjectsV2StreamResult(resp)
+
     async def put_object(
         self,
         key: str,
@@ -302,7 +395,8 @@ class AsyncBucket(Bucket, _AsyncBase):
     ) -> models.PutObjectResult:
         data = warp_async_data(data)
         result = super().put_object(key, data, headers, progress_callback)
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         return models.PutObjectResult(resp)
 
     async def put_object_from_file(
@@ -323,6 +417,86 @@ class AsyncBucket(Bucket, _AsyncBase):
                 key, f, headers=headers, progress_callback=progress_callback
             )
 
+    def upload_directory(
+        self,
+        local_dir: Union[str, Path],
+        prefix: str = "",
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        multipart_threshold: Optional[int] = None,
+        part_size: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator["FileTransferResult"]:
+        """并发上传本地目录，逐个返回每个文件的上传结果，参见 :func:`ossx.transfer.upload_directory` 。"""
+        from .transfer import upload_directory
+
+        return upload_directory(
+            self,
+            local_dir,
+            prefix,
+            headers=headers,
+            multipart_threshold=multipart_threshold,
+            part_size=part_size,
+            num_threads=num_threads,
+            params=params,
+        )
+
+    def download_directory(
+        self,
+        prefix: str,
+        local_dir: Union[str, Path],
+        multiget_threshold: Optional[int] = None,
+        part_size: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        check_crc: bool = False,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> AsyncIterator["FileTransferResult"]:
+        """并发下载前缀下的文件到本地目录，逐个返回每个文件的下载结果，参见 :func:`ossx.transfer.download_directory` 。"""
+        from .transfer import download_directory
+
+        return download_directory(
+            self,
+            prefix,
+            local_dir,
+            multiget_threshold=multiget_threshold,
+            part_size=part_size,
+            num_threads=num_threads,
+            check_crc=check_crc,
+            headers=headers,
+        )
+
+    def sync_directory(
+        self,
+        local_dir: Union[str, Path],
+        prefix: str,
+        direction: Literal["upload", "download"] = "upload",
+        delete: bool = False,
+        dry_run: bool = False,
+        check_crc: bool = False,
+        num_threads: Optional[int] = None,
+        multipart_threshold: Optional[int] = None,
+        multiget_threshold: Optional[int] = None,
+        part_size: Optional[int] = None,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> AsyncIterator[Union["SyncAction", "FileTransferResult"]]:
+        """同步本地目录和前缀，只传输有差异的文件，参见 :func:`ossx.transfer.sync_directory` 。"""
+        from .transfer import sync_directory
+
+        return sync_directory(
+            self,
+            local_dir,
+            prefix,
+            direction=direction,
+            delete=delete,
+            dry_run=dry_run,
+            check_crc=check_crc,
+            num_threads=num_threads,
+            multipart_threshold=multipart_threshold,
+            multiget_threshold=multiget_threshold,
+            part_size=part_size,
+            headers=headers,
+        )
+
     async def put_object_with_url(
         self,
         sign_url: str,
@@ -363,7 +537,8 @@ class AsyncBucket(Bucket, _AsyncBase):
     ) -> models.AppendObjectResult:
         data = warp_async_data(data)
         result = super().append_object(key, position, data, headers, progress_callback, init_crc)
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         return models.AppendObjectResult(resp)
 
     async def get_object(
@@ -374,6 +549,27 @@ class AsyncBucket(Bucket, _AsyncBase):
         progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
         process: Optional[str] = None,
         params: Optional[Dict[str, Any]] = None,
+    ):
+        if self.object_cache is not None and not (byte_range or headers or process or params):
+            return await self.__get_cached_object(key, progress_callback)
+        if self.block_cache is not None and byte_range and not (headers or process or params):
+            start, end = byte_range
+            if start is not None and end is not None and 0 <= start <= end:
+                cached = await self.block_cache.get_range(
+                    self.bucket_name, key, start, end, self.__get_object
+                )
+                if cached is not None:
+                    return await _make_get_object_result(
+                        206,
+                        cached[0],
+                        httpx.ByteStream(cached[1]),
+                        progress_callback,
+                        self.enable_crc,
+                    )
+        return await self.__get_object(key, byte_range, headers, progress_callback, process, params)
+
+    async def __get_object(
+        self, key, byte_range=None, headers=None, progress_callback=None, process=None, params=None
     ):
         enable_crc = self.enable_crc
         self.enable_crc = False
@@ -383,6 +579,23 @@ class AsyncBucket(Bucket, _AsyncBase):
 
         return models.GetObjectResult(resp, progress_callback, self.enable_crc)
 
+    async def __get_cached_object(self, key, progress_callback):
+        cache = self.object_cache
+        async with cache.lock(self.bucket_name, key):
+            entry = await cache.lookup(self.bucket_name, key)
+            headers = {}
+            if entry is not None:
+                headers["If-None-Match"] = entry["etag"]
+
+            try:
+                result = await self.__get_object(key, headers=headers)
+            except exceptions.NotModified as e:
+                logger.debug("Object not modified, serve from cache, key: {0}".format(key))
+                return await cache.open(entry, e.headers, progress_callback, self.enable_crc)
+
+            entry = await cache.store(self.bucket_name, key, result, self.enable_crc)
+            return await cache.open(entry, None, progress_callback, self.enable_crc)
+
     async def select_object(
         self,
         key: str,
@@ -423,7 +636,76 @@ class AsyncBucket(Bucket, _AsyncBase):
         if select_params is not None and SelectParameters.EnablePayloadCrc in select_params:
             if str(select_params[SelectParameters.EnablePayloadCrc]).lower() == "true":
                 crc_enabled = True
-        return models.SelectObjectResult(resp, progress_callback, crc_enabled)
+        return models.SelectObjectResult(resp, progress_callback, crc_enabled, select_params)
+
+    def select_object_parallel(
+        self,
+        key: str,
+        sql: str,
+        select_params: Optional[Dict[str, Any]] = None,
+        num_threads: Optional[int] = None,
+        num_ranges: Optional[int] = None,
+        ordered: bool = True,
+        splits: Optional[int] = None,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> AsyncIterator[bytes]:
+        """把文件按split切分为多段并发查询，返回合并后的结果，参见 :func:`ossx.select_executor.select_object_parallel` 。"""
+        from .select_executor import select_object_parallel
+
+        return select_object_parallel(
+            self,
+            key,
+            sql,
+            select_params,
+            num_threads=num_threads,
+            num_ranges=num_ranges,
+            ordered=ordered,
+            splits=splits,
+            headers=headers,
+        )
+
+    def select_prefix(
+        self,
+        prefix: str,
+        sql: str,
+        select_params: Optional[Dict[str, Any]] = None,
+        num_threads: Optional[int] = None,
+        raw: bool = False,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """并发查询前缀下的所有文件，逐个返回带有文件名的记录，参见 :func:`ossx.select_executor.select_prefix` 。"""
+        from .select_executor import select_prefix
+
+        return select_prefix(
+            self,
+            prefix,
+            sql,
+            select_params,
+            num_threads=num_threads,
+            raw=raw,
+            headers=headers,
+        )
+
+    async def open(
+        self,
+        key: str,
+        min_readahead: int = 256 * 1024,
+        max_readahead: int = 16 * 1024 * 1024,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> "AsyncObjectFile":
+        """以只读、可随机访问的异步文件对象打开文件，参见 :class:`ossx.object_file.AsyncObjectFile` 。"""
+        from .object_file import AsyncObjectFile
+
+        result = await self.head_object(key, headers=headers)
+        return AsyncObjectFile(
+            self,
+            key,
+            result.content_length,
+            result.headers["ETag"],
+            min_readahead=min_readahead,
+            max_readahead=max_readahead,
+            headers=headers,
+        )
 
     async def get_object_to_file(
         self,
@@ -533,7 +815,11 @@ class AsyncBucket(Bucket, _AsyncBase):
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
         params: Optional[Dict[str, Any]] = None,
     ) -> models.HeadObjectResult:
-        return await super().head_object(key, headers)
+        if self.meta_cache is None or headers or params:
+            return await super().head_object(key, headers, params)
+        return await self.meta_cache.fetch(
+            "head_object", self.bucket_name, key, super().head_object, key
+        )
 
     async def create_select_object_meta(self, key, select_meta_params=None, headers=None):
         headers = http.CaseInsensitiveDict(headers)
@@ -553,6 +839,13 @@ class AsyncBucket(Bucket, _AsyncBase):
         params: Optional[Dict[str, Any]] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
     ) -> models.GetObjectMetaResult:
+        if self.meta_cache is None or headers or params:
+            return await self.__get_object_meta(key, params, headers)
+        return await self.meta_cache.fetch(
+            "get_object_meta", self.bucket_name, key, self.__get_object_meta, key
+        )
+
+    async def __get_object_meta(self, key, params=None, headers=None):
         result = super().get_object_meta(key, params, headers)
         resp = await result.resp
         return models.GetObjectMetaResult(resp)
@@ -582,7 +875,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         params: Optional[Dict[str, Any]] = None,
     ) -> models.PutObjectResult:
         result = super().copy_object(source_bucket_name, source_key, target_key, headers, params)
-        resp = await result.resp
+        with self.__invalidate_meta(target_key):
+            resp = await result.resp
         return models.PutObjectResult(resp)
 
     async def update_object_meta(
@@ -605,7 +899,8 @@ class AsyncBucket(Bucket, _AsyncBase):
                 self.bucket_name, compat.to_string(key)
             )
         )
-        resp = await self.__do_object("DELETE", key, params=params, headers=headers)
+        with self.__invalidate_meta(key):
+            resp = await self.__do_object("DELETE", key, params=params, headers=headers)
         logger.debug(
             "Delete object done, req_id: {0}, status_code: {1}".format(resp.request_id, resp.status)
         )
@@ -619,7 +914,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         input: Optional[models.RestoreConfiguration] = None,
     ) -> models.RequestResult:
         result = super().restore_object(key, params, headers, input)
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         logger.debug(
             "Restore object done, req_id: {0}, status_code: {1}".format(
                 resp.request_id, resp.status
@@ -651,14 +947,30 @@ class AsyncBucket(Bucket, _AsyncBase):
         key_list: List[str],
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
     ) -> models.BatchDeleteObjectsResult:
-        return await super().batch_delete_objects(key_list, headers)
+        with self.__invalidate_meta(*key_list):
+            return await super().batch_delete_objects(key_list, headers)
+
+    async def delete_prefix(
+        self,
+        prefix: str,
+        num_threads: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ) -> int:
+        """并发地批量删除前缀下的所有文件，返回删除的文件数，参见 :func:`ossx.transfer.delete_prefix` 。"""
+        from .transfer import delete_prefix
+
+        return await delete_prefix(
+            self, prefix, num_threads=num_threads, max_retries=max_retries, headers=headers
+        )
 
     async def delete_object_versions(
         self,
         keylist_versions: models.BatchDeleteObjectVersionList,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
     ) -> models.BatchDeleteObjectsResult:
-        return await super().delete_object_versions(keylist_versions, headers)
+        with self.__invalidate_meta(*(v.key for v in keylist_versions.object_version_list)):
+            return await super().delete_object_versions(keylist_versions, headers)
 
     async def init_multipart_upload(
         self,
@@ -693,7 +1005,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         self.enable_crc = False
         result = super().complete_multipart_upload(key, upload_id, parts, headers)
         self.enable_crc = enable_crc
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         return models.PutObjectResult(resp)
 
     async def abort_multipart_upload(
@@ -760,7 +1073,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
     ) -> models.RequestResult:
         result = super().put_symlink(target_key, symlink_key, headers)
-        resp = await result.resp
+        with self.__invalidate_meta(symlink_key):
+            resp = await result.resp
         return models.RequestResult(resp)
 
     async def get_symlink(
@@ -972,7 +1286,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         params: Optional[Dict[str, Any]] = None,
     ) -> models.RequestResult:
         result = super().put_object_tagging(key, tagging, headers, params)
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         return models.RequestResult(resp)
 
     async def get_object_tagging(
@@ -990,7 +1305,8 @@ class AsyncBucket(Bucket, _AsyncBase):
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
     ) -> models.RequestResult:
         result = super().delete_object_tagging(key, params, headers)
-        resp = await result.resp
+        with self.__invalidate_meta(key):
+            resp = await result.resp
         return models.RequestResult(resp)
 
     async def put_bucket_encryption(
@@ -1442,6 +1758,20 @@ class AsyncBucket(Bucket, _AsyncBase):
         resp = await result.resp
         return models.RequestResult(resp)
 
+    @contextmanager
+    def __invalidate_meta(self, *keys):
+        """修改文件后（无论成功与否）使其元信息缓存和块缓存失效。"""
+        try:
+            yield
+        finally:
+            for cache in (self.meta_cache, self.block_cache):
+                if cache is not None:
+                    for key in keys:
+                        cache.invalidate(self.bucket_name, key)
+
+    def __do_bucket(self, method, **kwargs):
+        return self._do(method, self.bucket_name, "", **kwargs)
+
     def __do_object(self, method, key, **kwargs):
         if not self.bucket_name:
             raise exceptions.ClientError("Bucket name should not be null or empty.")
@@ -0,0 +1,570 @@
+"""
+ossx.cache
+~~~~~~~~~~
+
+:class:`AsyncBucket <ossx.AsyncBucket>` 可选的缓存。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Optional, Tuple, Union
+
+import aiofiles
+import aiofiles.os
+import httpx
+from aiofiles.os import wrap
+from oss2 import exceptions, utils
+
+from . import _http as http
+from . import models
+from .utils import async_copyfileobj
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+__all__ = ["MetadataCache", "ObjectCache", "BlockCache"]
+
+
+class MetadataCache(object):
+    """文件元信息的缓存，用于 `head_object` 、 `get_object_meta` 和 `object_exists` 。
+
+    缓存的文件数不超过 `max_size` ，超出时淘汰最久没有使用的文件，每个条目在 `ttl` 秒后过期。
+    文件不存在（ :class:`NotFound <oss2.exceptions.NotFound>` ）的结果也会被缓存 `negative_ttl` 秒，
+    期间再次请求会直接抛出同样的异常。同一个文件同时有多个请求未命中时，只会发出一个请求。
+
+    条目以 (Bucket, 文件名) 为键，多个 `AsyncBucket` 可以共享同一个缓存。通过同一个缓存的 `AsyncBucket`
+    上传、删除、拷贝文件或修改其元信息时，对应的条目会失效；其他客户端的修改只能等到条目过期后才能看到。
+    带有 `headers` 或 `params` 的请求不使用缓存。
+
+    :param int max_size: 最多缓存的文件数
+    :param float ttl: 条目的有效期，单位为秒
+    :param negative_ttl: 文件不存在的结果的有效期，如不指定则和 `ttl` 相同，为0时不缓存。
+    """
+
+    def __init__(
+        self, max_size: int = 10000, ttl: float = 60, negative_ttl: Optional[float] = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+
+        self.__entries = OrderedDict()
+        self.__pending = {}
+        self.__epoch = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    async def fetch(
+        self,
+        kind: str,
+        bucket_name: str,
+        key: str,
+        func: Callable[..., Coroutine[Any, Any, Any]],
+        *args
+    ) -> Any:
+        """返回 `kind` 类请求对 `bucket_name` 中 `key` 的缓存结果，未命中时调用 ``await func(*args)``
+        获取并缓存。"""
+        object_key = (bucket_name, key)
+        kinds = self.__entries.get(object_key)
+        entry = kinds.get(kind) if kinds is not None else None
+        if entry is not None:
+            expires, result, error = entry
+            if expires > time.monotonic():
+                self.__entries.move_to_end(object_key)
+                if error is not None:
+                    raise error
+                return result
+            del kinds[kind]
+
+        cache_key = (kind, object_key)
+        pending = self.__pending.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self.__load(kind, object_key, func, args))
+            self.__pending[cache_key] = pending
+            pending.add_done_callback(lambda f: self.__discard_pending(cache_key, f))
+        return await asyncio.shield(pending)
+
+    def invalidate(self, bucket_name: Optional[str] = None, key: Optional[str] = None):
+        """使 `bucket_name` 中 `key` 的所有条目失效。 `key` 为None时使整个Bucket的条目失效，
+        `bucket_name` 也为None时清空缓存。"""
+        self.__epoch += 1
+        if bucket_name is None:
+            self.__entries.clear()
+            self.__pending.clear()
+            return
+
+        def matches(object_key):
+            return object_key[0] == bucket_name and (key is None or object_key[1] == key)
+
+        for object_key in [k for k in self.__entries if matches(k)]:
+            del self.__entries[object_key]
+        for cache_key in [k for k in self.__pending if matches(k[1])]:
+            del self.__pending[cache_key]
+
+    def __discard_pending(self, cache_key, future):
+        if self.__pending.get(cache_key) is future:
+            del self.__pending[cache_key]
+
+    async def __load(self, kind, object_key, func, args):
+        epoch = self.__epoch
+        try:
+            result = await func(*args)
+        except exceptions.NoSuchBucket:
+            raise
+        except exceptions.NotFound as e:
+            if self.negative_ttl > 0:
+                self.__store(kind, object_key, epoch, self.negative_ttl, None, e)
+            raise
+
+        self.__store(kind, object_key, epoch, self.ttl, result, None)
+        return result
+
+    def __store(self, kind, object_key, epoch, ttl, result, error):
+        # 请求期间有条目失效时，结果可能是修改之前的，不能缓存
+        if epoch != self.__epoch:
+            return
+
+        self.__entries.setdefault(object_key, {})[kind] = (time.monotonic() + ttl, result, error)
+        self.__entries.move_to_end(object_key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+
+class _CachedFileStream(httpx.AsyncByteStream):
+    def __init__(self, f, chunk_size=1024 * 1024):
+        self.f = f
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self.f.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    async def aclose(self):
+        await self.f.close()
+
+
+def _flock(filename):
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _funlock(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _write_json(filename, data):
+    tmp_filename = "{0}.{1}.tmp".format(filename, uuid.uuid4().hex)
+    with open(tmp_filename, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_filename, filename)
+
+
+def _read_json(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def _scan_data_files(root):
+    """返回缓存目录中所有文件内容的 (修改时间, 大小, 文件名) 。"""
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith((".json", ".lock", ".tmp")):
+                continue
+            filename = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filename))
+    return files
+
+
+async def _make_get_object_result(status, headers, stream, progress_callback, enable_crc):
+    """用缓存的头部和内容构造一个 :class:`GetObjectResult <oss2.models.GetObjectResult>` 。"""
+
+    async def co():
+        return httpx.Response(status, headers=headers, stream=stream)
+
+    resp = await http.AwaitResponse(co)
+    return models.GetObjectResult(resp, progress_callback, enable_crc)
+
+
+_async_flock = wrap(_flock)
+_async_funlock = wrap(_funlock)
+_async_write_json = wrap(_write_json)
+_async_read_json = wrap(_read_json)
+_async_remove = wrap(_remove)
+_async_scan_data_files = wrap(_scan_data_files)
+_async_utime = wrap(os.utime)
+_async_replace = wrap(os.replace)
+_async_exists = wrap(os.path.exists)
+
+
+class ObjectCache(object):
+    """文件内容的磁盘缓存，用于不带 `byte_range` 、 `headers` 、 `process` 和 `params` 的
+    `get_object` 与 `get_object_to_file` 。
+
+    每个文件按 (Bucket, 文件名) 保存最近一次下载的内容和响应头部，内容以ETag区分版本。命中缓存时用
+    If-None-Match发送条件请求，OSS返回304时直接从磁盘读取，否则重新下载并替换旧的版本。未命中时会先把整个
+    文件下载到缓存目录（CRC校验失败的内容不会被缓存），再从缓存返回。
+
+    缓存的总大小超过 `max_size` 时，按最近使用时间淘汰。多个进程可以共享同一个 `root` ：写入都是先写临时文件
+    再原子地重命名，同一个文件的下载由文件锁（仅POSIX系统）互斥，其他进程会等待并直接使用下载好的内容。
+
+    :param root: 缓存目录
+    :param int max_size: 缓存的最大字节数
+    """
+
+    def __init__(self, root: Union[str, Path], max_size: int = 10 * 1024 * 1024 * 1024):
+        self.root = str(root)
+        self.max_size = max_size
+
+        self.__locks = weakref.WeakValueDictionary()
+
+    def _path(self, bucket_name, key):
+        digest = hashlib.sha256("{0}\0{1}".format(bucket_name, key).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    @asynccontextmanager
+    async def lock(self, bucket_name: str, key: str):
+        """在进程内以及进程间互斥地操作一个文件的缓存。"""
+        path = self._path(bucket_name, key)
+        lock = self.__locks.get(path)
+        if lock is None:
+            lock = self.__locks[path] = asyncio.Lock()
+
+        async with lock:
+            if fcntl is None:
+                yield
+                return
+
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = await _async_flock(path + ".lock")
+            try:
+                yield
+            finally:
+                await _async_funlock(fd)
+
+    async def lookup(self, bucket_name: str, key: str) -> Optional[dict]:
+        """返回缓存的条目，包括etag、headers和data（内容的文件名），没有缓存时返回None。"""
+        path = self._path(bucket_name, key)
+        entry = await _async_read_json(path + ".json")
+        if entry is None or not await _async_exists(entry["data"]):
+            return None
+        return entry
+
+    async def store(
+        self, bucket_name: str, key: str, result: models.GetObjectResult, enable_crc: bool
+    ) -> dict:
+        """把 `result` 的内容写入缓存，返回新的条目。"""
+        path = self._path(bucket_name, key)
+        etag = result.headers["ETag"]
+        data = "{0}-{1}".format(path, hashlib.md5(etag.encode("utf-8")).hexdigest())
+        tmp_filename = "{0}.{1}.tmp".format(data, uuid.uuid4().hex)
+
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            async with aiofiles.open(tmp_filename, "wb") as f:
+                await async_copyfileobj(
+                    result, f, result.content_length, request_id=result.request_id
+                )
+            if enable_crc:
+                utils.check_crc("get", result.client_crc, result.server_crc, result.request_id)
+            await _async_replace(tmp_filename, data)
+        except BaseException:
+            await _async_remove(tmp_filename)
+            raise
+
+        old_entry = await _async_read_json(path + ".json")
+        entry = {"etag": etag, "headers": dict(result.headers), "data": data}
+        await _async_write_json(path + ".json", entry)
+        if old_entry is not None and old_entry["data"] != data:
+            await _async_remove(old_entry["data"])
+
+        await self.evict(keep=data)
+        return entry
+
+    async def open(
+        self,
+        entry: dict,
+        headers=None,
+        progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
+        enable_crc: bool = False,
+    ) -> models.GetObjectResult:
+        """返回读取缓存内容的 :class:`GetObjectResult <oss2.models.GetObjectResult>` 。
+
+        :param headers: 304响应的头部，会覆盖缓存的头部，比如x-oss-request-id
+        """
+        f = await aiofiles.open(entry["data"], "rb")
+        await _async_utime(entry["data"])
+
+        response_headers = http.CaseInsensitiveDict(entry["headers"])
+        for name, value in (headers or {}).items():
+            if name.lower() not in ("content-length", "content-type", "content-encoding"):
+                response_headers[name] = value
+
+        return await _make_get_object_result(
+            200, response_headers, _CachedFileStream(f), progress_callback, enable_crc
+        )
+
+    async def evict(self, keep: Optional[str] = None):
+        """按最近使用时间淘汰缓存，直到总大小不超过 `max_size` ， `keep` 不会被淘汰。"""
+        files = sorted(await _async_scan_data_files(self.root))
+        total = sum(size for _, size, _ in files)
+        for _, size, filename in files:
+            if total <= self.max_size:
+                break
+            if filename == keep:
+                continue
+            await _async_remove(filename)
+            total -= size
+
+
+class _CachedObject(object):
+    def __init__(self, etag, size, headers):
+        self.etag = etag
+        self.size = size
+        self.headers = headers
+        self.blocks = set()
+        self.validated = time.monotonic()
+
+
+class BlockCache(object):
+    """文件部分内容的内存缓存，用于带 `byte_range` 、不带 `headers` 、 `process` 和 `params` 的 `get_object` 。
+
+    文件按 `block_size` 对齐分块，以 (Bucket, 文件名, ETag, 块号) 为键缓存在内存中，总大小不超过 `max_size` ，
+    超出时淘汰最久没有使用的块。读取时只请求缺少的块，连续缺少的块合并为一个范围请求；多个请求同时缺少同一块时，
+    只会请求一次。 `byte_range` 的起止位置都必须指定，否则不使用缓存。
+
+    缓存中记录了每个文件最近一次请求得到的ETag。距离上次确认ETag不到 `ttl` 秒时，命中缓存不会访问OSS；
+    达到 `ttl` 秒后，下一次命中会先用If-None-Match发送一个1字节的条件请求，OSS返回304时继续使用缓存的块，
+    否则旧版本的块全部失效。任何一次请求得到新的ETag时，旧版本的块也会全部失效。通过同一个缓存的 `AsyncBucket`
+    修改或删除文件时，对应的块会立即失效。
+
+    `ttl` 为None时从不确认ETag，其他客户端覆盖文件后仍会一直返回旧的内容，只适合内容不会改变的文件。
+
+    :param int block_size: 块大小
+    :param int max_size: 缓存的最大字节数
+    :param ttl: 确认ETag的间隔，单位为秒
+    """
+
+    def __init__(
+        self,
+        block_size: int = 1024 * 1024,
+        max_size: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = 60,
+    ):
+        self.block_size = block_size
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.__blocks = OrderedDict()
+        self.__objects = {}
+        self.__size = 0
+        self.__pending = {}
+        self.__revalidating = {}
+
+    @property
+    def size(self) -> int:
+        """当前缓存的字节数。"""
+        return self.__size
+
+    async def get_range(
+        self,
+        bucket_name: str,
+        key: str,
+        start: int,
+        end: int,
+        fetch: Callable[..., Coroutine[Any, Any, Any]],
+    ) -> Optional[Tuple[http.CaseInsensitiveDict, bytes]]:
+        """返回 `bucket_name` 中 `key` 的 [start, end] 范围的响应头部和内容，缺少的块和确认ETag都通过
+        ``await fetch(key, byte_range, headers)`` 获取。块请求带有 ``x-oss-range-behavior: standard`` ，
+        结尾超出文件大小时只返回到文件末尾的部分。
+
+        范围超出文件大小时，或者文件在读取期间反复变化，返回None。
+        """
+        object_key = (bucket_name, key)
+        obj = self.__objects.get(object_key)
+        if obj is not None and self.ttl is not None:
+            if time.monotonic() - obj.validated >= self.ttl:
+                await self.__revalidate(object_key, key, obj, fetch)
+
+        for _ in range(3):
+            obj = self.__objects.get(object_key)
+            last = end if obj is None else min(end, obj.size - 1)
+            if last < start:
+                return None
+
+            indexes = range(start // self.block_size, last // self.block_size + 1)
+            if obj is not None:
+                missing = [i for i in indexes if (object_key, obj.etag, i) not in self.__blocks]
+                if not missing:
+                    return self.__assemble(object_key, obj, start, last, indexes)
+            else:
+                missing = list(indexes)
+
+            try:
+                await self.__fetch(object_key, key, missing, fetch)
+            except exceptions.ServerError as e:
+                if e.status == 416:  # 起始位置超出文件大小
+                    return None
+                raise
+
+        return None
+
+    def invalidate(self, bucket_name: Optional[str] = None, key: Optional[str] = None):
+        """使 `bucket_name` 中 `key` 的所有块失效。 `key` 为None时使整个Bucket的块失效，
+        `bucket_name` 也为None时清空缓存。"""
+        object_keys = [
+            k
+            for k in self.__objects
+            if bucket_name is None or k[0] == bucket_name and (key is None or k[1] == key)
+        ]
+        for object_key in object_keys:
+            self.__drop(object_key)
+
+    def __drop(self, object_key):
+        obj = self.__objects.pop(object_key, None)
+        if obj is not None:
+            for index in obj.blocks:
+                self.__size -= len(self.__blocks.pop((object_key, obj.etag, index)))
+
+    async def __revalidate(self, object_key, key, obj, fetch):
+        """用If-None-Match确认缓存的ETag，同一个文件同时只发送一个请求。"""
+        pending = self.__revalidating.get(object_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self.__revalidate_run(object_key, key, obj, fetch))
+            self.__revalidating[object_key] = pending
+            pending.add_done_callback(lambda f: self.__revalidating.pop(object_key, None))
+        await asyncio.shield(pending)
+
+    async def __revalidate_run(self, object_key, key, obj, fetch):
+        try:
+            result = await fetch(key, (0, 0), {"If-None-Match": obj.etag})
+            await result.read()
+        except exceptions.NotModified:
+            obj.validated = time.monotonic()
+            return
+        except BaseException:
+            self.__drop(object_key)
+            raise
+
+        if result.headers.get("ETag") != obj.etag and self.__objects.get(object_key) is obj:
+            self.__drop(object_key)
+        else:
+            obj.validated = time.monotonic()
+
+    def __assemble(self, object_key, obj, start, last, indexes):
+        chunks = []
+        for i in indexes:
+            block_key = (object_key, obj.etag, i)
+            self.__blocks.move_to_end(block_key)
+            chunks.append(self.__blocks[block_key])
+
+        offset = indexes[0] * self.block_size
+        data = b"".join(chunks)[start - offset : last - offset + 1]
+
+        headers = http.CaseInsensitiveDict(obj.headers)
+        headers["Content-Range"] = "bytes {0}-{1}/{2}".format(start, last, obj.size)
+        headers["Content-Length"] = str(len(data))
+        return headers, data
+
+    async def __fetch(self, object_key, key, missing, fetch):
+        waiting = set()
+        runs = []
+        for i in missing:
+            pending = self.__pending.get((object_key, i))
+            if pending is not None:
+                waiting.add(pending)
+            elif runs and runs[-1][1] == i - 1:
+                runs[-1][1] = i
+            else:
+                runs.append([i, i])
+
+        for first, last in runs:
+            future = asyncio.ensure_future(self.__fetch_run(object_key, key, first, last, fetch))
+            waiting.add(future)
+            for i in range(first, last + 1):
+                self.__pending[(object_key, i)] = future
+
+        await asyncio.gather(*[asyncio.shield(f) for f in waiting])
+
+    async def __fetch_run(self, object_key, key, first, last, fetch):
+        try:
+            byte_range = (first * self.block_size, (last + 1) * self.block_size - 1)
+            # 默认的范围行为下，结尾超出文件大小的范围会被忽略并返回整个文件
+            result = await fetch(key, byte_range, {"x-oss-range-behavior": "standard"})
+            data = await result.read()
+        finally:
+            for i in range(first, last + 1):
+                self.__pending.pop((object_key, i), None)
+
+        etag = result.headers.get("ETag")
+        content_range = result.headers.get("Content-Range")
+        if content_range:
+            size = int(content_range.rsplit("/", 1)[1])
+        else:
+            # 不支持x-oss-range-behavior时OSS可能忽略无效的范围，返回整个文件
+            size, first, last = len(data), 0, (len(data) - 1) // self.block_size
+
+        obj = self.__objects.get(object_key)
+        if obj is None or obj.etag != etag:
+            self.__drop(object_key)
+            headers = http.CaseInsensitiveDict(result.headers)
+            headers.pop("Content-Range", None)
+            obj = self.__objects[object_key] = _CachedObject(etag, size, headers)
+        else:
+            obj.validated = time.monotonic()
+
+        for i in range(first, last + 1):
+            offset = (i - first) * self.block_size
+            block = data[offset : offset + self.block_size]
+            if not block:
+                break
+
+            block_key = (object_key, etag, i)
+            if block_key not in self.__blocks:
+                self.__blocks[block_key] = block
+                self.__size += len(block)
+                obj.blocks.add(i)
+        self.__evict()
+
+    def __evict(self):
+        while self.__size > self.max_size and self.__blocks:
+            (object_key, etag, index), block = self.__blocks.popitem(last=False)
+            self.__size -= len(block)
+            obj = self.__objects[object_key]
+            obj.blocks.discard(index)
+            if not obj.blocks:
+                del self.__objects[object_key]
@@ -1,14 +1,54 @@
-from typing import Optional, Union
+import asyncio
+import heapq
+from collections import deque
+from typing import List, Optional, Union
 
+from oss2 import defaults
 from oss2.exceptions import ServerError
 from oss2.iterators import _BaseIterator  # noqa
 from oss2.models import MultipartUploadInfo, SimplifiedObjectInfo
 
 from . import _http as http
 from .bucket import AsyncBucket, AsyncService
+from .task_queue import TaskQueue
+
+#: 列举接口每页数量的上限
+_MAX_PAGE_SIZE = 1000
+
+
+def _merge_by_key(entries, prefixes):
+    """线性合并OSS返回的文件（或分片上传）列表和公共前缀列表，两者都已经按key排好序。"""
+    if not prefixes:
+        return entries
+    if not entries:
+        return prefixes
+    return list(heapq.merge(entries, prefixes, key=lambda e: e.key))
 
 
 class _AsyncBaseIterator(_BaseIterator):
+    """异步迭代器的基类。
+
+    每获取一页结果，就用一个下标作为游标依次返回其中的元素。除了逐个迭代，也可以用 :meth:`pages` 按页迭代，
+    两者共用同一个游标。
+
+    `prefetch` 大于0时，后台协程会提前获取最多 `prefetch` 页结果，消费当前页的同时下一页的请求已经发出。
+    如果消费者仍然需要等待下一页，说明列举跟不上消费，每页的数量（ `_page_size_attr` 指定的属性，
+    如max_keys）会加倍，直到 `_MAX_PAGE_SIZE` 。提前结束迭代时，可以调用 :meth:`aclose` 停止预取，
+    或者用 ``async with`` 包裹迭代过程。
+    """
+
+    #: 每页数量对应的属性名
+    _page_size_attr = None
+
+    def __init__(self, marker, max_retries, prefetch=0):
+        super().__init__(marker, max_retries)
+
+        self.prefetch = prefetch
+        self.__page = []
+        self.__index = 0
+        self.__pages = None
+        self.__prefetch_task = None
+
     async def _async_fetch(self):
         raise NotImplemented
 
@@ -16,14 +56,87 @@ class _AsyncBaseIterator(_BaseIterator):
         return self
 
     async def __anext__(self):
+        while self.__index >= len(self.__page):
+            page = await self.__next_page()
+            if page is None:
+                raise StopAsyncIteration
+            self.__page, self.__index = page, 0
+
+        entry = self.__page[self.__index]
+        self.__index += 1
+        return entry
+
+    async def pages(self):
+        """按页迭代，每次返回一页中还没有被迭代过的元素（list），不会返回空页。"""
+        if self.__index < len(self.__page):
+            page = self.__page[self.__index :]
+            self.__page, self.__index = [], 0
+            yield page
+
         while True:
-            if self.entries:
-                return self.entries.pop(0)
+            page = await self.__next_page()
+            if page is None:
+                return
+            if page:
+                yield page
 
-            if not self.is_truncated:
-                raise StopAsyncIteration
+    async def __aenter__(self):
+        return self
 
-            await self.async_fetch_with_retry()
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """停止后台的预取。"""
+        task = self.__prefetch_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def __next_page(self):
+        """返回下一页结果，没有更多结果时返回None。"""
+        if self.prefetch > 0:
+            return await self.__next_prefetched_page()
+
+        if not self.is_truncated:
+            return None
+
+        await self.async_fetch_with_retry()
+        page, self.entries = self.entries, []
+        return page
+
+    async def __next_prefetched_page(self):
+        if self.__pages is None:
+            self.__pages = asyncio.Queue(self.prefetch)
+            self.__prefetch_task = asyncio.ensure_future(self.__prefetch_pages())
+        elif self.__pages.empty() and not self.__prefetch_task.done():
+            self.__grow_page_size()
+
+        page = await self.__pages.get()
+        if page is None or isinstance(page, Exception):
+            self.__pages.put_nowait(page)
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    async def __prefetch_pages(self):
+        try:
+            while self.is_truncated:
+                await self.async_fetch_with_retry()
+                page, self.entries = self.entries, []
+                await self.__pages.put(page)
+        except Exception as e:
+            await self.__pages.put(e)
+        else:
+            await self.__pages.put(None)
+
+    def __grow_page_size(self):
+        if self._page_size_attr is None:
+            return
+
+        page_size = getattr(self, self._page_size_attr)
+        if page_size < _MAX_PAGE_SIZE:
+            setattr(self, self._page_size_attr, min(page_size * 2, _MAX_PAGE_SIZE))
 
     async def async_fetch_with_retry(self):
         for i in range(self.max_retries):
@@ -48,8 +161,11 @@ class BucketIterator(_AsyncBaseIterator):
     :param prefix: 只列举匹配该前缀的Bucket
     :param marker: 分页符。只列举Bucket名字典序在此之后的Bucket
     :param max_keys: 每次调用 `list_buckets` 时的max_keys参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
     """
 
+    _page_size_attr = "max_keys"
+
     def __init__(
         self,
         service: AsyncService,
@@ -57,8 +173,9 @@ class BucketIterator(_AsyncBaseIterator):
         marker: str = "",
         max_keys: int = 100,
         max_retries: Optional[int] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(marker, max_retries)
+        super().__init__(marker, max_retries, prefetch)
         self.service = service
         self.prefix = prefix
         self.max_keys = max_keys
@@ -83,11 +200,14 @@ class ObjectIterator(_AsyncBaseIterator):
     :param delimiter: 目录分隔符
     :param marker: 分页符
     :param max_keys: 每次调用 `list_objects` 时的max_keys参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
 
     :param headers: HTTP头部
     :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
     """
 
+    _page_size_attr = "max_keys"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -97,8 +217,9 @@ class ObjectIterator(_AsyncBaseIterator):
         max_keys: int = 100,
         max_retries: Optional[int] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(marker, max_retries)
+        super().__init__(marker, max_retries, prefetch)
 
         self.bucket = bucket
         self.prefix = prefix
@@ -114,11 +235,13 @@ class ObjectIterator(_AsyncBaseIterator):
             max_keys=self.max_keys,
             headers=self.headers,
         )
-        self.entries = result.object_list + [
-            SimplifiedObjectInfo(prefix, None, None, None, None, None)
-            for prefix in result.prefix_list
-        ]
-        self.entries.sort(key=lambda obj: obj.key)
+        self.entries = _merge_by_key(
+            result.object_list,
+            [
+                SimplifiedObjectInfo(prefix, None, None, None, None, None)
+                for prefix in result.prefix_list
+            ],
+        )
 
         return result.is_truncated, result.next_marker
 
@@ -135,11 +258,14 @@ class ObjectIteratorV2(_AsyncBaseIterator):
     :param str start_after: 起始文件名称，OSS会按照文件的字典序排列返回start_after之后的文件。
     :param bool fetch_owner: 是否获取文件的owner信息，默认不返回。
     :param int max_keys: 最多返回文件的个数，文件和目录的和不能超过该值
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
 
     :param headers: HTTP头部
     :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
     """
 
+    _page_size_attr = "max_keys"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -152,8 +278,9 @@ class ObjectIteratorV2(_AsyncBaseIterator):
         max_keys: int = 100,
         max_retries: Optional[int] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(continuation_token, max_retries)
+        super().__init__(continuation_token, max_retries, prefetch)
 
         self.bucket = bucket
         self.prefix = prefix
@@ -175,15 +302,174 @@ class ObjectIteratorV2(_AsyncBaseIterator):
             max_keys=self.max_keys,
             headers=self.headers,
         )
-        self.entries = result.object_list + [
-            SimplifiedObjectInfo(prefix, None, None, None, None, None)
-            for prefix in result.prefix_list
-        ]
-        self.entries.sort(key=lambda obj: obj.key)
+        self.entries = _merge_by_key(
+            result.object_list,
+            [
+                SimplifiedObjectInfo(prefix, None, None, None, None, None)
+                for prefix in result.prefix_list
+            ],
+        )
 
         return result.is_truncated, result.next_continuation_token
 
 
+class ParallelObjectIterator(object):
+    """把前缀分成若干分片并发列举的文件迭代器，适合文件数量巨大的前缀。
+
+    先用 `delimiter` 逐层列举 `depth` 层，得到 `prefix` 下的公共前缀（子目录）作为分片，再用
+    :class:`ObjectIteratorV2` 同时列举最多 `num_threads` 个分片。分片之外、直接位于这几层目录下的文件会原样返回。
+
+    每次迭代返回的是 :class:`SimplifiedObjectInfo <oss2.models.SimplifiedObjectInfo>` 对象，不会返回公共前缀。
+    `ordered` 为True时，按文件名的字典序返回，和 :class:`ObjectIteratorV2` 的结果一致，此时每个分片最多预先缓存
+    两页结果；为False时按列举到的先后顺序返回，不会因为某个分片较慢而阻塞其他分片。
+
+    :param bucket: AsyncBucket 对象
+    :param str prefix: 只列举匹配该前缀的文件
+    :param str delimiter: 用来划分分片的目录分隔符
+    :param int depth: 按 `delimiter` 展开的层数，层数越多分片越多、越小
+    :param bool ordered: 是否按文件名的字典序返回
+    :param num_threads: 同时列举的分片数，如不指定则为 `bucket` 连接池的大小。
+    :param int max_keys: 每次调用 `list_objects_v2` 时的max_keys参数
+
+    :param headers: HTTP头部
+    :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
+    """
+
+    def __init__(
+        self,
+        bucket: AsyncBucket,
+        prefix: str = "",
+        delimiter: str = "/",
+        depth: int = 1,
+        ordered: bool = True,
+        num_threads: Optional[int] = None,
+        max_keys: int = 1000,
+        max_retries: Optional[int] = None,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.depth = depth
+        self.ordered = ordered
+        self.num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.max_keys = max_keys
+        self.max_retries = max_retries
+        self.headers = http.CaseInsensitiveDict(headers)
+
+    def __aiter__(self):
+        if self.ordered:
+            return self.__iter_ordered()
+        return self.__iter_unordered()
+
+    def _shard_iterator(self, prefix, delimiter=""):
+        return ObjectIteratorV2(
+            self.bucket,
+            prefix=prefix,
+            delimiter=delimiter,
+            max_keys=self.max_keys,
+            max_retries=self.max_retries,
+            headers=self.headers,
+            prefetch=1,
+        )
+
+    async def discover_shards(self) -> List[Union[str, SimplifiedObjectInfo]]:
+        """按 `delimiter` 逐层列举 `depth` 层，返回按文件名排序的分片列表。
+
+        元素是作为分片的公共前缀（str），或者分片之外、直接位于这几层目录下的文件
+        （ :class:`SimplifiedObjectInfo <oss2.models.SimplifiedObjectInfo>` ）。
+        """
+        shards = [self.prefix]
+        for _ in range(self.depth):
+            expanded = []
+            for shard in shards:
+                if not isinstance(shard, str):
+                    expanded.append(shard)
+                    continue
+
+                async with self._shard_iterator(shard, self.delimiter) as it:
+                    async for info in it:
+                        expanded.append(info.key if info.is_prefix() else info)
+            shards = expanded
+
+        return shards
+
+    async def __iter_ordered(self):
+        shards = deque(await self.discover_shards())
+        window = deque()
+
+        async def list_shard(prefix, q):
+            try:
+                async with self._shard_iterator(prefix) as it:
+                    async for page in it.pages():
+                        await q.put(page)
+            except Exception as e:
+                await q.put(e)
+            else:
+                await q.put(None)
+
+        def fill_window():
+            running = sum(1 for _, task in window if task is not None)
+            while shards and running < self.num_threads:
+                shard = shards.popleft()
+                if isinstance(shard, str):
+                    q = asyncio.Queue(1)
+                    window.append((q, asyncio.ensure_future(list_shard(shard, q))))
+                    running += 1
+                else:
+                    window.append((shard, None))
+
+        try:
+            fill_window()
+            while window:
+                item, task = window[0]
+                if task is None:
+                    window.popleft()
+                    fill_window()
+                    yield item
+                    continue
+
+                while True:
+                    page = await item.get()
+                    if page is None:
+                        break
+                    if isinstance(page, Exception):
+                        raise page
+                    for info in page:
+                        yield info
+
+                window.popleft()
+                fill_window()
+        finally:
+            tasks = [task for _, task in window if task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __iter_unordered(self):
+        async def producer(q):
+            for shard in await self.discover_shards():
+                if isinstance(shard, str):
+                    await q.put(shard)
+                else:
+                    await q.emit([shard])
+
+        async def consumer(q):
+            while True:
+                prefix = await q.get()
+                if prefix is None:
+                    break
+
+                async with self._shard_iterator(prefix) as it:
+                    async for page in it.pages():
+                        await q.emit(page)
+
+        q = TaskQueue(producer, [consumer] * self.num_threads)
+        async for page in q.results():
+            for info in page:
+                yield info
+
+
 class MultipartUploadIterator(_AsyncBaseIterator):
     """遍历Bucket里未完成的分片上传。
 
@@ -196,11 +482,14 @@ class MultipartUploadIterator(_AsyncBaseIterator):
     :param key_marker: 文件名分页符
     :param upload_id_marker: 分片上传ID分页符
     :param max_uploads: 每次调用 `list_multipart_uploads` 时的max_uploads参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
 
     :param headers: HTTP头部
     :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
     """
 
+    _page_size_attr = "max_uploads"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -211,8 +500,9 @@ class MultipartUploadIterator(_AsyncBaseIterator):
         max_uploads: int = 1000,
         max_retries: Optional[int] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(key_marker, max_retries)
+        super().__init__(key_marker, max_retries, prefetch)
 
         self.bucket = bucket
         self.prefix = prefix
@@ -230,10 +520,10 @@ class MultipartUploadIterator(_AsyncBaseIterator):
             max_uploads=self.max_uploads,
             headers=self.headers,
         )
-        self.entries = result.upload_list + [
-            MultipartUploadInfo(prefix, None, None) for prefix in result.prefix_list
-        ]
-        self.entries.sort(key=lambda u: u.key)
+        self.entries = _merge_by_key(
+            result.upload_list,
+            [MultipartUploadInfo(prefix, None, None) for prefix in result.prefix_list],
+        )
 
         self.next_upload_id_marker = result.next_upload_id_marker
         return result.is_truncated, result.next_key_marker
@@ -248,11 +538,14 @@ class ObjectUploadIterator(_AsyncBaseIterator):
     :param bucket: AsyncBucket 对象
     :param key: 文件名
     :param max_uploads: 每次调用 `list_multipart_uploads` 时的max_uploads参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
 
     :param headers: HTTP头部
     :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
     """
 
+    _page_size_attr = "max_uploads"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -260,8 +553,9 @@ class ObjectUploadIterator(_AsyncBaseIterator):
         max_uploads: int = 1000,
         max_retries: Optional[int] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        prefetch: int = 0,
     ):
-        super().__init__("", max_retries)
+        super().__init__("", max_retries, prefetch)
         self.bucket = bucket
         self.key = key
         self.next_upload_id_marker = ""
@@ -299,11 +593,14 @@ class PartIterator(_AsyncBaseIterator):
     :param upload_id: 分片上传ID
     :param marker: 分页符
     :param max_parts: 每次调用 `list_parts` 时的max_parts参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
 
     :param headers: HTTP头部
     :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
     """
 
+    _page_size_attr = "max_parts"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -313,8 +610,9 @@ class PartIterator(_AsyncBaseIterator):
         max_parts: int = 1000,
         max_retries: Optional[int] = None,
         headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(marker, max_retries)
+        super().__init__(marker, max_retries, prefetch)
 
         self.bucket = bucket
         self.key = key
@@ -344,8 +642,11 @@ class LiveChannelIterator(_AsyncBaseIterator):
     :param prefix: 只列举匹配该前缀的文件
     :param marker: 分页符
     :param max_keys: 每次调用 `list_live_channel` 时的max_keys参数。注意迭代器返回的数目可能会大于该值。
+    :param prefetch: 预先获取的页数，0表示不预取。预取时每页数量会随消费速度自动加大。
     """
 
+    _page_size_attr = "max_keys"
+
     def __init__(
         self,
         bucket: AsyncBucket,
@@ -353,8 +654,9 @@ class LiveChannelIterator(_AsyncBaseIterator):
         marker: str = "",
         max_keys: int = 100,
         max_retries: Optional[int] = None,
+        prefetch: int = 0,
     ):
-        super().__init__(marker, max_retries)
+        super().__init__(marker, max_retries, prefetch)
 
         self.bucket = bucket
         self.prefix = prefix
@@ -0,0 +1,411 @@
+"""
+ossx.listing_index
+~~~~~~~~~~~~~~~~~~
+
+把某个前缀下的文件列表保存在本地的SQLite数据库中，之后的前缀查询、存在性判断和大小统计都不需要访问OSS。
+
+前缀按 `delimiter` 展开 `depth` 层后得到的子目录作为分片，每个分片在本地记录一个校验和（分片内每个文件的
+文件名、ETag、大小、修改时间和存储类型的摘要之和）。刷新时逐页和本地记录比较，只写入有差异的部分。
+
+OSS没有按前缀返回文件数或者变化标记的接口，不完整列举就无法判断一个分片是否有被覆盖或删除的文件，
+所以完整的刷新总是重新列举所有分片。校验和用来减少数据库的写入和找出有变化的分片，不能减少列举请求。
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple, Union
+
+from oss2 import defaults, exceptions
+from oss2.models import SimplifiedObjectInfo
+
+from . import _http as http
+from .iterators import ObjectIteratorV2, ParallelObjectIterator
+from .task_queue import TaskQueue
+
+if TYPE_CHECKING:
+    from .bucket import AsyncBucket
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS shards (
+    shard TEXT PRIMARY KEY,
+    checksum INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    shard TEXT,
+    size INTEGER,
+    etag TEXT,
+    last_modified INTEGER,
+    storage_class TEXT,
+    type TEXT,
+    digest INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS objects_shard ON objects (shard);
+"""
+
+_COLUMNS = "key, size, etag, last_modified, storage_class, type"
+
+#: 校验和取模的值，保证能存入SQLite的INTEGER
+_CHECKSUM_MOD = 1 << 63
+
+
+def _digest(obj: SimplifiedObjectInfo) -> int:
+    text = "\0".join(
+        str(v) for v in (obj.key, obj.etag, obj.size, obj.last_modified, obj.storage_class)
+    )
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big") % _CHECKSUM_MOD
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """返回比所有以 `prefix` 开头的字符串都大的最小字符串，不存在时返回None。"""
+    for i in reversed(range(len(prefix))):
+        c = ord(prefix[i]) + 1
+        if c == 0xD800:
+            c = 0xE000
+        if c <= 0x10FFFF:
+            return prefix[:i] + chr(c)
+    return None
+
+
+def _prefix_condition(prefix, start_after=""):
+    conditions, args = ["key >= ?"], [prefix]
+    if start_after:
+        conditions.append("key > ?")
+        args.append(start_after)
+    upper = _prefix_upper_bound(prefix)
+    if upper is not None:
+        conditions.append("key < ?")
+        args.append(upper)
+    return " AND ".join(conditions), args
+
+
+def _row_to_object(row) -> SimplifiedObjectInfo:
+    key, size, etag, last_modified, storage_class, type = row
+    return SimplifiedObjectInfo(key, last_modified, etag, type, size, storage_class)
+
+
+class ListingIndex(object):
+    """前缀的本地文件列表索引。
+
+    每次调用 :meth:`refresh` 都会完整地列举 `prefix` 下的所有分片，逐页和本地记录比较，写入新增和被覆盖的文件，
+    并删除OSS上已经不存在的文件。新出现的分片直接写入，消失的分片直接从本地删除。没有变化的分片同样要完整列举，
+    刷新的请求数和第一次建立索引时相同，节省的只是数据库写入。
+
+    只追加写入的前缀（例如文件名以日期开头）可以用 ``refresh(append_only=True)`` ，对本地已有的分片只用
+    `start_after` 列举最后一个已知文件之后的部分，没有新文件的分片只需要一次请求。这种方式发现不了被覆盖或删除的文件，
+    也发现不了文件名排在最后一个已知文件之前的新文件，需要定期做一次完整的刷新。
+
+    数据库的读写都在一个单独的线程中进行，不会阻塞事件循环。索引不再使用时应调用 :meth:`close` ，
+    或者用 ``async with`` 包裹。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param path: SQLite数据库文件名
+    :param str prefix: 建立索引的前缀
+    :param str delimiter: 用来划分分片的目录分隔符
+    :param int depth: 按 `delimiter` 展开的层数
+    :param num_threads: 同时列举的分片数，如不指定则为 `bucket` 连接池的大小。
+    :param int max_keys: 每次调用 `list_objects_v2` 时的max_keys参数
+    :param headers: HTTP头部
+    """
+
+    def __init__(
+        self,
+        bucket: "AsyncBucket",
+        path: Union[str, Path],
+        prefix: str = "",
+        delimiter: str = "/",
+        depth: int = 1,
+        num_threads: Optional[int] = None,
+        max_keys: int = 1000,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ):
+        self.bucket = bucket
+        self.path = str(path)
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.depth = depth
+        self.num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.max_keys = max_keys
+        self.headers = http.CaseInsensitiveDict(headers)
+
+        self.__executor = ThreadPoolExecutor(1, thread_name_prefix="ossx-listing-index")
+        self.__conn = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        await self.__call(self._close)
+        self.__executor.shutdown(wait=False)
+
+    async def refresh(self, append_only: bool = False) -> List[str]:
+        """从OSS刷新索引，返回内容有变化的分片（子目录）列表，分片之外的文件有变化时包含 `prefix` 本身。
+
+        :param bool append_only: 对本地已有的分片只列举最后一个已知文件之后的部分，只能发现追加的文件
+        """
+        shards = await ParallelObjectIterator(
+            self.bucket,
+            prefix=self.prefix,
+            delimiter=self.delimiter,
+            depth=self.depth,
+            max_keys=self.max_keys,
+            headers=self.headers,
+        ).discover_shards()
+        shard_names = [s for s in shards if isinstance(s, str)]
+        loose_objects = [s for s in shards if not isinstance(s, str)]
+        logger.debug(
+            "Start to refresh listing index, path: {0}, prefix: {1}, shards: {2}, "
+            "append_only: {3}".format(self.path, self.prefix, len(shard_names), append_only)
+        )
+
+        known = await self.__call(self._shard_checksums)
+        changed = []
+        for shard in set(known) - set(shard_names):
+            await self.__call(self._remove_shard, shard)
+            changed.append(shard)
+
+        if await self.__call(self._replace_loose_objects, loose_objects):
+            changed.append(self.prefix)
+
+        async def producer(q):
+            for shard in shard_names:
+                await q.put(shard)
+
+        async def consumer(q):
+            while True:
+                shard = await q.get()
+                if shard is None:
+                    break
+
+                start_after = ""
+                if append_only and shard in known:
+                    start_after = await self.__call(self._last_key, shard)
+                if await self._refresh_shard(shard, start_after, known.get(shard)):
+                    changed.append(shard)
+
+        await TaskQueue(producer, [consumer] * self.num_threads).run()
+        await self.__call(self._set_meta, "refreshed_at", str(time.time()))
+
+        logger.debug("Refresh listing index done, changed shards: {0}".format(len(changed)))
+        return sorted(changed)
+
+    async def _refresh_shard(self, shard, start_after, old_checksum) -> bool:
+        """列举分片中 `start_after` 之后的文件，逐页和本地记录比较。"""
+        checksum = old_checksum or 0
+        lower = start_after
+        async with ObjectIteratorV2(
+            self.bucket,
+            prefix=shard,
+            start_after=start_after,
+            max_keys=self.max_keys,
+            headers=self.headers,
+            prefetch=1,
+        ) as it:
+            async for page in it.pages():
+                checksum += await self.__call(self._apply_page, shard, lower, page)
+                lower = page[-1].key
+
+        checksum += await self.__call(self._apply_page, shard, lower, [])
+        checksum %= _CHECKSUM_MOD
+        await self.__call(self._set_checksum, shard, checksum)
+        return checksum != old_checksum
+
+    async def get(self, key: str) -> Optional[SimplifiedObjectInfo]:
+        """返回索引中 `key` 对应的文件，不存在时返回None。"""
+        return await self.__call(self._get, key)
+
+    async def exists(self, key: str) -> bool:
+        return await self.get(key) is not None
+
+    async def stat(self, prefix: str = "") -> Tuple[int, int]:
+        """返回索引中以 `prefix` 开头的文件个数和总大小。"""
+        return await self.__call(self._stat, prefix)
+
+    async def checksum(self) -> int:
+        """返回整个索引的校验和，只要有文件变化，刷新后的校验和就会不同。"""
+        checksums = await self.__call(self._shard_checksums)
+        loose = await self.__call(self._loose_digests)
+        return (sum(checksums.values()) + sum(loose.values())) % _CHECKSUM_MOD
+
+    async def iter_objects(
+        self, prefix: str = "", start_after: str = "", batch_size: int = 1000
+    ) -> AsyncIterator[SimplifiedObjectInfo]:
+        """按文件名的字典序返回索引中以 `prefix` 开头、在 `start_after` 之后的文件，每次从数据库读取 `batch_size` 个。"""
+        while True:
+            rows = await self.__call(self._query, prefix, start_after, batch_size)
+            for row in rows:
+                yield _row_to_object(row)
+
+            if len(rows) < batch_size:
+                return
+            start_after = rows[-1][0]
+
+    async def refreshed_at(self) -> Optional[float]:
+        """返回上次刷新完成的时间戳，从未刷新时返回None。"""
+        value = await self.__call(self._get_meta, "refreshed_at")
+        return float(value) if value is not None else None
+
+    async def __call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, func, *args)
+
+    # 以下方法都在 self.__executor 的线程中执行
+
+    def _db(self) -> sqlite3.Connection:
+        if self.__conn is not None:
+            return self.__conn
+
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.executescript(_SCHEMA)
+        for name, value in (("bucket", self.bucket.bucket_name), ("prefix", self.prefix)):
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO meta VALUES (?, ?)", (name, value))
+            stored = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+            if stored[0] != value:
+                conn.close()
+                raise exceptions.ClientError(
+                    "Listing index {0} belongs to {1}: {2}, not {3}".format(
+                        self.path, name, stored[0], value
+                    )
+                )
+
+        self.__conn = conn
+        return conn
+
+    def _close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def _get_meta(self, name):
+        row = self._db().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        with self._db() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, value))
+
+    def _shard_checksums(self):
+        return dict(self._db().execute("SELECT shard, checksum FROM shards"))
+
+    def _set_checksum(self, shard, checksum):
+        with self._db() as conn:
+            conn.execute("INSERT OR REPLACE INTO shards VALUES (?, ?)", (shard, checksum))
+
+    def _remove_shard(self, shard):
+        with self._db() as conn:
+            conn.execute("DELETE FROM objects WHERE shard = ?", (shard,))
+            conn.execute("DELETE FROM shards WHERE shard = ?", (shard,))
+
+    def _last_key(self, shard):
+        row = (
+            self._db().execute("SELECT max(key) FROM objects WHERE shard = ?", (shard,)).fetchone()
+        )
+        return row[0] or ""
+
+    def _apply_page(self, shard, lower, page) -> int:
+        """用一页列举结果覆盖本地 (`lower`, 本页最后一个文件] 范围内的记录，返回校验和的变化量。
+
+        `page` 为空时覆盖 `lower` 之后分片内的所有记录，即删除它们。
+        """
+        condition, args = _prefix_condition(shard, lower)
+        if page:
+            condition += " AND key <= ?"
+            args.append(page[-1].key)
+
+        conn = self._db()
+        old = dict(
+            conn.execute("SELECT key, digest FROM objects WHERE " + condition, args).fetchall()
+        )
+        delta = 0
+        upserts = []
+        for obj in page:
+            digest = _digest(obj)
+            old_digest = old.pop(obj.key, None)
+            if old_digest == digest:
+                continue
+
+            delta += digest - (old_digest or 0)
+            upserts.append(
+                (
+                    obj.key,
+                    shard,
+                    obj.size,
+                    obj.etag,
+                    obj.last_modified,
+                    obj.storage_class,
+                    obj.type,
+                    digest,
+                )
+            )
+
+        delta -= sum(old.values())
+        if upserts or old:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?)", upserts
+                )
+                conn.executemany("DELETE FROM objects WHERE key = ?", [(k,) for k in old])
+        return delta
+
+    def _replace_loose_objects(self, objects) -> bool:
+        conn = self._db()
+        if self._loose_digests() == {obj.key: _digest(obj) for obj in objects}:
+            return False
+
+        with conn:
+            conn.execute("DELETE FROM objects WHERE shard IS NULL")
+            conn.executemany(
+                "INSERT OR REPLACE INTO objects VALUES (?, NULL, ?, ?, ?, ?, ?, ?)",
+                [
+                    (o.key, o.size, o.etag, o.last_modified, o.storage_class, o.type, _digest(o))
+                    for o in objects
+                ],
+            )
+        return True
+
+    def _loose_digests(self):
+        """分片之外、直接位于展开的几层目录下的文件，它们没有shards表中的记录。"""
+        return dict(self._db().execute("SELECT key, digest FROM objects WHERE shard IS NULL"))
+
+    def _get(self, key):
+        row = (
+            self._db()
+            .execute("SELECT " + _COLUMNS + " FROM objects WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return _row_to_object(row) if row else None
+
+    def _stat(self, prefix):
+        condition, args = _prefix_condition(prefix)
+        count, size = (
+            self._db()
+            .execute("SELECT count(*), sum(size) FROM objects WHERE " + condition, args)
+            .fetchone()
+        )
+        return count, size or 0
+
+    def _query(self, prefix, start_after, limit):
+        condition, args = _prefix_condition(prefix, start_after)
+        return (
+            self._db()
+            .execute(
+                "SELECT " + _COLUMNS + " FROM objects WHERE " + condition + " ORDER BY key LIMIT ?",
+                args + [limit],
+            )
+            .fetchall()
+        )
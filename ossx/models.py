@@ -1,14 +1,27 @@
+from inspect import isawaitable
+from typing import Any, Dict, List, Optional
+
 from oss2 import __version__
 from oss2 import models as _models
 from oss2.models import *
 
+from .select_records import (
+    _BATCH_ROWS,
+    _BATCH_SIZE,
+    SelectColumnParser,
+    SelectRecordParser,
+    iter_batches,
+    iter_records,
+)
 from .select_response import AsyncSelectResponseAdapter
+from .xml_stream import iter_list_objects
 
 
 class SelectObjectResult(HeadObjectResult):
-    def __init__(self, resp, progress_callback=None, crc_enabled=False):
+    def __init__(self, resp, progress_callback=None, crc_enabled=False, select_params=None):
         super(SelectObjectResult, self).__init__(resp)
         self.__crc_enabled = crc_enabled
+        self.select_params = select_params
         self.select_resp = AsyncSelectResponseAdapter(
             resp, progress_callback, None, enable_crc=self.__crc_enabled
         )
@@ -16,6 +29,44 @@ class SelectObjectResult(HeadObjectResult):
     def read(self):
         return self.select_resp.read()
 
+    def records(
+        self,
+        encoding: str = "utf-8",
+        batch_size: int = _BATCH_SIZE,
+        executor_threshold: Optional[int] = None,
+    ):
+        """逐条异步迭代查询结果：CSV查询返回字符串列表，JSON查询返回解析后的JSON对象。
+
+        记录的切分和解码按批进行，参见 :func:`ossx.select_records.iter_records` 。
+
+        :param str encoding: 输出的编码
+        :param int batch_size: 每批解析的最小字节数
+        :param int executor_threshold: 不小于这个大小的批在线程池中解析，默认不使用线程池
+        """
+        parser = SelectRecordParser(self.select_params, encoding)
+        return iter_records(self, parser, batch_size, executor_threshold)
+
+    def batches(
+        self,
+        batch_rows: int = _BATCH_ROWS,
+        column_names: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        output: Optional[str] = None,
+        encoding: str = "utf-8",
+        batch_size: int = _BATCH_SIZE,
+        executor_threshold: Optional[int] = None,
+    ):
+        """把CSV查询的结果按 `batch_rows` 行一批异步迭代，每批转换为列：安装了pyarrow时是 `pyarrow.Table` ，
+        否则是列名到NumPy数组（没有安装NumPy时是list）的dict，参见 :class:`ossx.select_records.SelectColumnParser` 。
+
+        :param int batch_rows: 每批的行数，最后一批可能更少
+        :param column_names: 列名，默认使用输出的表头（OutputHeader）或者 ``_1`` 、 ``_2`` ……
+        :param dtypes: 列名到类型的dict，默认自动推断
+        :param str output: ``"arrow"`` 、 ``"numpy"`` 或 ``"python"``
+        """
+        parser = SelectColumnParser(self.select_params, encoding, column_names, dtypes, output)
+        return iter_batches(self, parser, batch_rows, batch_size, executor_threshold)
+
     def close(self):
         return self.resp.close()
 
@@ -47,6 +98,50 @@ class GetSelectObjectMetaResult(HeadObjectResult):
         return await_result().__await__()
 
 
+class GetObjectResult(_models.GetObjectResult):
+    async def readinto(self, b) -> int:
+        """读取数据直接填充 `b` （bytearray、mmap、numpy数组等可写的缓冲区），返回读取的字节数，
+        读到末尾时返回0。参见 :meth:`AwaitResponse.readinto <ossx._http.AwaitResponse.readinto>` 。
+        """
+        readinto = getattr(self.stream, "readinto", None)
+        if readinto is not None:
+            return await readinto(b)
+
+        view = memoryview(b).cast("B")
+        content = self.read(len(view))
+        if isawaitable(content):
+            content = await content
+        view[: len(content)] = content
+        return len(content)
+
+
+class _ListObjectsStreamMixin(object):
+    """边接收边解析的列举结果，异步迭代时逐个返回文件和公共前缀，参见 :class:`ossx.xml_stream.ListObjectsParser` 。
+
+    `object_list` 和 `prefix_list` 不会被填充，迭代结束后 `is_truncated` 和分页标记才可用。
+    """
+
+    def __aiter__(self):
+        return iter_list_objects(self.resp, self)
+
+    def close(self):
+        return self.resp.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class ListObjectsStreamResult(_ListObjectsStreamMixin, ListObjectsResult):
+    pass
+
+
+class ListObjectsV2StreamResult(_ListObjectsStreamMixin, ListObjectsV2Result):
+    pass
+
+
 def since(version):
     def decorator(cls):
         if __version__ >= version:
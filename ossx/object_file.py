@@ -0,0 +1,202 @@
+"""
+ossx.object_file
+~~~~~~~~~~~~~~~~
+
+把OSS上的文件当作只读、可随机访问的异步文件对象，读取通过范围请求实现。
+"""
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Optional, Union
+
+from oss2 import exceptions
+from oss2.headers import IF_MATCH
+
+from . import _http as http
+
+if TYPE_CHECKING:
+    from .bucket import AsyncBucket
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncObjectFile(object):
+    """OSS文件的只读异步文件对象，提供 `read` 、 `readinto` 、 `seek` 和 `tell` ，用法和 `aiofiles` 打开的文件相同。
+
+    连续的顺序读取会触发预读：读取当前窗口的同时，后台请求下一个窗口，窗口大小从 `min_readahead` 开始，
+    每预读一次加倍，直到 `max_readahead` 。一旦读取位置不再连续（随机访问），预读立即停止，
+    之后的每次读取只请求需要的字节，直到读取重新变为连续。
+
+    所有请求都带有打开时的ETag（If-Match），文件在读取期间被修改时会抛出
+    :class:`PreconditionFailed <oss2.exceptions.PreconditionFailed>` 。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str key: 文件名
+    :param int size: 文件大小
+    :param str etag: 文件的ETag，即响应中ETag头部的原始值
+    :param int min_readahead: 最小预读窗口
+    :param int max_readahead: 最大预读窗口
+    :param headers: 每次范围请求附带的HTTP头部
+    """
+
+    def __init__(
+        self,
+        bucket: "AsyncBucket",
+        key: str,
+        size: int,
+        etag: str,
+        min_readahead: int = 256 * 1024,
+        max_readahead: int = 16 * 1024 * 1024,
+        headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    ):
+        self.bucket = bucket
+        self.key = key
+        self.name = key
+        self.size = size
+        self.etag = etag
+        self.min_readahead = min_readahead
+        self.max_readahead = max_readahead
+        self.headers = http.CaseInsensitiveDict(headers)
+        self.headers[IF_MATCH] = etag
+        self.closed = False
+
+        self.__pos = 0
+        self.__last_end = 0
+        self.__window = 0
+        self.__buffer = memoryview(b"")
+        self.__buffer_start = 0
+        self.__prefetch = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    async def tell(self) -> int:
+        return self.__pos
+
+    async def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self.__check_closed()
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self.__pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError("invalid whence ({0}, should be 0, 1 or 2)".format(whence))
+
+        if pos < 0:
+            raise ValueError("negative seek position {0}".format(pos))
+        self.__pos = pos
+        return pos
+
+    async def read(self, size: int = -1) -> bytes:
+        """从当前位置读取最多 `size` 个字节， `size` 为负数时读到文件末尾。"""
+        self.__check_closed()
+        if size is None or size < 0:
+            size = self.size - self.__pos
+        size = min(size, self.size - self.__pos)
+        if size <= 0:
+            return b""
+
+        sequential = self.__pos == self.__last_end
+        if not sequential:
+            self.__window = 0
+            await self.__cancel_prefetch()
+
+        chunks = []
+        pos, end = self.__pos, self.__pos + size
+        while pos < end:
+            offset = pos - self.__buffer_start
+            if 0 <= offset < len(self.__buffer):
+                chunk = self.__buffer[offset : offset + end - pos]
+                chunks.append(chunk)
+                pos += len(chunk)
+            elif self.__prefetch is not None and self.__prefetch[0] == pos:
+                _, task = self.__prefetch
+                self.__prefetch = None
+                self.__set_buffer(pos, await task)
+            else:
+                await self.__cancel_prefetch()
+                fetch_end = end if self.__window == 0 else max(end, pos + self.__window)
+                self.__set_buffer(pos, await self.__fetch(pos, fetch_end))
+
+        self.__pos = self.__last_end = end
+        if sequential:
+            self.__start_prefetch()
+        return b"".join(chunks)
+
+    async def readinto(self, b) -> int:
+        """读取数据填充 `b` ，返回读取的字节数。"""
+        data = await self.read(len(memoryview(b).cast("B")))
+        memoryview(b).cast("B")[: len(data)] = data
+        return len(data)
+
+    async def close(self):
+        self.closed = True
+        await self.__cancel_prefetch()
+        self.__buffer = memoryview(b"")
+
+    def __check_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+    def __set_buffer(self, start, data):
+        self.__buffer_start = start
+        self.__buffer = memoryview(data)
+
+    def __start_prefetch(self):
+        """顺序读取时，在后台请求当前缓冲区之后的下一个窗口。"""
+        buffer_end = self.__buffer_start + len(self.__buffer)
+        if self.__prefetch is not None or buffer_end >= self.size:
+            return
+
+        if self.__window == 0:
+            self.__window = self.min_readahead
+        else:
+            self.__window = min(self.__window * 2, self.max_readahead)
+
+        end = min(buffer_end + self.__window, self.size)
+        task = asyncio.ensure_future(self.__fetch(buffer_end, end))
+        self.__prefetch = (buffer_end, task)
+
+    async def __cancel_prefetch(self):
+        if self.__prefetch is not None:
+            _, task = self.__prefetch
+            self.__prefetch = None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def __fetch(self, start, end) -> bytes:
+        """请求 [start, end) 范围的数据。"""
+        end = min(end, self.size)
+        logger.debug(
+            "Fetch object range, key: {0}, range: {1}-{2}".format(self.key, start, end - 1)
+        )
+        result = await self.bucket.get_object(
+            self.key, byte_range=(start, end - 1), headers=self.headers
+        )
+        data = bytearray(end - start)
+        view = memoryview(data)
+        n = 0
+        while n < len(data):
+            size = await result.readinto(view[n:])
+            if not size:
+                break
+            n += size
+
+        if n != len(data):
+            raise exceptions.InconsistentError(
+                "IncompleteRead from source, expected {0}, got {1}".format(len(data), n),
+                result.request_id,
+            )
+        return data
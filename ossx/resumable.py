@@ -0,0 +1,1318 @@
+"""
+ossx.resumable
+~~~~~~~~~~~~~~
+
+:mod:`oss2.resumable` 的协程版本，分片并发地断点上传、下载文件，以及分片并发地拷贝大文件、上传数据流。
+
+并发的分片请求共享 `AsyncBucket` 的 `http.Session` 连接池，所以单个文件的传输也可以用满整个连接池。
+断点信息保存在 :class:`ResumableStore` / :class:`ResumableDownloadStore` 中，传输中断后再次调用会从断点继续。
+"""
+
+import asyncio
+import copy
+import functools
+import json
+import logging
+import os
+import random
+import string
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Dict, Optional, Union
+
+import aiofiles
+from aiofiles.os import wrap
+from oss2 import Bucket, defaults, exceptions, utils
+from oss2.compat import to_bytes, to_string
+from oss2.headers import (
+    IF_MATCH,
+    IF_UNMODIFIED_SINCE,
+    OSS_METADATA_DIRECTIVE,
+    OSS_OBJECT_ACL,
+    OSS_REQUEST_PAYER,
+    OSS_SERVER_SIDE_DATA_ENCRYPTION,
+    OSS_SERVER_SIDE_ENCRYPTION,
+    OSS_TRAFFIC_LIMIT,
+    OSS_USER_METADATA_PREFIX,
+)
+from oss2.models import PartInfo
+from oss2.resumable import _MAX_MULTIGET_PART_COUNT
+from oss2.resumable import ResumableDownloadStore as _ResumableDownloadStore
+from oss2.resumable import ResumableStore as _ResumableStore
+from oss2.resumable import (
+    _determine_part_size_internal,
+    _filter_invalid_headers,
+    _ObjectInfo,
+    _PartToProcess,
+    _populate_valid_headers,
+    _populate_valid_params,
+    _split_to_parts,
+    determine_part_size,
+)
+
+from . import _http as http
+from . import models
+from .bucket import AsyncBucket
+from .iterators import PartIterator
+from .task_queue import TaskQueue
+from .utils import AsyncSizedFileAdapter, _invoke_progress_callback, async_copyfileobj
+
+logger = logging.getLogger(__name__)
+
+_fsync = wrap(os.fsync)
+_replace = wrap(os.replace)
+
+
+async def resumable_upload(
+    bucket: AsyncBucket,
+    key: str,
+    filename: Union[str, Path],
+    store: Optional["ResumableStore"] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    multipart_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
+    num_threads: Optional[int] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> models.PutObjectResult:
+    """断点上传本地文件。
+
+    文件长度大于等于 `multipart_threshold` 时，把文件切分成若干分片，由 `num_threads` 个协程并发上传，
+    全部完成后调用 `complete_multipart_upload` ；否则退化为 `put_object_from_file` 。
+
+    每完成一个分片，都会把upload_id和已完成分片的ETag、CRC保存到 `store` 中。如果因为某种原因上传被中断，
+    下次上传同样的文件，即源文件和目标文件路径都一样，会先用 `list_parts` 核对OSS上已经存在的分片，
+    然后只上传缺失的分片。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param key: 上传到用户空间的文件名
+    :param filename: 待上传本地文件名
+    :param store: 用来保存断点信息的持久存储，参见 :class:`ResumableStore` 的接口。如不指定，则使用 `ResumableStore` 。
+
+    :param headers: HTTP头部
+        # 调用外部函数put_object 或 init_multipart_upload传递完整headers
+        # 调用外部函数uplpad_part目前只传递OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT
+        # 调用外部函数complete_multipart_upload目前只传递OSS_REQUEST_PAYER, OSS_OBJECT_ACL
+    :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
+
+    :param multipart_threshold: 文件长度大于该值时，则用分片上传。
+    :param part_size: 指定分片上传的每个分片的大小。如不指定，则自动计算。
+    :param progress_callback: 上传进度回调函数，可以是普通函数或协程函数。
+    :param num_threads: 同时上传的分片数，如不指定则为 `bucket` 连接池的大小。
+
+    :param params: HTTP请求参数
+        # 只有'sequential'这个参数才会被传递到外部函数init_multipart_upload中。
+    :type params: dict
+    """
+    logger.debug(
+        "Start to resumable upload, bucket: {0}, key: {1}, filename: {2}, headers: {3}, "
+        "multipart_threshold: {4}, part_size: {5}, num_threads: {6}".format(
+            bucket.bucket_name,
+            to_string(key),
+            filename,
+            headers,
+            multipart_threshold,
+            part_size,
+            num_threads,
+        )
+    )
+    size = os.path.getsize(filename)
+    multipart_threshold = defaults.get(multipart_threshold, defaults.multipart_threshold)
+
+    logger.debug(
+        "The size of file to upload is: {0}, multipart_threshold: {1}".format(
+            size, multipart_threshold
+        )
+    )
+    if size >= multipart_threshold:
+        uploader = _ResumableUploader(
+            bucket,
+            key,
+            filename,
+            size,
+            store,
+            headers=headers,
+            part_size=part_size,
+            progress_callback=progress_callback,
+            num_threads=num_threads,
+            params=params,
+        )
+        return await uploader.upload()
+
+    return await bucket.put_object_from_file(
+        key, filename, headers=headers, progress_callback=progress_callback
+    )
+
+
+async def resumable_download(
+    bucket: AsyncBucket,
+    key: str,
+    filename: str,
+    multiget_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
+    num_threads: Optional[int] = None,
+    store: Optional["ResumableDownloadStore"] = None,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> None:
+    """断点下载。
+
+    实现的方法是：
+        #. 在本地创建一个临时文件，文件名由原始文件名加上一个随机的后缀组成，并预先分配为OSS文件的长度；
+        #. 通过指定请求的 `Range` 头按照范围并发读取OSS文件，每个请求都带上 `If-Match` 以保证读到的是同一个版本，
+           读到的数据写入到临时文件里对应的位置；
+        #. 全部完成之后，把临时文件重命名为目标文件 （即 `filename` ）
+
+    在上述过程中，断点信息，即已经完成的范围，会保存在 `store` 中。因为某种原因下载中断，后续如果下载
+    同样的文件，也就是源文件和目标文件一样，就会先读取断点信息，然后只下载缺失的部分。
+
+    如果目标文件已经存在，那么该函数会覆盖此文件。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str key: 待下载的远程文件名。
+    :param str filename: 本地的目标文件名。
+    :param int multiget_threshold: 文件长度大于该值时，则使用分片并发下载。
+    :param int part_size: 指定期望的分片大小，即每个请求获得的字节数，实际的分片大小可能有所不同。
+    :param progress_callback: 下载进度回调函数，可以是普通函数或协程函数。
+    :param num_threads: 同时下载的分片数，如不指定则为 `bucket` 连接池的大小。
+
+    :param store: 用来保存断点信息的持久存储，可以指定断点信息所在的目录。
+    :type store: `ResumableDownloadStore`
+
+    :param dict params: 指定下载参数，可以传入versionId下载指定版本文件
+
+    :param headers: HTTP头部,
+        # 调用外部函数head_object目前只传递OSS_REQUEST_PAYER
+        # 调用外部函数get_object_to_file, get_object目前需要向下传递的值有OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT
+    :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
+
+    :raises: 如果OSS文件不存在，则抛出 :class:`NotFound <oss2.exceptions.NotFound>` ；也有可能抛出其他因下载文件而产生的异常。
+    """
+    logger.debug(
+        "Start to resumable download, bucket: {0}, key: {1}, filename: {2}, multiget_threshold: {3}, "
+        "part_size: {4}, num_threads: {5}".format(
+            bucket.bucket_name,
+            to_string(key),
+            filename,
+            multiget_threshold,
+            part_size,
+            num_threads,
+        )
+    )
+    multiget_threshold = defaults.get(multiget_threshold, defaults.multiget_threshold)
+
+    valid_headers = _populate_valid_headers(headers, [OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT])
+    result = await bucket.head_object(key, params=params, headers=valid_headers)
+    logger.debug(
+        "The size of object to download is: {0}, multiget_threshold: {1}".format(
+            result.content_length, multiget_threshold
+        )
+    )
+    if result.content_length >= multiget_threshold:
+        downloader = _ResumableDownloader(
+            bucket,
+            key,
+            filename,
+            _ObjectInfo.make(result),
+            part_size=part_size,
+            progress_callback=progress_callback,
+            num_threads=num_threads,
+            store=store,
+            params=params,
+            headers=valid_headers,
+        )
+        await downloader.download(result.server_crc)
+    else:
+        await bucket.get_object_to_file(
+            key,
+            filename,
+            progress_callback=progress_callback,
+            params=params,
+            headers=valid_headers,
+        )
+
+
+async def multipart_copy(
+    bucket: AsyncBucket,
+    source_bucket_name: str,
+    source_key: str,
+    target_key: str,
+    multipart_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
+    num_threads: Optional[int] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> models.PutObjectResult:
+    """拷贝一个文件到 `bucket` 。
+
+    源文件长度小于 `multipart_threshold` 时，直接调用 `copy_object` ；否则初始化分片上传，
+    按范围并发调用 `upload_part_copy` ，最后调用 `complete_multipart_upload` 。数据只在OSS服务端拷贝，
+    不经过本地。每个分片拷贝都带上 `x-oss-copy-source-if-match` ，以保证拷贝的是同一个版本。
+    拷贝过程中出现异常时，会取消分片上传后重新抛出异常。
+
+    `CopyObject` 只支持1GB以内的文件，更大的文件只能使用分片拷贝。
+
+    :param bucket: 目标 :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str source_bucket_name: 源Bucket名
+    :param str source_key: 源文件名
+    :param str target_key: 目标文件名
+    :param int multipart_threshold: 源文件长度大于该值时，则用分片拷贝。
+    :param int part_size: 指定每个分片的大小。如不指定，则自动计算。
+    :param progress_callback: 拷贝进度回调函数，可以是普通函数或协程函数。
+    :param num_threads: 同时拷贝的分片数，如不指定则为 `bucket` 连接池的大小。
+
+    :param headers: HTTP头部
+        # 分片拷贝时，如果没有指定 `x-oss-metadata-directive: REPLACE` ，目标文件沿用源文件的Content-Type和用户自定义元数据
+    :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
+
+    :param dict params: 请求参数，可以传入versionId拷贝指定版本的源文件
+    """
+    logger.debug(
+        "Start to multipart copy, source bucket: {0}, source key: {1}, bucket: {2}, key: {3}, "
+        "multipart_threshold: {4}, part_size: {5}, num_threads: {6}".format(
+            source_bucket_name,
+            to_string(source_key),
+            bucket.bucket_name,
+            to_string(target_key),
+            multipart_threshold,
+            part_size,
+            num_threads,
+        )
+    )
+    multipart_threshold = defaults.get(multipart_threshold, defaults.multipart_threshold)
+
+    source_bucket = bucket
+    if source_bucket_name != bucket.bucket_name:
+        # 沿用目标Bucket的连接池等设置，但不共用缓存，否则源文件的元信息会缓存在目标Bucket的同名文件下
+        source_bucket = copy.copy(bucket)
+        source_bucket.bucket_name = source_bucket_name
+        source_bucket.meta_cache = source_bucket.object_cache = source_bucket.block_cache = None
+
+    valid_headers = _populate_valid_headers(headers, [OSS_REQUEST_PAYER])
+    result = await source_bucket.head_object(source_key, params=params, headers=valid_headers)
+    logger.debug(
+        "The size of object to copy is: {0}, multipart_threshold: {1}".format(
+            result.content_length, multipart_threshold
+        )
+    )
+    if result.content_length < multipart_threshold:
+        return await bucket.copy_object(
+            source_bucket_name, source_key, target_key, headers=headers, params=params
+        )
+
+    copier = _MultipartCopier(
+        bucket,
+        source_bucket_name,
+        source_key,
+        target_key,
+        result,
+        part_size=part_size,
+        progress_callback=progress_callback,
+        num_threads=num_threads,
+        headers=headers,
+        params=params,
+    )
+    return await copier.copy()
+
+
+async def multipart_upload_stream(
+    bucket: AsyncBucket,
+    key: str,
+    data: AsyncIterable[Union[bytes, str]],
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    part_size: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, Optional[int]], Any]] = None,
+    num_threads: Optional[int] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> models.PutObjectResult:
+    """上传长度未知的异步数据流。
+
+    从 `data` 中读取数据，每凑满 `part_size` 字节就切成一个分片，由 `num_threads` 个协程并发上传，
+    读取 `data` 和上传分片同时进行。等待上传的分片最多一个，数据流的生产速度超过上传速度时，读取会暂停，
+    因此占用的内存大约为 (`num_threads` + 2) × `part_size` 。
+
+    如果整个数据流不足一个分片，则直接调用 `put_object` 。上传过程中出现异常（包括 `data` 本身抛出的异常），
+    会取消分片上传后重新抛出异常。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param key: 上传到用户空间的文件名
+    :param data: 待上传的数据流，每次产生一段bytes或str
+    :param headers: HTTP头部
+        # 调用外部函数put_object 或 init_multipart_upload传递完整headers
+        # 调用外部函数uplpad_part目前只传递OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT
+        # 调用外部函数complete_multipart_upload目前只传递OSS_REQUEST_PAYER, OSS_OBJECT_ACL
+    :type headers: 可以是dict，建议是oss2.CaseInsensitiveDict
+
+    :param part_size: 分片大小，如不指定则为 `oss2.defaults.part_size` 。数据流最多切成 `oss2.defaults.max_part_count` 个分片。
+    :param progress_callback: 上传进度回调函数，可以是普通函数或协程函数。因为总长度未知，total参数总是None。
+    :param num_threads: 同时上传的分片数，如不指定则为 `bucket` 连接池的大小。
+
+    :param params: HTTP请求参数
+        # 只有'sequential'这个参数才会被传递到外部函数init_multipart_upload中。
+    :type params: dict
+    """
+    logger.debug(
+        "Start to upload stream, bucket: {0}, key: {1}, headers: {2}, part_size: {3}, "
+        "num_threads: {4}".format(
+            bucket.bucket_name, to_string(key), headers, part_size, num_threads
+        )
+    )
+    uploader = _StreamUploader(
+        bucket,
+        key,
+        data,
+        headers=headers,
+        part_size=part_size,
+        progress_callback=progress_callback,
+        num_threads=num_threads,
+        params=params,
+    )
+    return await uploader.upload()
+
+
+class _ResumableOperation(object):
+    def __init__(self, bucket, key, filename, size, store, progress_callback=None, versionid=None):
+        self.bucket = bucket
+        self.key = to_string(key)
+        self.filename = filename
+        self.size = size
+
+        self._abspath = os.path.abspath(filename)
+
+        self.__store = store
+
+        if versionid is None:
+            self.__record_key = self.__store.make_store_key(
+                bucket.bucket_name, self.key, self._abspath
+            )
+        else:
+            self.__record_key = self.__store.make_store_key(
+                bucket.bucket_name, self.key, self._abspath, versionid
+            )
+
+        logger.debug("Init _ResumableOperation, record_key: {0}".format(self.__record_key))
+
+        # serialize the writes of the record, so that the last snapshot always wins
+        self.__lock = asyncio.Lock()
+        self.__progress_callback = progress_callback
+
+    async def _del_record(self):
+        await self.__store.delete(self.__record_key)
+
+    async def _put_record(self, record):
+        async with self.__lock:
+            await self.__store.put(self.__record_key, record)
+
+    async def _get_record(self):
+        return await self.__store.get(self.__record_key)
+
+    async def _report_progress(self, consumed_size):
+        await _invoke_progress_callback(self.__progress_callback, consumed_size, self.size)
+
+
+class _ResumableDownloader(_ResumableOperation):
+    def __init__(
+        self,
+        bucket,
+        key,
+        filename,
+        objectInfo,
+        part_size=None,
+        store=None,
+        progress_callback=None,
+        num_threads=None,
+        params=None,
+        headers=None,
+    ):
+        versionid = None
+        if params is not None and params.get("versionId") is not None:
+            versionid = params.get("versionId")
+        super().__init__(
+            bucket,
+            key,
+            filename,
+            objectInfo.size,
+            store or ResumableDownloadStore(),
+            progress_callback=progress_callback,
+            versionid=versionid,
+        )
+        self.objectInfo = objectInfo
+        self.__op = "ResumableDownload"
+        self.__part_size = defaults.get(part_size, defaults.multiget_part_size)
+        self.__part_size = _determine_part_size_internal(
+            self.size, self.__part_size, _MAX_MULTIGET_PART_COUNT
+        )
+
+        self.__tmp_file = None
+        self.__num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.__finished_parts = None
+        self.__finished_size = None
+        self.__params = params
+        self.__headers = headers
+
+        self.__record = None
+        logger.debug(
+            "Init _ResumableDownloader, bucket: {0}, key: {1}, part_size: {2}, num_thread: {3}".format(
+                bucket.bucket_name, to_string(key), self.__part_size, self.__num_threads
+            )
+        )
+
+    async def download(self, server_crc=None):
+        await self.__load_record()
+
+        parts_to_download = self.__get_parts_to_download()
+        logger.debug("Parts need to download: {0}".format(parts_to_download))
+
+        # preallocate the tmp file, so that every part can be written at its own offset
+        if not os.path.exists(self.__tmp_file):
+            async with aiofiles.open(self.__tmp_file, "wb") as f:
+                await f.truncate(self.size)
+
+        q = TaskQueue(
+            functools.partial(self.__producer, parts_to_download=parts_to_download),
+            [self.__consumer] * self.__num_threads,
+        )
+        await q.run()
+
+        if self.bucket.enable_crc:
+            parts = sorted(self.__finished_parts, key=lambda p: p.part_number)
+            object_crc = utils.calc_obj_crc_from_parts(parts)
+            try:
+                utils.check_crc("resume download", object_crc, server_crc, None)
+            except exceptions.InconsistentError:
+                utils.silently_remove(self.__tmp_file)
+                await self._del_record()
+                raise
+
+        utils.force_rename(self.__tmp_file, self.filename)
+
+        await self._report_progress(self.size)
+        await self._del_record()
+
+    async def __producer(self, q, parts_to_download=None):
+        for part in parts_to_download:
+            await q.put(part)
+
+    async def __consumer(self, q):
+        while True:
+            part = await q.get()
+            if part is None:
+                break
+
+            await self.__download_part(part)
+
+    async def __download_part(self, part):
+        await self._report_progress(self.__finished_size)
+
+        async with aiofiles.open(self.__tmp_file, "rb+") as f:
+            await f.seek(part.start, os.SEEK_SET)
+
+            headers = _populate_valid_headers(
+                self.__headers, [OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT]
+            )
+            if headers is None:
+                headers = http.CaseInsensitiveDict()
+            headers[IF_MATCH] = self.objectInfo.etag
+            headers[IF_UNMODIFIED_SINCE] = utils.http_date(self.objectInfo.mtime)
+
+            result = await self.bucket.get_object(
+                self.key,
+                byte_range=(part.start, part.end - 1),
+                headers=headers,
+                params=self.__params,
+            )
+            await async_copyfileobj(result, f, part.end - part.start, request_id=result.request_id)
+            await f.flush()
+
+        part.part_crc = result.client_crc
+        logger.debug(
+            "down part success, add part info to record, part_number: {0}, start: {1}, end: {2}".format(
+                part.part_number, part.start, part.end
+            )
+        )
+
+        await self.__finish_part(part)
+
+    async def __load_record(self):
+        record = await self._get_record()
+        logger.debug("Load record return {0}".format(record))
+
+        if record and not self.__is_record_sane(record):
+            logger.warning("The content of record is invalid, delete the record")
+            await self._del_record()
+            record = None
+
+        if record and not os.path.exists(self.filename + record["tmp_suffix"]):
+            logger.warning(
+                "Temp file: {0} does not exist, delete the record".format(
+                    self.filename + record["tmp_suffix"]
+                )
+            )
+            await self._del_record()
+            record = None
+
+        if record and self.__is_remote_changed(record):
+            logger.warning(
+                "Object: {0} has been overwritten, delete the record and tmp file".format(self.key)
+            )
+            utils.silently_remove(self.filename + record["tmp_suffix"])
+            await self._del_record()
+            record = None
+
+        if not record:
+            record = {
+                "op_type": self.__op,
+                "bucket": self.bucket.bucket_name,
+                "key": self.key,
+                "size": self.objectInfo.size,
+                "mtime": self.objectInfo.mtime,
+                "etag": self.objectInfo.etag,
+                "part_size": self.__part_size,
+                "file_path": self._abspath,
+                "tmp_suffix": self.__gen_tmp_suffix(),
+                "parts": [],
+            }
+            logger.debug(
+                "Add new record, bucket: {0}, key: {1}, part_size: {2}".format(
+                    self.bucket.bucket_name, self.key, self.__part_size
+                )
+            )
+            await self._put_record(record)
+
+        self.__tmp_file = self.filename + record["tmp_suffix"]
+        self.__part_size = record["part_size"]
+        self.__finished_parts = list(
+            _PartToProcess(p["part_number"], p["start"], p["end"], p["part_crc"])
+            for p in record["parts"]
+        )
+        self.__finished_size = sum(p.size for p in self.__finished_parts)
+        self.__record = record
+
+    def __get_parts_to_download(self):
+        assert self.__record
+
+        all_set = set(_split_to_parts(self.size, self.__part_size))
+        finished_set = set(self.__finished_parts)
+
+        return sorted(list(all_set - finished_set), key=lambda p: p.part_number)
+
+    def __is_record_sane(self, record):
+        try:
+            if record["op_type"] != self.__op:
+                logger.error(
+                    "op_type invalid, op_type in record:{0} is invalid".format(record["op_type"])
+                )
+                return False
+
+            for key in ("etag", "tmp_suffix", "file_path", "bucket", "key"):
+                if not isinstance(record[key], str):
+                    logger.error("{0} is not a string: {1}".format(key, record[key]))
+                    return False
+
+            for key in ("part_size", "size", "mtime"):
+                if not isinstance(record[key], int):
+                    logger.error("{0} is not an integer: {1}".format(key, record[key]))
+                    return False
+
+            if not isinstance(record["parts"], list):
+                logger.error("parts is not a list: {0}".format(record["parts"]))
+                return False
+        except KeyError as e:
+            logger.error("Key not found: {0}".format(e.args))
+            return False
+
+        return True
+
+    def __is_remote_changed(self, record):
+        return (
+            record["mtime"] != self.objectInfo.mtime
+            or record["size"] != self.objectInfo.size
+            or record["etag"] != self.objectInfo.etag
+        )
+
+    async def __finish_part(self, part):
+        self.__finished_parts.append(part)
+        self.__finished_size += part.size
+
+        self.__record["parts"].append(
+            {
+                "part_number": part.part_number,
+                "start": part.start,
+                "end": part.end,
+                "part_crc": part.part_crc,
+            }
+        )
+        await self._put_record(self.__record)
+
+    def __gen_tmp_suffix(self):
+        return ".tmp-" + "".join(random.choice(string.ascii_lowercase) for i in range(12))
+
+
+class _MultipartCopier(object):
+    def __init__(
+        self,
+        bucket,
+        source_bucket_name,
+        source_key,
+        target_key,
+        source_info,
+        part_size=None,
+        progress_callback=None,
+        num_threads=None,
+        headers=None,
+        params=None,
+    ):
+        self.bucket = bucket
+        self.source_bucket_name = source_bucket_name
+        self.source_key = to_string(source_key)
+        self.target_key = to_string(target_key)
+        self.source_info = source_info
+        self.size = source_info.content_length
+
+        self.__part_size = determine_part_size(self.size, part_size)
+        self.__num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.__headers = http.CaseInsensitiveDict(headers)
+        self.__params = params
+        self.__progress_callback = progress_callback
+
+        self.__upload_id = None
+        self.__finished_size = 0
+        self.__finished_parts = []
+
+        logger.debug(
+            "Init _MultipartCopier, bucket: {0}, key: {1}, part_size: {2}, num_thread: {3}".format(
+                bucket.bucket_name, self.target_key, self.__part_size, self.__num_threads
+            )
+        )
+
+    async def copy(self):
+        result = await self.bucket.init_multipart_upload(self.target_key, self.__init_headers())
+        self.__upload_id = result.upload_id
+
+        parts_to_copy = _split_to_parts(self.size, self.__part_size)
+        logger.debug("Parts need to copy: {0}".format(parts_to_copy))
+
+        q = TaskQueue(
+            functools.partial(self.__producer, parts_to_copy=parts_to_copy),
+            [self.__consumer] * self.__num_threads,
+        )
+        try:
+            await q.run()
+            await _invoke_progress_callback(self.__progress_callback, self.size, self.size)
+
+            headers = _populate_valid_headers(self.__headers, [OSS_REQUEST_PAYER, OSS_OBJECT_ACL])
+            parts = sorted(self.__finished_parts, key=lambda p: p.part_number)
+            return await self.bucket.complete_multipart_upload(
+                self.target_key, self.__upload_id, parts, headers=headers
+            )
+        except BaseException:
+            logger.warning(
+                "Copy parts failed, abort multipart upload: {0}".format(self.__upload_id)
+            )
+            await _abort_multipart_upload(self.bucket, self.target_key, self.__upload_id)
+            raise
+
+    def __init_headers(self):
+        headers = http.CaseInsensitiveDict()
+        if self.__headers.get(OSS_METADATA_DIRECTIVE, "COPY").upper() != "REPLACE":
+            for name, value in self.source_info.headers.items():
+                if name.lower() == "content-type" or name.lower().startswith(
+                    OSS_USER_METADATA_PREFIX
+                ):
+                    headers[name] = value
+
+        for name, value in self.__headers.items():
+            if not name.lower().startswith("x-oss-copy-source") and (
+                name.lower() != OSS_METADATA_DIRECTIVE
+            ):
+                headers[name] = value
+
+        return headers
+
+    async def __producer(self, q, parts_to_copy=None):
+        for part in parts_to_copy:
+            await q.put(part)
+
+    async def __consumer(self, q):
+        while True:
+            part = await q.get()
+            if part is None:
+                break
+
+            await self.__copy_part(part)
+
+    async def __copy_part(self, part):
+        await _invoke_progress_callback(self.__progress_callback, self.__finished_size, self.size)
+
+        headers = _populate_valid_headers(self.__headers, [OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT])
+        if headers is None:
+            headers = http.CaseInsensitiveDict()
+        headers["x-oss-copy-source-if-match"] = self.source_info.etag
+
+        # upload_part_copy writes uploadId/partNumber into params, so every part gets its own dict
+        params = dict(self.__params) if self.__params else None
+        result = await self.bucket.upload_part_copy(
+            self.source_bucket_name,
+            self.source_key,
+            (part.start, part.end - 1),
+            self.target_key,
+            self.__upload_id,
+            part.part_number,
+            headers=headers,
+            params=params,
+        )
+
+        logger.debug(
+            "Copy part success, part_number: {0}, etag: {1}, size: {2}".format(
+                part.part_number, result.etag, part.size
+            )
+        )
+        self.__finished_parts.append(PartInfo(part.part_number, result.etag, size=part.size))
+        self.__finished_size += part.size
+
+
+class _StreamUploader(object):
+    def __init__(
+        self,
+        bucket,
+        key,
+        data,
+        headers=None,
+        part_size=None,
+        progress_callback=None,
+        num_threads=None,
+        params=None,
+    ):
+        self.bucket = bucket
+        self.key = to_string(key)
+        self.data = data
+
+        self.__headers = headers
+        self.__part_size = defaults.get(part_size, defaults.part_size)
+        self.__num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.__params = params
+        self.__progress_callback = progress_callback
+
+        self.__upload_id = None
+        self.__finished_size = 0
+        self.__finished_parts = []
+
+        logger.debug(
+            "Init _StreamUploader, bucket: {0}, key: {1}, part_size: {2}, num_thread: {3}".format(
+                bucket.bucket_name, self.key, self.__part_size, self.__num_threads
+            )
+        )
+
+    async def upload(self):
+        parts = self.__iter_parts()
+        try:
+            first = await parts.__anext__()
+        except StopAsyncIteration:
+            first = b""
+
+        if len(first) < self.__part_size:
+            logger.debug("Stream is shorter than part_size, put object directly")
+            return await self.bucket.put_object(
+                self.key, first, headers=self.__headers, progress_callback=self.__progress_callback
+            )
+
+        params = _populate_valid_params(self.__params, [Bucket.SEQUENTIAL])
+        result = await self.bucket.init_multipart_upload(self.key, self.__headers, params)
+        self.__upload_id = result.upload_id
+
+        q = TaskQueue(
+            functools.partial(self.__producer, first=first, parts=parts),
+            [self.__consumer] * self.__num_threads,
+            maxsize=1,
+        )
+        try:
+            await q.run()
+            await _invoke_progress_callback(self.__progress_callback, self.__finished_size, None)
+
+            headers = _populate_valid_headers(self.__headers, [OSS_REQUEST_PAYER, OSS_OBJECT_ACL])
+            parts = sorted(self.__finished_parts, key=lambda p: p.part_number)
+            result = await self.bucket.complete_multipart_upload(
+                self.key, self.__upload_id, parts, headers=headers
+            )
+        except BaseException:
+            logger.warning(
+                "Upload stream failed, abort multipart upload: {0}".format(self.__upload_id)
+            )
+            await _abort_multipart_upload(self.bucket, self.key, self.__upload_id)
+            raise
+
+        if self.bucket.enable_crc:
+            object_crc = utils.calc_obj_crc_from_parts(parts)
+            if object_crc is not None and result.crc is not None:
+                utils.check_crc("upload stream", object_crc, result.crc, result.request_id)
+
+        return result
+
+    async def __iter_parts(self):
+        buf = bytearray()
+        async for chunk in self.data:
+            buf += to_bytes(chunk)
+            while len(buf) >= self.__part_size:
+                yield bytes(buf[: self.__part_size])
+                del buf[: self.__part_size]
+
+        if buf:
+            yield bytes(buf)
+
+    async def __producer(self, q, first=None, parts=None):
+        part_number = 1
+        await q.put((part_number, first))
+
+        async for content in parts:
+            part_number += 1
+            if part_number > defaults.max_part_count:
+                raise exceptions.ClientError(
+                    "Stream is too large, more than {0} parts of {1} bytes".format(
+                        defaults.max_part_count, self.__part_size
+                    )
+                )
+            await q.put((part_number, content))
+
+    async def __consumer(self, q):
+        while True:
+            part = await q.get()
+            if part is None:
+                break
+
+            await self.__upload_part(*part)
+
+    async def __upload_part(self, part_number, content):
+        await _invoke_progress_callback(self.__progress_callback, self.__finished_size, None)
+
+        headers = _populate_valid_headers(self.__headers, [OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT])
+        result = await self.bucket.upload_part(
+            self.key, self.__upload_id, part_number, content, headers=headers
+        )
+
+        part_crc = None
+        if self.bucket.enable_crc:
+            part_crc = utils.Crc64(0)
+            part_crc.update(content)
+            part_crc = part_crc.crc
+            if result.crc is not None:
+                utils.check_crc("upload part", part_crc, result.crc, result.request_id)
+
+        logger.debug(
+            "Upload part success, part_number: {0}, etag: {1}, size: {2}".format(
+                part_number, result.etag, len(content)
+            )
+        )
+        self.__finished_parts.append(
+            PartInfo(part_number, result.etag, size=len(content), part_crc=part_crc)
+        )
+        self.__finished_size += len(content)
+
+
+class _ResumableUploader(_ResumableOperation):
+    """以断点续传方式上传文件。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param key: 文件名
+    :param filename: 待上传的文件名
+    :param size: 文件总长度
+    :param store: 用来保存进度的持久化存储
+    :param headers: 传给 `init_multipart_upload` 的HTTP头部
+    :param part_size: 分片大小。优先使用用户提供的值。如果用户没有指定，那么对于新上传，计算出一个合理值；对于老的上传，采用记录中的
+        分片大小。
+    :param progress_callback: 上传进度回调函数。
+    :param num_threads: 同时上传的分片数。
+    """
+
+    def __init__(
+        self,
+        bucket,
+        key,
+        filename,
+        size,
+        store=None,
+        headers=None,
+        part_size=None,
+        progress_callback=None,
+        num_threads=None,
+        params=None,
+    ):
+        super().__init__(
+            bucket,
+            key,
+            filename,
+            size,
+            store or ResumableStore(),
+            progress_callback=progress_callback,
+        )
+
+        self.__op = "ResumableUpload"
+        self.__headers = headers
+        self.__part_size = defaults.get(part_size, defaults.part_size)
+        self.__mtime = os.path.getmtime(filename)
+        self.__num_threads = defaults.get(num_threads, bucket.session.pool_size)
+        self.__upload_id = None
+        self.__params = params
+
+        self.__record = None
+        self.__finished_size = 0
+        self.__finished_parts = None
+
+        logger.debug(
+            "Init _ResumableUploader, bucket: {0}, key: {1}, part_size: {2}, num_thread: {3}".format(
+                bucket.bucket_name, to_string(key), self.__part_size, self.__num_threads
+            )
+        )
+
+    async def upload(self):
+        await self.__load_record()
+
+        parts_to_upload = self.__get_parts_to_upload(self.__finished_parts)
+        parts_to_upload = sorted(parts_to_upload, key=lambda p: p.part_number)
+        logger.debug("Parts need to upload: {0}".format(parts_to_upload))
+
+        q = TaskQueue(
+            functools.partial(self.__producer, parts_to_upload=parts_to_upload),
+            [self.__consumer] * self.__num_threads,
+        )
+        await q.run()
+
+        await self._report_progress(self.size)
+
+        headers = _populate_valid_headers(self.__headers, [OSS_REQUEST_PAYER, OSS_OBJECT_ACL])
+        parts = sorted(self.__finished_parts, key=lambda p: p.part_number)
+        result = await self.bucket.complete_multipart_upload(
+            self.key, self.__upload_id, parts, headers=headers
+        )
+        await self._del_record()
+
+        if self.bucket.enable_crc:
+            object_crc = utils.calc_obj_crc_from_parts(parts)
+            if object_crc is not None and result.crc is not None:
+                utils.check_crc("resume upload", object_crc, result.crc, result.request_id)
+
+        return result
+
+    async def __producer(self, q, parts_to_upload=None):
+        for part in parts_to_upload:
+            await q.put(part)
+
+    async def __consumer(self, q):
+        while True:
+            part = await q.get()
+            if part is None:
+                break
+
+            await self.__upload_part(part)
+
+    async def __upload_part(self, part):
+        async with aiofiles.open(self.filename, "rb") as f:
+            await self._report_progress(self.__finished_size)
+
+            await f.seek(part.start, os.SEEK_SET)
+            headers = _populate_valid_headers(
+                self.__headers, [OSS_REQUEST_PAYER, OSS_TRAFFIC_LIMIT]
+            )
+            result = await self.bucket.upload_part(
+                self.key,
+                self.__upload_id,
+                part.part_number,
+                AsyncSizedFileAdapter(f, part.size),
+                headers=headers,
+            )
+
+        logger.debug(
+            "Upload part success, add part info to record, part_number: {0}, etag: {1}, size: {2}".format(
+                part.part_number, result.etag, part.size
+            )
+        )
+        await self.__finish_part(
+            PartInfo(part.part_number, result.etag, size=part.size, part_crc=result.crc)
+        )
+
+    async def __finish_part(self, part_info):
+        self.__finished_parts.append(part_info)
+        self.__finished_size += part_info.size
+
+        self.__record["parts"].append(_part_info_to_record(part_info))
+        await self._put_record(self.__record)
+
+    async def __load_record(self):
+        record = await self._get_record()
+        logger.debug("Load record return {0}".format(record))
+
+        if record and not self.__is_record_sane(record):
+            logger.warning("The content of record is invalid, delete the record")
+            await self._del_record()
+            record = None
+
+        if record and self.__file_changed(record):
+            logger.warning("File: {0} has been changed, delete the record".format(self.filename))
+            await self._del_record()
+            record = None
+
+        parts_uploaded = []
+        if record:
+            parts_uploaded = await self.__list_uploaded_parts(record["upload_id"])
+            if parts_uploaded is None:
+                logger.warning(
+                    "Multipart upload: {0} does not exist, delete the record".format(
+                        record["upload_id"]
+                    )
+                )
+                await self._del_record()
+                record = None
+                parts_uploaded = []
+
+        if not record:
+            params = _populate_valid_params(self.__params, [Bucket.SEQUENTIAL])
+            part_size = determine_part_size(self.size, self.__part_size)
+            logger.debug(
+                "Upload File size: {0}, User-specify part_size: {1}, Calculated part_size: {2}".format(
+                    self.size, self.__part_size, part_size
+                )
+            )
+            result = await self.bucket.init_multipart_upload(self.key, self.__headers, params)
+            record = {
+                "op_type": self.__op,
+                "upload_id": result.upload_id,
+                "file_path": self._abspath,
+                "size": self.size,
+                "mtime": self.__mtime,
+                "bucket": self.bucket.bucket_name,
+                "key": self.key,
+                "part_size": part_size,
+                "parts": [],
+            }
+            logger.debug(
+                "Add new record, bucket: {0}, key: {1}, upload_id: {2}, part_size: {3}".format(
+                    self.bucket.bucket_name, self.key, result.upload_id, part_size
+                )
+            )
+            await self._put_record(record)
+
+        self.__record = record
+        self.__part_size = self.__record["part_size"]
+        self.__upload_id = self.__record["upload_id"]
+
+        self.__finished_parts = self.__reconcile_parts(parts_uploaded)
+        self.__finished_size = sum(p.size for p in self.__finished_parts)
+        self.__record["parts"] = [_part_info_to_record(p) for p in self.__finished_parts]
+
+    async def __list_uploaded_parts(self, upload_id):
+        """列举OSS上已经上传的分片，分片上传不存在时返回None。"""
+        valid_headers = _filter_invalid_headers(
+            self.__headers, [OSS_SERVER_SIDE_ENCRYPTION, OSS_SERVER_SIDE_DATA_ENCRYPTION]
+        )
+        try:
+            return [
+                p
+                async for p in PartIterator(self.bucket, self.key, upload_id, headers=valid_headers)
+            ]
+        except exceptions.NoSuchUpload:
+            return None
+
+    def __reconcile_parts(self, parts_uploaded):
+        """以OSS上列举到的分片为准，只有ETag一致时才沿用本地记录的CRC；大小不符合切分的分片需要重新上传。"""
+        expected = dict(
+            (p.part_number, p.size) for p in _split_to_parts(self.size, self.__part_size)
+        )
+        recorded = dict((p["part_number"], p) for p in self.__record["parts"])
+
+        parts = []
+        for uploaded in parts_uploaded:
+            if expected.get(uploaded.part_number) != uploaded.size:
+                continue
+
+            part_crc = None
+            local = recorded.get(uploaded.part_number)
+            if local is not None and local["etag"] == uploaded.etag:
+                part_crc = local["part_crc"]
+
+            parts.append(
+                PartInfo(uploaded.part_number, uploaded.etag, size=uploaded.size, part_crc=part_crc)
+            )
+
+        return parts
+
+    def __file_changed(self, record):
+        return record["mtime"] != self.__mtime or record["size"] != self.size
+
+    def __get_parts_to_upload(self, parts_uploaded):
+        all_parts = _split_to_parts(self.size, self.__part_size)
+        if not parts_uploaded:
+            return all_parts
+
+        all_parts_map = dict((p.part_number, p) for p in all_parts)
+
+        for uploaded in parts_uploaded:
+            if uploaded.part_number in all_parts_map:
+                del all_parts_map[uploaded.part_number]
+
+        return all_parts_map.values()
+
+    def __is_record_sane(self, record):
+        try:
+            if record["op_type"] != self.__op:
+                logger.error(
+                    "op_type invalid, op_type in record:{0} is invalid".format(record["op_type"])
+                )
+                return False
+
+            for key in ("upload_id", "file_path", "bucket", "key"):
+                if not isinstance(record[key], str):
+                    logger.error(
+                        "Type Error, {0} in record is not a string type: {1}".format(
+                            key, record[key]
+                        )
+                    )
+                    return False
+
+            for key in ("size", "part_size"):
+                if not isinstance(record[key], int):
+                    logger.error(
+                        "Type Error, {0} in record is not an integer type: {1}".format(
+                            key, record[key]
+                        )
+                    )
+                    return False
+
+            if not isinstance(record["mtime"], int) and not isinstance(record["mtime"], float):
+                logger.error(
+                    "Type Error, mtime in record is not a float or an integer type: {0}".format(
+                        record["mtime"]
+                    )
+                )
+                return False
+
+            if not isinstance(record["parts"], list):
+                logger.error(
+                    "Type Error, parts in record is not a list: {0}".format(record["parts"])
+                )
+                return False
+
+        except KeyError as e:
+            logger.error("Key not found: {0}".format(e.args))
+            return False
+
+        return True
+
+
+def _part_info_to_record(part_info):
+    return {
+        "part_number": part_info.part_number,
+        "etag": part_info.etag,
+        "size": part_info.size,
+        "part_crc": part_info.part_crc,
+    }
+
+
+async def _abort_multipart_upload(bucket, key, upload_id):
+    """取消分片上传，失败时只记录日志，调用者继续抛出原来的异常。"""
+    try:
+        await bucket.abort_multipart_upload(key, upload_id)
+    except Exception as e:
+        logger.warning(
+            "Abort multipart upload failed, upload_id: {0}, exception: {1!r}".format(upload_id, e)
+        )
+
+
+_UPLOAD_TEMP_DIR = ".py-ossx-upload"
+_DOWNLOAD_TEMP_DIR = ".py-ossx-download"
+
+
+class _ResumableStoreBase(object):
+    """断点信息的持久存储，每个断点保存为 `root/dir/` 下的一个JSON文件。
+
+    写入时先写临时文件并 `fsync` ，再原子地重命名为目标文件，所以进程崩溃或断电后读到的总是一份完整的断点信息。
+    """
+
+    def __init__(self, root, dir):
+        logger.debug("Init ResumableStoreBase, root path: {0}, temp dir: {1}".format(root, dir))
+        self.dir = os.path.join(root, dir)
+
+        if os.path.isdir(self.dir):
+            return
+
+        utils.makedir_p(self.dir)
+
+    async def get(self, key):
+        pathname = self.__path(key)
+
+        logger.debug("ResumableStoreBase: get key: {0} from file path: {1}".format(key, pathname))
+
+        if not os.path.exists(pathname):
+            logger.debug("file {0} is not exist".format(pathname))
+            return None
+
+        try:
+            async with aiofiles.open(pathname, "r") as f:
+                content = json.loads(await f.read())
+        except ValueError:
+            utils.silently_remove(pathname)
+            return None
+        else:
+            return content
+
+    async def put(self, key, value):
+        pathname = self.__path(key)
+        tmp_pathname = pathname + ".tmp"
+
+        async with aiofiles.open(tmp_pathname, "w") as f:
+            await f.write(json.dumps(value))
+            await f.flush()
+            await _fsync(f.fileno())
+        await _replace(tmp_pathname, pathname)
+
+        logger.debug(
+            "ResumableStoreBase: put key: {0} to file path: {1}, value: {2}".format(
+                key, pathname, value
+            )
+        )
+
+    async def delete(self, key):
+        pathname = self.__path(key)
+        utils.silently_remove(pathname)
+
+        logger.debug("ResumableStoreBase: delete key: {0}, file path: {1}".format(key, pathname))
+
+    def __path(self, key):
+        return os.path.join(self.dir, key)
+
+
+class ResumableStore(_ResumableStoreBase):
+    """保存断点上传断点信息的类。
+
+    每次上传的信息会保存在 `root/dir/` 下面的某个文件里。
+
+    :param str root: 父目录，缺省为HOME
+    :param str dir: 子目录，缺省为 `_UPLOAD_TEMP_DIR`
+    """
+
+    def __init__(self, root=None, dir=None):
+        super().__init__(root or os.path.expanduser("~"), dir or _UPLOAD_TEMP_DIR)
+
+    make_store_key = staticmethod(_ResumableStore.make_store_key)
+
+
+class ResumableDownloadStore(_ResumableStoreBase):
+    """保存断点下载断点信息的类。
+
+    每次下载的断点信息会保存在 `root/dir/` 下面的某个文件里。
+
+    :param str root: 父目录，缺省为HOME
+    :param str dir: 子目录，缺省为 `_DOWNLOAD_TEMP_DIR`
+    """
+
+    def __init__(self, root=None, dir=None):
+        super().__init__(root or os.path.expanduser("~"), dir or _DOWNLOAD_TEMP_DIR)
+
+    make_store_key = staticmethod(_ResumableDownloadStore.make_store_key)
+
+
+def make_upload_store(root=None, dir=None):
+    return ResumableStore(root=root, dir=dir)
+
+
+def make_download_store(root=None, dir=None):
+    return ResumableDownloadStore(root=root, dir=dir)
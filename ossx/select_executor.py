@@ -0,0 +1,303 @@
+"""
+ossx.select_executor
+~~~~~~~~~~~~~~~~~~~~
+
+并发地执行 `select_object` ：把一个大文件按split切分成多段同时查询，或者同时查询一个前缀下的所有文件。
+"""
+
+import asyncio
+import collections
+import logging
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from oss2 import defaults
+from oss2.exceptions import ClientError
+from oss2.select_params import SelectParameters
+
+from . import _http as http
+from .iterators import ObjectIteratorV2
+from .select_records import _BATCH_SIZE, SelectRecordParser, _iter_complete, _run
+from .task_queue import TaskQueue
+
+if TYPE_CHECKING:
+    from .bucket import AsyncBucket
+
+logger = logging.getLogger(__name__)
+
+_CSV_META_PARAMS = (
+    SelectParameters.RecordDelimiter,
+    SelectParameters.FieldDelimiter,
+    SelectParameters.QuoteCharacter,
+    SelectParameters.CompressionType,
+)
+
+
+async def get_select_splits(
+    bucket: "AsyncBucket",
+    key: str,
+    select_params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> int:
+    """返回文件的split数。
+
+    通过 `create_select_object_meta` 获取，分隔符等参数取自 `select_params` 。OSS会保存文件的meta，
+    文件没有修改时，再次调用直接返回保存的结果，不会重新扫描文件。
+    """
+    select_params = select_params or {}
+    if SelectParameters.Json_Type in select_params:
+        meta_params = {SelectParameters.Json_Type: select_params[SelectParameters.Json_Type]}
+        names = (SelectParameters.CompressionType,)
+    else:
+        meta_params = {}
+        names = _CSV_META_PARAMS
+
+    for name in names:
+        if name in select_params:
+            meta_params[name] = select_params[name]
+
+    result = await bucket.create_select_object_meta(key, meta_params, headers=headers)
+    await result
+    return result.splits
+
+
+def _split_ranges(splits: int, num_ranges: int) -> List[Tuple[int, int]]:
+    """把 [0, splits) 尽量平均地分为 `num_ranges` 段，返回每段的 (start, end) ，包含end。"""
+    num_ranges = max(1, min(num_ranges, splits))
+    size, extra = divmod(splits, num_ranges)
+    ranges = []
+    start = 0
+    for i in range(num_ranges):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            ranges.append((start, end - 1))
+        start = end
+    return ranges
+
+
+async def _select_range(bucket, key, sql, select_params, split_range, batch_size, headers):
+    """查询一段split，返回其中的完整记录。"""
+    select_params = dict(select_params)
+    select_params[SelectParameters.SplitRange] = split_range
+    logger.debug("Select object split range, key: {0}, range: {1}".format(key, split_range))
+
+    result = await bucket.select_object(key, sql, None, select_params, headers=headers)
+    async with result:
+        parser = SelectRecordParser(select_params)
+        async for batch in _iter_complete(result, parser, batch_size):
+            yield batch
+
+
+async def _pump(stream, queue: asyncio.Queue):
+    try:
+        async for item in stream:
+            await queue.put(item)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(None)
+    finally:
+        await stream.aclose()
+
+
+async def _merge_ordered(streams: Iterable, num_threads: int, maxsize: int = 4):
+    """按顺序返回多个异步迭代器的内容，同时最多运行 `num_threads` 个。
+
+    排在后面的迭代器提前运行，每个最多缓存 `maxsize` 项，等前面的返回完毕后再依次返回。
+    """
+    streams = iter(streams)
+    running = collections.deque()
+
+    def start_next():
+        stream = next(streams, None)
+        if stream is not None:
+            queue = asyncio.Queue(maxsize)
+            running.append((queue, asyncio.ensure_future(_pump(stream, queue))))
+
+    for _ in range(num_threads):
+        start_next()
+
+    try:
+        while running:
+            queue, _ = running[0]
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+            running.popleft()
+            start_next()
+    finally:
+        for _, task in running:
+            task.cancel()
+        await asyncio.gather(*[task for _, task in running], return_exceptions=True)
+
+
+async def _merge_unordered(streams: Iterable, num_threads: int):
+    """同时运行最多 `num_threads` 个异步迭代器，按产生的顺序返回它们的内容。"""
+
+    async def producer(q):
+        for stream in streams:
+            await q.put(stream)
+
+    async def consumer(q):
+        while True:
+            stream = await q.get()
+            if stream is None:
+                break
+            async for item in stream:
+                await q.emit(item)
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    async for item in q.results():
+        yield item
+
+
+async def select_object_parallel(
+    bucket: "AsyncBucket",
+    key: str,
+    sql: str,
+    select_params: Optional[Dict[str, Any]] = None,
+    num_threads: Optional[int] = None,
+    num_ranges: Optional[int] = None,
+    ordered: bool = True,
+    splits: Optional[int] = None,
+    batch_size: int = _BATCH_SIZE,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> AsyncIterator[bytes]:
+    """把文件按split切分为 `num_ranges` 段，并发地对每段执行同一个查询，返回合并后的结果。
+
+    每段通过select_params中的SplitRange查询，split由OSS按记录边界划分，因此不需要
+    AllowQuotedRecordDelimiter=false。split数由 :func:`get_select_splits` 获取，也可以通过 `splits` 直接指定。
+    适用于CSV和JSON LINES文件，输出表头（OutputHeader）时只有第一段会输出表头。JSON DOCUMENT文件不支持SplitRange，
+    每段都会返回全部结果，因此会抛出 :class:`ClientError <oss2.exceptions.ClientError>` 。
+
+    返回的每一块数据都只包含完整的记录，可以直接用 :meth:`SelectRecordParser.parse
+    <ossx.select_records.SelectRecordParser.parse>` 解析。 `ordered` 为True时按文件中的顺序返回，
+    排在后面的段会提前查询并缓存少量结果；为False时按完成的顺序返回，不同段的数据交替出现。
+    提前退出迭代会取消还没有完成的查询。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str key: 文件名
+    :param str sql: 查询语句，每段都执行同一个语句，因此聚合函数的结果需要调用者再次合并
+    :param select_params: 参见 :meth:`AsyncBucket.select_object <ossx.AsyncBucket.select_object>`
+    :param num_threads: 同时查询的段数，如不指定则为 `bucket` 连接池的大小。
+    :param num_ranges: 切分的段数，默认为 `num_threads` 的4倍，不超过split数
+    :param bool ordered: 是否按文件中的顺序返回
+    :param int splits: 文件的split数，不指定时通过 `create_select_object_meta` 获取
+    :param int batch_size: 每段的结果攒够这么多字节后才切分记录
+    :param headers: HTTP头部
+    """
+    select_params = dict(select_params or {})
+    if str(select_params.get(SelectParameters.Json_Type, "")).upper() == "DOCUMENT":
+        raise ClientError("select_object_parallel does not support JSON DOCUMENT")
+
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    num_ranges = defaults.get(num_ranges, num_threads * 4)
+    if splits is None:
+        splits = await get_select_splits(bucket, key, select_params, headers)
+
+    ranges = _split_ranges(splits, num_ranges)
+    logger.debug(
+        "Start to select object in parallel, bucket: {0}, key: {1}, splits: {2}, ranges: {3}".format(
+            bucket.bucket_name, key, splits, len(ranges)
+        )
+    )
+
+    output_header = select_params.get(SelectParameters.OutputHeader, False)
+    streams = []
+    for i, split_range in enumerate(ranges):
+        params = select_params
+        if i > 0 and str(output_header).lower() == "true":
+            params = dict(select_params, OutputHeader=False)
+        streams.append(_select_range(bucket, key, sql, params, split_range, batch_size, headers))
+
+    if ordered:
+        merged = _merge_ordered(streams, num_threads)
+    else:
+        merged = _merge_unordered(streams, num_threads)
+    async for batch in merged:
+        yield batch
+
+
+async def select_prefix(
+    bucket: "AsyncBucket",
+    prefix: str,
+    sql: str,
+    select_params: Optional[Dict[str, Any]] = None,
+    num_threads: Optional[int] = None,
+    raw: bool = False,
+    encoding: str = "utf-8",
+    batch_size: int = _BATCH_SIZE,
+    executor_threshold: Optional[int] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """对 `prefix` 下的每个文件执行同一个查询，把所有文件的结果合并为一个异步迭代器。
+
+    列举文件和查询同时进行，最多有 `num_threads` 个文件在查询，以 ``/`` 结尾的文件被视为目录而跳过。
+    每次返回一个 ``(文件名, 记录)`` 元组，记录的格式和 :meth:`SelectObjectResult.records
+    <ossx.models.SelectObjectResult.records>` 相同； `raw` 为True时返回 ``(文件名, 数据)`` ，
+    数据是只包含完整记录的bytes。同一个文件的记录按顺序返回，不同文件的记录交替出现。
+
+    任何一个文件查询失败都会取消其他查询并抛出异常；提前退出迭代会取消还没有完成的查询。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str prefix: 文件名前缀
+    :param str sql: 查询语句
+    :param select_params: 参见 :meth:`AsyncBucket.select_object <ossx.AsyncBucket.select_object>` ，
+        对所有文件都相同，例如CompressionType
+    :param num_threads: 同时查询的文件数，如不指定则为 `bucket` 连接池的大小。
+    :param bool raw: 是否返回未解析的数据
+    :param str encoding: 输出的编码
+    :param int batch_size: 每个文件的结果攒够这么多字节后才切分和解析
+    :param int executor_threshold: 不小于这个大小的批在线程池中解析，默认不使用线程池
+    :param headers: HTTP头部
+    """
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    logger.debug(
+        "Start to select prefix, bucket: {0}, prefix: {1}, num_threads: {2}".format(
+            bucket.bucket_name, prefix, num_threads
+        )
+    )
+
+    async def producer(q):
+        async with ObjectIteratorV2(
+            bucket, prefix=prefix, max_keys=1000, headers=headers, prefetch=1
+        ) as it:
+            async for obj in it:
+                if not obj.key.endswith("/"):
+                    await q.put(obj.key)
+
+    async def consumer(q):
+        while True:
+            key = await q.get()
+            if key is None:
+                break
+
+            result = await bucket.select_object(key, sql, None, select_params, headers=headers)
+            async with result:
+                parser = SelectRecordParser(select_params, encoding)
+                async for batch in _iter_complete(result, parser, batch_size):
+                    if not raw:
+                        batch = await _run(parser.parse, batch, executor_threshold)
+                    await q.emit((key, batch))
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    async for key, batch in q.results():
+        if raw:
+            yield key, batch
+        else:
+            for record in batch:
+                yield key, record
@@ -0,0 +1,359 @@
+"""
+ossx.select_records
+~~~~~~~~~~~~~~~~~~~
+
+把 `select_object` 输出的字节流切分成完整的记录，按批解码为CSV行、JSON对象，或者转换为列。
+列式输出可选地使用NumPy或pyarrow。
+"""
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from oss2.exceptions import ClientError
+from oss2.select_params import SelectParameters
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:
+    pyarrow = None
+
+__all__ = ["SelectRecordParser", "SelectColumnParser", "iter_records", "iter_batches"]
+
+_BATCH_SIZE = 256 * 1024
+_BATCH_ROWS = 64 * 1024
+
+
+class SelectRecordParser(object):
+    """`select_object` 输出的记录解析器，记录和字段的分隔符取自 `select_params` 中的输出设置。
+
+    :meth:`cut` 从收到的数据中切出完整的记录，不完整的部分留到下一次；:meth:`parse` 把一批完整的记录
+    解码为CSV行（字符串列表）或者JSON对象。 :meth:`parse` 不修改解析器的状态，可以放到线程池中执行。
+
+    :param select_params: 调用 `select_object` 时使用的参数
+    :param str encoding: 输出的编码
+    """
+
+    def __init__(self, select_params: Optional[Dict[str, Any]] = None, encoding: str = "utf-8"):
+        select_params = select_params or {}
+        self.json = SelectParameters.Json_Type in select_params
+        self.encoding = encoding
+        self.record_delimiter = select_params.get(SelectParameters.OutputRecordDelimiter, "\n")
+        self.field_delimiter = select_params.get(SelectParameters.OutputFieldDelimiter, ",")
+        self.quote_character = select_params.get(SelectParameters.QuoteCharacter, '"')
+
+        self.__delimiter = self.record_delimiter.encode(encoding)
+        self.__quote = self.quote_character.encode(encoding)
+        self.__tail = b""
+
+    def cut(self, data: bytes, final: bool = False) -> bytes:
+        """把 `data` 接在上次剩余的数据之后，返回其中的完整记录。
+
+        CSV的引号中可以出现记录分隔符，最后一个分隔符之前的引号数为奇数时，这个分隔符在引号中，
+        整段数据都留到下一次。 `final` 为True时返回剩余的全部数据。
+        """
+        if self.__tail:
+            data = self.__tail + data
+        if final:
+            self.__tail = b""
+            return data
+
+        end = data.rfind(self.__delimiter)
+        if end >= 0 and not self.json and data.count(self.__quote, 0, end) % 2:
+            end = -1
+        if end < 0:
+            self.__tail = data
+            return b""
+
+        end += len(self.__delimiter)
+        self.__tail = data[end:]
+        return data[:end]
+
+    def parse(self, batch: bytes) -> List[Any]:
+        """把一批完整的记录解码为CSV行或者JSON对象的列表。"""
+        text = batch.decode(self.encoding)
+        if self.json:
+            lines = [line for line in text.split(self.record_delimiter) if line.strip()]
+            return json.loads("[" + ",".join(lines) + "]") if lines else []
+
+        if self.record_delimiter in ("\n", "\r\n"):
+            lines = io.StringIO(text, newline="")
+        else:
+            lines = text.split(self.record_delimiter)
+        reader = csv.reader(lines, delimiter=self.field_delimiter, quotechar=self.quote_character)
+        return [row for row in reader if row]
+
+
+class SelectColumnParser(SelectRecordParser):
+    """把CSV查询的输出按批转换为列。
+
+    `output` 为 ``"arrow"`` 时用 `pyarrow.csv` 解析，每批是一个 `pyarrow.Table` ；为 ``"numpy"`` 时每批是列名到
+    NumPy数组的dict，没有引号的数据整批切分成一个二维的字符串数组，每列整体转换类型，有引号时用 `csv` 模块切分；
+    为 ``"python"`` 时用 `csv` 模块切分，每批是列名到list的dict。默认按arrow、numpy、python的顺序选择已安装的库。
+
+    没有在 `dtypes` 中指定类型的列，由第一批数据推断类型，之后的批都使用同样的类型，和arrow一样，
+    之后的数据无法转换时抛出异常。numpy依次尝试int64、float64，都失败时为字符串，python依次尝试int、float、str。
+    空字段不参与推断，在numpy的浮点数列中为NaN，在python的数值列中为None；numpy的整数列不能表示空值，有空值的整数列
+    推断为float64，推断为int64之后再出现空值时抛出 :class:`ClientError <oss2.exceptions.ClientError>` 。
+
+    输出中带有表头（OutputHeader）时，第一行作为列名，否则列名为 ``_1`` 、 ``_2`` ……
+
+    :param column_names: 列名，指定时不使用表头
+    :param dtypes: 列名到类型的dict，arrow使用 `pyarrow.DataType` ，numpy使用 `numpy.dtype` ，
+        python使用类型转换函数
+    :param str output: ``"arrow"`` 、 ``"numpy"`` 或 ``"python"``
+    """
+
+    def __init__(
+        self,
+        select_params: Optional[Dict[str, Any]] = None,
+        encoding: str = "utf-8",
+        column_names: Optional[List[str]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        output: Optional[str] = None,
+    ):
+        super(SelectColumnParser, self).__init__(select_params, encoding)
+        if output is None:
+            output = "arrow" if pyarrow is not None else "numpy" if numpy is not None else "python"
+
+        if self.json:
+            raise ClientError("Columnar batches only support CSV output")
+        if output not in ("arrow", "numpy", "python"):
+            raise ClientError("Unsupported output: {0}".format(output))
+        if output == "arrow" and pyarrow is None or output == "numpy" and numpy is None:
+            raise ClientError("{0} is not installed".format(output))
+        if output == "arrow" and self.record_delimiter not in ("\n", "\r\n"):
+            raise ClientError("pyarrow only supports \\n or \\r\\n as the record delimiter")
+
+        self.output = output
+        self.column_names = column_names
+        self.dtypes = dict(dtypes or {})
+        output_header = (select_params or {}).get(SelectParameters.OutputHeader, False)
+        self.header = column_names is None and str(output_header).lower() == "true"
+
+    def take_header(self, batch: bytes) -> bytes:
+        """输出带有表头时，从第一批记录中取出列名，返回剩下的记录。"""
+        if not self.header:
+            return batch
+
+        end = batch.find(self.record_delimiter.encode(self.encoding))
+        end = len(batch) if end < 0 else end + len(self.record_delimiter.encode(self.encoding))
+        self.column_names = SelectRecordParser.parse(self, batch[:end])[0]
+        return batch[end:]
+
+    def parse(self, batch: bytes):
+        """把一批完整的记录解析为pyarrow.Table（arrow）、二维字符串数组（numpy）或者行的列表（python）。"""
+        if self.output == "numpy":
+            return self.__parse_numpy(batch)
+        if self.output == "python":
+            return super(SelectColumnParser, self).parse(batch)
+
+        read_options = pyarrow.csv.ReadOptions(
+            column_names=self.column_names,
+            autogenerate_column_names=self.column_names is None,
+            encoding=self.encoding,
+        )
+        parse_options = pyarrow.csv.ParseOptions(
+            delimiter=self.field_delimiter,
+            quote_char=self.quote_character,
+            newlines_in_values=True,
+        )
+        convert_options = pyarrow.csv.ConvertOptions(column_types=self.dtypes)
+        table = pyarrow.csv.read_csv(
+            io.BytesIO(batch), read_options, parse_options, convert_options
+        )
+        if self.column_names is None:
+            table = table.rename_columns(_default_names(table.num_columns))
+        return table
+
+    def __parse_numpy(self, batch):
+        text = batch.decode(self.encoding)
+        if self.quote_character not in text:
+            if text.endswith(self.record_delimiter):
+                text = text[: -len(self.record_delimiter)]
+            # 每行的字段数相同时，记录分隔符换成字段分隔符后一次切分，直接变形为二维数组
+            lines = text.split(self.record_delimiter)
+            counts = list(map(str.count, lines, itertools.repeat(self.field_delimiter)))
+            if text and counts.count(counts[0]) == len(counts):
+                fields = text.replace(self.record_delimiter, self.field_delimiter).split(
+                    self.field_delimiter
+                )
+                return numpy.array(fields).reshape(len(lines), -1)
+
+        rows = super(SelectColumnParser, self).parse(batch)
+        if not rows:
+            return numpy.empty((0, 0), dtype=str)
+        if len(set(map(len, rows))) > 1:
+            raise ClientError("Records have different numbers of fields")
+        return numpy.array(rows, dtype=str)
+
+    def fix_types(self, part):
+        """arrow用第一批推断出的列名和类型解析之后的批，numpy和python在 :meth:`make_batch` 中记录类型。"""
+        if self.output == "arrow":
+            if self.column_names is None:
+                self.column_names = part.column_names
+            for field in part.schema:
+                self.dtypes.setdefault(field.name, field.type)
+
+    def num_rows(self, part) -> int:
+        return part.num_rows if self.output == "arrow" else len(part)
+
+    def make_batch(self, parts: list, n: int):
+        """从 `parts` 中取出前 `n` 行作为一批，返回 (这一批的列, 剩余的parts)。"""
+        if self.output == "arrow":
+            table = pyarrow.concat_tables(parts) if len(parts) > 1 else parts[0]
+            return table.slice(0, n), [table.slice(n)]
+
+        parts = [part for part in parts if len(part)]
+        if self.output == "numpy":
+            if len(set(part.shape[1] for part in parts)) > 1:
+                raise ClientError("Records have different numbers of fields")
+            table = numpy.concatenate(parts) if len(parts) > 1 else parts[0]
+            values, rest = table[:n].T, table[n:]
+            infer, convert = _infer_numpy, _to_numpy
+        else:
+            rows = parts[0] if len(parts) == 1 else [row for part in parts for row in part]
+            if len(set(map(len, rows[:n]))) > 1:
+                raise ClientError("Records have different numbers of fields")
+            values, rest = list(zip(*rows[:n])), rows[n:]
+            infer, convert = _infer_list, _to_list
+
+        self.column_names = self.column_names or _default_names(len(values))
+        if len(values) != len(self.column_names):
+            raise ClientError(
+                "Expected {0} fields, got {1}".format(len(self.column_names), len(values))
+            )
+        columns = {}
+        for name, column in zip(self.column_names, values):
+            if name in self.dtypes:
+                columns[name] = convert(name, column, self.dtypes[name])
+            else:
+                self.dtypes[name], columns[name] = infer(name, column)
+        return columns, [rest]
+
+
+def _default_names(count):
+    return ["_{0}".format(i + 1) for i in range(count)]
+
+
+def _infer_numpy(name, column):
+    """返回推断出的类型和转换后的列。"""
+    dtypes = (numpy.float64,) if (column == "").any() else (numpy.int64, numpy.float64)
+    for dtype in dtypes:
+        try:
+            return numpy.dtype(dtype), _to_numpy(name, column, dtype)
+        except ValueError:
+            pass
+    return numpy.dtype(str), column
+
+
+def _to_numpy(name, column, dtype):
+    dtype = numpy.dtype(dtype)
+    missing = column == ""
+    if missing.any():
+        if dtype.kind == "f":
+            column = numpy.where(missing, "nan", column)
+        elif dtype.kind in "iub":
+            raise ClientError("Column {0} has empty values but its type is {1}".format(name, dtype))
+    return column.astype(dtype)
+
+
+def _infer_list(name, column):
+    for dtype in (int, float):
+        try:
+            return dtype, _to_list(name, column, dtype)
+        except ValueError:
+            pass
+    return str, list(column)
+
+
+def _to_list(name, column, dtype):
+    if dtype is str:
+        return list(column)
+    return [None if value == "" else dtype(value) for value in column]
+
+
+async def iter_records(
+    chunks: AsyncIterable[bytes],
+    parser: SelectRecordParser,
+    batch_size: int = _BATCH_SIZE,
+    executor_threshold: Optional[int] = None,
+) -> AsyncIterator[Any]:
+    """逐条返回 `chunks` 中的记录。
+
+    收到的数据攒够 `batch_size` 个字节后才切分和解析一次；一批数据不小于 `executor_threshold` 时，
+    在默认的线程池中解析，避免阻塞事件循环。
+    """
+    async for batch in _iter_complete(chunks, parser, batch_size):
+        for record in await _run(parser.parse, batch, executor_threshold):
+            yield record
+
+
+async def iter_batches(
+    chunks: AsyncIterable[bytes],
+    parser: SelectColumnParser,
+    batch_rows: int = _BATCH_ROWS,
+    batch_size: int = _BATCH_SIZE,
+    executor_threshold: Optional[int] = None,
+) -> AsyncIterator[Any]:
+    """把 `chunks` 中的记录按 `batch_rows` 行一批转换为列，最后一批可能不足 `batch_rows` 行，
+    参见 :class:`SelectColumnParser` 。 `batch_size` 和 `executor_threshold` 的含义与 :func:`iter_records` 相同。
+    """
+    parts = []
+    rows = 0
+    first = True
+    async for batch in _iter_complete(chunks, parser, batch_size):
+        if first:
+            batch = parser.take_header(batch)
+            first = False
+            if not batch:
+                continue
+
+        part = await _run(parser.parse, batch, executor_threshold)
+        parser.fix_types(part)
+        parts.append(part)
+        rows += parser.num_rows(part)
+        while rows >= batch_rows:
+            columns, parts = parser.make_batch(parts, batch_rows)
+            rows -= batch_rows
+            yield columns
+
+    if rows:
+        columns, _ = parser.make_batch(parts, rows)
+        yield columns
+
+
+async def _iter_complete(chunks: AsyncIterable[bytes], parser: SelectRecordParser, batch_size: int):
+    """把 `chunks` 攒成不小于 `batch_size` 的批，返回每批中的完整记录。"""
+    pending = []
+    size = 0
+    async for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size < batch_size:
+            continue
+
+        batch = parser.cut(b"".join(pending))
+        pending.clear()
+        size = 0
+        if batch:
+            yield batch
+
+    batch = parser.cut(b"".join(pending), final=True)
+    if batch:
+        yield batch
+
+
+async def _run(func, batch: bytes, executor_threshold: Optional[int]):
+    if executor_threshold is not None and len(batch) >= executor_threshold:
+        return await asyncio.get_running_loop().run_in_executor(None, func, batch)
+    return func(batch)
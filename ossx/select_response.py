@@ -14,8 +14,41 @@ from ._http import AwaitResponse
 
 __all__ = ["AsyncSelectResponseAdapter"]
 
+# Type | Payload Length | Header Checksum | Offset（Payload的前8个字节），帧类型的最高字节是版本号
+_FRAME_HEADER = struct.Struct(">IIIQ")
+_UINT32 = struct.Struct(">I")
+# End Frame的Payload（Offset之后）: Total Scanned Bytes | Status
+_END_FRAME = struct.Struct(">QI")
+# Meta End Frame的Payload（Offset之后）: Total Scanned Bytes | Status | Splits | Rows
+_META_END_FRAME = struct.Struct(">QIIQ")
+
+_FRAME_TYPE_MASK = 0x00FFFFFF
+_FRAME_TYPES = frozenset(
+    [
+        SelectResponseAdapter._DATA_FRAME_TYPE,
+        SelectResponseAdapter._CONTINIOUS_FRAME_TYPE,
+        SelectResponseAdapter._END_FRAME_TYPE,
+        SelectResponseAdapter._META_END_FRAME_TYPE,
+        SelectResponseAdapter._JSON_META_END_FRAME_TYPE,
+    ]
+)
+
+
+def _split_error_message(error_msg):
+    error_code = b""
+    error_code_index = error_msg.find(b".")
+    if 0 <= error_code_index < len(error_msg) - 1:
+        error_code = error_msg[0:error_code_index]
+        error_msg = error_msg[error_code_index + 1 :]
+    return error_code, error_msg
+
 
 class AsyncSelectResponseAdapter(SelectResponseAdapter):
+    """`select_object` 响应的解析器，帧格式参见 :mod:`oss2.select_response` 。
+
+    帧头部直接从 :class:`AwaitResponse <ossx._http.AwaitResponse>` 的缓冲区中读取并按大端序解析，
+    Data Frame的数据只从网络数据中复制一次（恰好是一整块时不复制）。
+    """
 
     def __init__(
         self,
@@ -35,11 +68,7 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
             self.finished = True
             return b""
 
-        content = b""
-        async for data in self:
-            content += data
-
-        return content
+        return b"".join([data async for data in self])
 
     def __aiter__(self):
         return self
@@ -57,7 +86,9 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
 
         while self.finished == 0:
             if self.frame_off_set < self.frame_length:
-                data = self.frame_data[self.frame_off_set : self.frame_length]
+                data = self.frame_data
+                if self.frame_off_set != 0 or self.frame_length != len(data):
+                    data = data[self.frame_off_set : self.frame_length]
                 self.frame_length = self.frame_off_set = 0
                 return data
             else:
@@ -78,54 +109,24 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
         raise StopAsyncIteration
 
     async def read_raw(self, amt):
-        ret = b""
-        read_count = 0
-        while amt > 0 and self.finished == 0:
-            size = len(self.raw_buffer)
-            if size == 0:
-                try:
-                    self.raw_buffer = await self.resp_content_iter.__anext__()
-                    self.raw_buffer_offset = 0
-                    size = len(self.raw_buffer)
-                    if size == 0:
-                        break
-                except StopAsyncIteration:
-                    break
-
-            if size - self.raw_buffer_offset >= amt:
-                data = self.raw_buffer[self.raw_buffer_offset : self.raw_buffer_offset + amt]
-                data_size = len(data)
-                self.raw_buffer_offset += data_size
-                ret += data
-                read_count += data_size
-                amt -= data_size
-            else:
-                data = self.raw_buffer[self.raw_buffer_offset :]
-                data_len = len(data)
-                ret += data
-                read_count += data_len
-                amt -= data_len
-                self.raw_buffer = b""
+        if self.finished:
+            return b""
+        return await self.response.read(amt)
 
-        return ret
+    async def _read_exactly(self, amt):
+        data = await self.response.read(amt)
+        if len(data) != amt:
+            raise SelectOperationClientError(
+                self.request_id,
+                "Incomplete select response, expected {0} bytes, got {1}".format(amt, len(data)),
+            )
+        return data
 
     async def read_next_frame(self):
-        frame_type = bytearray(await self.read_raw(4))
-        payload_length = bytearray(await self.read_raw(4))
-        utils.change_endianness_if_needed(payload_length)  # convert to little endian
-        payload_length_val = struct.unpack("I", bytes(payload_length))[0]
-        header_checksum = bytearray(await self.read_raw(4))
-
-        frame_type[0] = 0  # mask the version bit
-        utils.change_endianness_if_needed(frame_type)  # convert to little endian
-        frame_type_val = struct.unpack("I", bytes(frame_type))[0]
-        if (
-            frame_type_val != SelectResponseAdapter._DATA_FRAME_TYPE
-            and frame_type_val != SelectResponseAdapter._CONTINIOUS_FRAME_TYPE
-            and frame_type_val != SelectResponseAdapter._END_FRAME_TYPE
-            and frame_type_val != SelectResponseAdapter._META_END_FRAME_TYPE
-            and frame_type_val != SelectResponseAdapter._JSON_META_END_FRAME_TYPE
-        ):
+        header = await self._read_exactly(_FRAME_HEADER.size)
+        frame_type_val, payload_length_val, _, self.file_offset = _FRAME_HEADER.unpack(header)
+        frame_type_val &= _FRAME_TYPE_MASK  # mask the version byte
+        if frame_type_val not in _FRAME_TYPES:
             logger.warning(
                 f"Unexpected frame type: {frame_type_val}. RequestId:{self.request_id}."
                 f" This could be due to the old version of client."
@@ -134,20 +135,19 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
                 self.request_id, "Unexpected frame type:" + str(frame_type_val)
             )
 
-        self.payload = await self.read_raw(payload_length_val)
-        file_offset_bytes = bytearray(self.payload[0:8])
-        utils.change_endianness_if_needed(file_offset_bytes)
-        self.file_offset = struct.unpack("Q", bytes(file_offset_bytes))[0]
+        # the rest of the payload after the 8 bytes offset, followed by the payload checksum
+        self.payload = await self._read_exactly(payload_length_val - 8)
+        checksum = await self._read_exactly(_UINT32.size)
+
         if frame_type_val == SelectResponseAdapter._DATA_FRAME_TYPE:
-            self.frame_length = payload_length_val - 8
+            self.frame_length = len(self.payload)
             self.frame_off_set = 0
             self.check_sum_flag = 1
-            self.frame_data = self.payload[8:]
-            checksum = bytearray(await self.read_raw(4))  # read checksum crc32
-            utils.change_endianness_if_needed(checksum)
-            checksum_val = struct.unpack("I", bytes(checksum))[0]
+            self.frame_data = self.payload
             if self.enable_crc:
+                checksum_val = _UINT32.unpack(checksum)[0]
                 crc32 = utils.Crc32()
+                crc32.update(header[12:])
                 crc32.update(self.payload)
                 checksum_calc = crc32.crc
                 if checksum_val != checksum_calc:
@@ -167,22 +167,10 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
         elif frame_type_val == SelectResponseAdapter._CONTINIOUS_FRAME_TYPE:
             self.frame_length = self.frame_off_set = 0
             self.check_sum_flag = 1
-            await self.read_raw(4)
         elif frame_type_val == SelectResponseAdapter._END_FRAME_TYPE:
             self.frame_off_set = 0
-            scanned_size_bytes = bytearray(self.payload[8:16])
-            status_bytes = bytearray(self.payload[16:20])
-            utils.change_endianness_if_needed(status_bytes)
-            status = struct.unpack("I", bytes(status_bytes))[0]
-            error_msg_size = payload_length_val - 20
-            error_msg = b""
-            error_code = b""
-            if error_msg_size > 0:
-                error_msg = self.payload[20 : error_msg_size + 20]
-                error_code_index = error_msg.find(b".")
-                if error_code_index >= 0 and error_code_index < error_msg_size - 1:
-                    error_code = error_msg[0:error_code_index]
-                    error_msg = error_msg[error_code_index + 1 :]
+            _, status = _END_FRAME.unpack_from(self.payload)
+            error_code, error_msg = _split_error_message(self.payload[_END_FRAME.size :])
 
             if status // 100 != 2:
                 raise SelectOperationFailed(status, error_code, error_msg)
@@ -192,46 +180,19 @@ class AsyncSelectResponseAdapter(SelectResponseAdapter):
                     await self.callback(self.file_offset, self.content_length)
                 else:
                     self.callback(self.file_offset, self.content_length)
-            await self.read_raw(4)  # read the payload checksum
-            self.frame_length = 0
             self.finished = 1
-        elif (
-            frame_type_val == SelectResponseAdapter._META_END_FRAME_TYPE
-            or frame_type_val == SelectResponseAdapter._JSON_META_END_FRAME_TYPE
-        ):
+        else:
             self.frame_off_set = 0
-            scanned_size_bytes = bytearray(self.payload[8:16])
-            status_bytes = bytearray(self.payload[16:20])
-            utils.change_endianness_if_needed(status_bytes)
-            status = struct.unpack("I", bytes(status_bytes))[0]
-            splits_bytes = bytearray(self.payload[20:24])
-            utils.change_endianness_if_needed(splits_bytes)
-            self.splits = struct.unpack("I", bytes(splits_bytes))[0]
-            lines_bytes = bytearray(self.payload[24:32])
-            utils.change_endianness_if_needed(lines_bytes)
-            self.rows = struct.unpack("Q", bytes(lines_bytes))[0]
-
-            error_index = 36
+            _, status, self.splits, self.rows = _META_END_FRAME.unpack_from(self.payload)
+
+            error_index = _META_END_FRAME.size
             if frame_type_val == SelectResponseAdapter._META_END_FRAME_TYPE:
-                column_bytes = bytearray(self.payload[32:36])
-                utils.change_endianness_if_needed(column_bytes)
-                self.columns = struct.unpack("I", bytes(column_bytes))[0]
-            else:
-                error_index = 32
-
-            error_size = payload_length_val - error_index
-            error_msg = b""
-            error_code = b""
-            if error_size > 0:
-                error_msg = self.payload[error_index : error_index + error_size]
-                error_code_index = error_msg.find(b".")
-                if error_code_index >= 0 and error_code_index < error_size - 1:
-                    error_code = error_msg[0:error_code_index]
-                    error_msg = error_msg[error_code_index + 1 :]
-
-            await self.read_raw(4)  # read the payload checksum
+                self.columns = _UINT32.unpack_from(self.payload, error_index)[0]
+                error_index += _UINT32.size
+            error_code, error_msg = _split_error_message(self.payload[error_index:])
+
             self.final_status = status
             self.frame_length = 0
             self.finished = 1
-            if status / 100 != 2:
+            if status // 100 != 2:
                 raise SelectOperationFailed(status, error_code, error_msg)
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue(object):
+    """:class:`oss2.task_queue.TaskQueue` 的协程版本。
+
+    生产者协程通过 :meth:`put` 投递任务，若干消费者协程通过 :meth:`get` 领取任务，
+    队列为空且生产者结束后，每个消费者都会拿到一个 ``None`` 作为结束标志。
+    任意一个生产者或消费者抛出异常，其余协程都会被取消，异常由 :meth:`run` 重新抛出。
+
+    除了用 :meth:`run` 等待全部完成，也可以用 :meth:`results` 运行队列，消费者通过 :meth:`emit`
+    提交的结果会边运行边返回给调用者。
+
+    :param producer: 生产者，形如 ``async def producer(q)``
+    :param consumers: 消费者列表，形如 ``async def consumer(q)``
+    :param int maxsize: 任务队列的最大长度，0表示不限制。限制长度可以让生产者在消费者跟不上时等待。
+    """
+
+    def __init__(self, producer, consumers, maxsize=0):
+        self.__producer = producer
+        self.__consumers = consumers
+        self.__maxsize = maxsize
+
+        self.__queue = None
+        self.__results = None
+        self.__closed = False
+
+    async def run(self):
+        self.__queue = asyncio.Queue(self.__maxsize)
+
+        tasks = [asyncio.ensure_future(self.__producer_func())]
+        for c in self.__consumers:
+            tasks.append(asyncio.ensure_future(c(self)))
+
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for t in tasks:
+            if not t.cancelled() and t.exception() is not None:
+                logger.error(
+                    "An exception was thrown by producer or consumer: {0!r}".format(t.exception())
+                )
+                raise t.exception()
+
+    async def results(self):
+        """运行队列，以异步迭代器的形式逐个返回消费者通过 :meth:`emit` 提交的结果。
+
+        结果队列的长度和消费者个数相同，调用者来不及处理时，消费者会在 :meth:`emit` 处等待。
+        提前退出迭代时，生产者和消费者都会被取消。
+        """
+        self.__results = asyncio.Queue(max(len(self.__consumers), 1))
+        runner = asyncio.ensure_future(self.__run_to_results())
+        try:
+            while True:
+                data = await self.__results.get()
+                if data is None:
+                    break
+                yield data
+
+            await runner
+        finally:
+            self.__closed = True
+            if not runner.done():
+                runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+    async def emit(self, data):
+        assert data is not None
+        await self.__results.put(data)
+
+    async def put(self, data):
+        assert data is not None
+        await self.__queue.put(data)
+
+    async def get(self):
+        return await self.__queue.get()
+
+    async def __producer_func(self):
+        await self.__producer(self)
+        for i in range(len(self.__consumers)):
+            await self.__queue.put(None)
+
+    async def __run_to_results(self):
+        try:
+            await self.run()
+        finally:
+            if not self.__closed:
+                await self.__results.put(None)
@@ -0,0 +1,619 @@
+"""
+ossx.transfer
+~~~~~~~~~~~~~
+
+在本地目录和OSS前缀之间并发地批量传输、同步文件，以及并发地删除前缀下的所有文件。
+
+传输结果以异步迭代器的形式逐个返回，单个文件失败不会影响其他文件，失败原因记录在对应的
+:class:`FileTransferResult` 中。
+"""
+
+import asyncio
+import logging
+import os
+import random
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Union
+
+import aiofiles.os
+import httpx
+from aiofiles.os import wrap
+from oss2 import defaults, exceptions, utils
+from oss2.compat import to_string
+
+from . import _http as http
+from .iterators import ObjectIteratorV2
+from .resumable import resumable_download, resumable_upload
+from .task_queue import TaskQueue
+
+if TYPE_CHECKING:
+    from .bucket import AsyncBucket
+
+logger = logging.getLogger(__name__)
+
+
+class FileTransferResult(object):
+    """单个文件的传输结果。
+
+    :param str key: OSS上的文件名
+    :param str filename: 本地文件名
+    :param result: 成功时为对应请求的结果，例如 :class:`PutObjectResult <oss2.models.PutObjectResult>`
+    :param exception: 失败时为抛出的异常，成功时为None
+    :param bool skipped: 本地文件和OSS文件已经一致，因而没有传输
+    :param action: 同步时执行的操作，参见 :class:`SyncAction`
+    """
+
+    def __init__(self, key, filename, result=None, exception=None, skipped=False, action=None):
+        self.key = key
+        self.filename = filename
+        self.result = result
+        self.exception = exception
+        self.skipped = skipped
+        self.action = action
+
+    @property
+    def ok(self):
+        return self.exception is None
+
+    def __repr__(self):
+        return "<FileTransferResult key={0!r} filename={1!r} ok={2} skipped={3}>".format(
+            self.key, self.filename, self.ok, self.skipped
+        )
+
+
+def _scandir(path):
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir() and not entry.is_symlink():
+                entries.append((entry.name, None))
+            elif entry.is_file():
+                entries.append((entry.name, entry.stat()))
+    return sorted(entries, key=lambda e: e[0])
+
+
+_async_scandir = wrap(_scandir)
+
+
+def _file_crc64(filename, block_size=1024 * 1024):
+    crc = utils.Crc64(0)
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            crc.update(block)
+    return crc.crc
+
+
+_async_file_crc64 = wrap(_file_crc64)
+_utime = wrap(os.utime)
+
+
+async def _walk_files(local_dir):
+    """深度优先地遍历 `local_dir` 下的文件，返回相对路径（以 ``/`` 分隔）和 `os.stat_result` 。
+
+    不进入指向目录的符号链接，跳过套接字等非普通文件。
+    """
+    dirs = [""]
+    while dirs:
+        rel_dir = dirs.pop()
+        entries = await _async_scandir(os.path.join(local_dir, rel_dir))
+        sub_dirs = []
+        for name, stat in entries:
+            rel_path = rel_dir + name
+            if stat is None:
+                sub_dirs.append(rel_path + "/")
+            else:
+                yield rel_path, stat
+        dirs.extend(reversed(sub_dirs))
+
+
+def _local_path(local_dir, prefix, key):
+    return os.path.normpath(os.path.join(local_dir, *key[len(prefix) :].split("/")))
+
+
+def _check_local_path(local_dir, key, filename):
+    """文件名中可能含有 ``..`` ，本地目录中也可能有符号链接，解析之后的路径必须仍在 `local_dir` 下。"""
+    real_dir = os.path.realpath(local_dir)
+    if os.path.commonpath([real_dir, os.path.realpath(filename)]) != real_dir:
+        raise exceptions.ClientError("Key: {0} is outside of local_dir: {1}".format(key, local_dir))
+
+
+async def _download_to_file(bucket, obj, filename, mtime, multiget_threshold, part_size, headers):
+    """下载 `obj` 到 `filename` ，并把本地文件的修改时间设置为 `mtime` 。"""
+    await aiofiles.os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if obj.size >= multiget_threshold:
+        result = await resumable_download(
+            bucket,
+            obj.key,
+            filename,
+            multiget_threshold=multiget_threshold,
+            part_size=part_size,
+            num_threads=1,
+            headers=headers,
+        )
+    else:
+        result = await bucket.get_object_to_file(obj.key, filename, headers=headers)
+    await _utime(filename, (mtime, mtime))
+    return result
+
+
+async def upload_directory(
+    bucket: "AsyncBucket",
+    local_dir: Union[str, Path],
+    prefix: str = "",
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+    multipart_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[FileTransferResult]:
+    """把本地目录 `local_dir` 下的所有文件并发上传到 `prefix` 下。
+
+    文件名为 `prefix` 加上文件相对于 `local_dir` 的路径，路径分隔符统一为 ``/`` 。遍历目录和上传文件同时进行，
+    最多有 `num_threads` 个文件在上传，同时打开的文件数也因此受限。每个文件通过 :func:`resumable_upload
+    <ossx.resumable.resumable_upload>` 上传，长度大于等于 `multipart_threshold` 的文件使用分片上传，
+    同一个文件的分片依次上传，因此同时进行的上传请求最多为 `num_threads` 个。
+
+    每上传完一个文件（无论成功与否）就返回一个 :class:`FileTransferResult` ，返回顺序与完成顺序一致。
+    提前退出迭代会取消还没有完成的上传。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param local_dir: 本地目录
+    :param str prefix: OSS上的文件名前缀，通常以 ``/`` 结尾
+    :param headers: 每个文件的HTTP头部，参见 :func:`resumable_upload <ossx.resumable.resumable_upload>`
+    :param multipart_threshold: 文件长度大于等于该值时，则用分片上传。
+    :param part_size: 分片上传的分片大小。
+    :param num_threads: 同时上传的文件数，如不指定则为 `bucket` 连接池的大小。
+    :param params: HTTP请求参数，参见 :func:`resumable_upload <ossx.resumable.resumable_upload>`
+    """
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    local_dir = to_string(os.fspath(local_dir))
+    logger.debug(
+        "Start to upload directory, bucket: {0}, local_dir: {1}, prefix: {2}, num_threads: {3}".format(
+            bucket.bucket_name, local_dir, prefix, num_threads
+        )
+    )
+
+    async def producer(q):
+        async for rel_path, _ in _walk_files(local_dir):
+            await q.put(rel_path)
+
+    async def consumer(q):
+        while True:
+            rel_path = await q.get()
+            if rel_path is None:
+                break
+
+            key = prefix + rel_path
+            filename = os.path.join(local_dir, *rel_path.split("/"))
+            try:
+                result = await resumable_upload(
+                    bucket,
+                    key,
+                    filename,
+                    headers=headers,
+                    multipart_threshold=multipart_threshold,
+                    part_size=part_size,
+                    num_threads=1,
+                    params=params,
+                )
+            except Exception as e:
+                logger.warning("Upload file failed, file: {0}, error: {1!r}".format(filename, e))
+                await q.emit(FileTransferResult(key, filename, exception=e))
+            else:
+                await q.emit(FileTransferResult(key, filename, result=result))
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    async for r in q.results():
+        yield r
+
+
+async def download_directory(
+    bucket: "AsyncBucket",
+    prefix: str,
+    local_dir: Union[str, Path],
+    multiget_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    check_crc: bool = False,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> AsyncIterator[FileTransferResult]:
+    """把 `prefix` 下的所有文件并发下载到本地目录 `local_dir` ，可以用来把OSS上的目录镜像到本地。
+
+    本地文件名为 `local_dir` 加上文件名去掉 `prefix` 后的部分。列举文件和下载文件同时进行，最多有 `num_threads`
+    个文件在下载。长度大于等于 `multiget_threshold` 的文件通过 :func:`resumable_download
+    <ossx.resumable.resumable_download>` 分片下载，同一个文件的分片依次下载；其他文件通过 `get_object_to_file` 下载。
+
+    下载完成后，本地文件的修改时间会被设置为OSS文件的最后修改时间。再次下载时，如果本地文件的长度和修改时间
+    都与OSS文件一致，则跳过该文件；如果只有长度一致且 `check_crc` 为True，则比较本地文件和OSS文件的CRC64，
+    一致时同样跳过。
+
+    每处理完一个文件（无论下载、跳过还是失败）就返回一个 :class:`FileTransferResult` ，返回顺序与完成顺序一致。
+    以 ``/`` 结尾的文件被视为目录，只在本地创建对应的目录，不返回结果。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str prefix: OSS上的文件名前缀，通常以 ``/`` 结尾
+    :param local_dir: 本地目录
+    :param multiget_threshold: 文件长度大于等于该值时，则用分片下载。
+    :param part_size: 分片下载的分片大小。
+    :param num_threads: 同时下载的文件数，如不指定则为 `bucket` 连接池的大小。
+    :param bool check_crc: 长度一致而修改时间不一致时，是否通过CRC64判断文件是否一致。
+    :param headers: 下载文件时的HTTP头部
+    """
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    multiget_threshold = defaults.get(multiget_threshold, defaults.multiget_threshold)
+    local_dir = os.path.abspath(to_string(os.fspath(local_dir)))
+    logger.debug(
+        "Start to download directory, bucket: {0}, prefix: {1}, local_dir: {2}, num_threads: {3}".format(
+            bucket.bucket_name, prefix, local_dir, num_threads
+        )
+    )
+
+    async def producer(q):
+        async with ObjectIteratorV2(
+            bucket, prefix=prefix, max_keys=1000, headers=headers, prefetch=1
+        ) as it:
+            async for obj in it:
+                await q.put(obj)
+
+    async def consumer(q):
+        while True:
+            obj = await q.get()
+            if obj is None:
+                break
+
+            filename = _local_path(local_dir, prefix, obj.key)
+            try:
+                result = await _download_file(obj, filename)
+            except Exception as e:
+                logger.warning("Download file failed, key: {0}, error: {1!r}".format(obj.key, e))
+                await q.emit(FileTransferResult(obj.key, filename, exception=e))
+            else:
+                if result is not None:
+                    await q.emit(result)
+
+    async def _download_file(obj, filename):
+        _check_local_path(local_dir, obj.key, filename)
+        if obj.key.endswith("/") or filename == local_dir:
+            await aiofiles.os.makedirs(filename, exist_ok=True)
+            return None
+
+        if await _is_same_file(obj, filename):
+            logger.debug("Skip downloading unchanged file, key: {0}".format(obj.key))
+            return FileTransferResult(obj.key, filename, skipped=True)
+
+        result = await _download_to_file(
+            bucket, obj, filename, obj.last_modified, multiget_threshold, part_size, headers
+        )
+        return FileTransferResult(obj.key, filename, result=result)
+
+    async def _is_same_file(obj, filename):
+        try:
+            stat = await aiofiles.os.stat(filename)
+        except FileNotFoundError:
+            return False
+
+        if stat.st_size != obj.size:
+            return False
+        if int(stat.st_mtime) == obj.last_modified:
+            return True
+        if not check_crc:
+            return False
+
+        meta = await bucket.head_object(obj.key, headers=headers)
+        if meta.server_crc is None or meta.server_crc != await _async_file_crc64(filename):
+            return False
+
+        await _utime(filename, (obj.last_modified, obj.last_modified))
+        return True
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    async for r in q.results():
+        yield r
+
+
+_MTIME_META = "x-oss-meta-mtime"
+
+
+class SyncAction(object):
+    """同步时需要对单个文件执行的操作。
+
+    :param str action: 操作类型，取值为 :attr:`UPLOAD` 、 :attr:`DOWNLOAD` 、 :attr:`DELETE_REMOTE` 、
+        :attr:`DELETE_LOCAL` 之一
+    :param str key: OSS上的文件名
+    :param str filename: 本地文件名
+    :param str reason: 执行该操作的原因，取值为missing（目标端不存在）、size（长度不一致）、
+        mtime（修改时间不一致）、crc（CRC64不一致）、extra（源端不存在）之一
+    """
+
+    UPLOAD = "upload"
+    DOWNLOAD = "download"
+    DELETE_REMOTE = "delete_remote"
+    DELETE_LOCAL = "delete_local"
+
+    def __init__(self, action, key, filename, reason):
+        self.action = action
+        self.key = key
+        self.filename = filename
+        self.reason = reason
+
+    def __repr__(self):
+        return "<SyncAction {0} key={1!r} filename={2!r} reason={3}>".format(
+            self.action, self.key, self.filename, self.reason
+        )
+
+
+async def sync_directory(
+    bucket: "AsyncBucket",
+    local_dir: Union[str, Path],
+    prefix: str,
+    direction: str = SyncAction.UPLOAD,
+    delete: bool = False,
+    dry_run: bool = False,
+    check_crc: bool = False,
+    num_threads: Optional[int] = None,
+    multipart_threshold: Optional[int] = None,
+    multiget_threshold: Optional[int] = None,
+    part_size: Optional[int] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> AsyncIterator[Union[SyncAction, FileTransferResult]]:
+    """以rsync的方式同步本地目录 `local_dir` 和OSS上的 `prefix` ，只传输有差异的文件。
+
+    `direction` 为 ``"upload"`` 时以本地目录为准，为 ``"download"`` 时以OSS为准。先遍历本地目录，
+    再列举 `prefix` 下的文件，逐个比较两端同名的文件：
+
+    - 目标端不存在，或者长度不一致的文件需要传输；
+    - 长度一致时比较修改时间。上传时会把本地文件的修改时间（精确到秒以下）保存在OSS文件的 ``x-oss-meta-mtime`` 中，
+      下载时会把本地文件的修改时间设置为OSS文件的最后修改时间，两者之一与本地文件的修改时间相同即认为文件一致。
+      除了下载时OSS文件的最后修改时间可以直接从列举结果中得到，其他情况都需要一次 `head_object` ；
+    - 修改时间不一致且 `check_crc` 为True时，比较本地文件和OSS文件的CRC64（ ``x-oss-hash-crc64ecma`` ），
+      一致时不传输。
+
+    `delete` 为True时，删除只存在于目标端的文件。比较和传输都由 `num_threads` 个协程并发进行，
+    同一个文件的分片依次传输。
+
+    `dry_run` 为True时不做任何修改，只逐个返回需要执行的 :class:`SyncAction` ；否则执行这些操作，并逐个返回
+    :class:`FileTransferResult` ，其 `action` 属性为对应的 :class:`SyncAction` 。已经一致的文件不会返回。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param local_dir: 本地目录
+    :param str prefix: OSS上的文件名前缀，通常以 ``/`` 结尾
+    :param str direction: 同步方向， ``"upload"`` 或 ``"download"``
+    :param bool delete: 是否删除只存在于目标端的文件
+    :param bool dry_run: 只返回需要执行的操作，不做任何修改
+    :param bool check_crc: 长度一致而修改时间不一致时，是否通过CRC64判断文件是否一致。
+    :param num_threads: 同时处理的文件数，如不指定则为 `bucket` 连接池的大小。
+    :param multipart_threshold: 上传时文件长度大于等于该值时，则用分片上传。
+    :param multiget_threshold: 下载时文件长度大于等于该值时，则用分片下载。
+    :param part_size: 分片上传、下载的分片大小。
+    :param headers: 上传、下载文件时的HTTP头部
+    """
+    if direction not in (SyncAction.UPLOAD, SyncAction.DOWNLOAD):
+        raise exceptions.ClientError("Invalid sync direction: {0}".format(direction))
+
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    multiget_threshold = defaults.get(multiget_threshold, defaults.multiget_threshold)
+    local_dir = os.path.abspath(to_string(os.fspath(local_dir)))
+    logger.debug(
+        "Start to sync directory, bucket: {0}, local_dir: {1}, prefix: {2}, direction: {3}, "
+        "delete: {4}, dry_run: {5}".format(
+            bucket.bucket_name, local_dir, prefix, direction, delete, dry_run
+        )
+    )
+
+    async def producer(q):
+        local_files = {}
+        if os.path.isdir(local_dir):
+            async for rel_path, stat in _walk_files(local_dir):
+                local_files[rel_path] = stat
+
+        async with ObjectIteratorV2(
+            bucket, prefix=prefix, max_keys=1000, headers=headers, prefetch=1
+        ) as it:
+            async for obj in it:
+                if obj.key.endswith("/"):
+                    continue
+                await q.put((obj.key, local_files.pop(obj.key[len(prefix) :], None), obj))
+
+        for rel_path, stat in local_files.items():
+            await q.put((prefix + rel_path, stat, None))
+
+    async def consumer(q):
+        while True:
+            item = await q.get()
+            if item is None:
+                break
+
+            key, stat, obj = item
+            filename = _local_path(local_dir, prefix, key)
+            try:
+                _check_local_path(local_dir, key, filename)
+                action = await _compare(key, filename, stat, obj)
+            except Exception as e:
+                logger.warning("Compare file failed, key: {0}, error: {1!r}".format(key, e))
+                await q.emit(FileTransferResult(key, filename, exception=e))
+                continue
+
+            if action is None:
+                continue
+            if dry_run:
+                await q.emit(action)
+                continue
+
+            try:
+                result = await _apply(action, stat, obj)
+            except Exception as e:
+                logger.warning("Sync file failed, {0!r}, error: {1!r}".format(action, e))
+                await q.emit(FileTransferResult(key, filename, exception=e, action=action))
+            else:
+                await q.emit(FileTransferResult(key, filename, result=result, action=action))
+
+    async def _compare(key, filename, stat, obj):
+        if direction == SyncAction.UPLOAD:
+            if stat is None:
+                return (
+                    SyncAction(SyncAction.DELETE_REMOTE, key, filename, "extra") if delete else None
+                )
+            if obj is None:
+                return SyncAction(SyncAction.UPLOAD, key, filename, "missing")
+        else:
+            if obj is None:
+                return (
+                    SyncAction(SyncAction.DELETE_LOCAL, key, filename, "extra") if delete else None
+                )
+            if stat is None:
+                return SyncAction(SyncAction.DOWNLOAD, key, filename, "missing")
+
+        reason = await _diff_reason(key, filename, stat, obj)
+        if reason is None:
+            return None
+        return SyncAction(direction, key, filename, reason)
+
+    async def _diff_reason(key, filename, stat, obj):
+        if stat.st_size != obj.size:
+            return "size"
+
+        if direction == SyncAction.DOWNLOAD and int(stat.st_mtime) == obj.last_modified:
+            return None
+
+        meta = await bucket.head_object(key, headers=headers)
+        if meta.headers.get(_MTIME_META) == str(stat.st_mtime):
+            return None
+        if not check_crc:
+            return "mtime"
+        if meta.server_crc is not None and meta.server_crc == await _async_file_crc64(filename):
+            return None
+        return "crc"
+
+    async def _apply(action, stat, obj):
+        if action.action == SyncAction.UPLOAD:
+            upload_headers = http.CaseInsensitiveDict(headers)
+            upload_headers[_MTIME_META] = str(stat.st_mtime)
+            return await resumable_upload(
+                bucket,
+                action.key,
+                action.filename,
+                headers=upload_headers,
+                multipart_threshold=multipart_threshold,
+                part_size=part_size,
+                num_threads=1,
+            )
+        if action.action == SyncAction.DOWNLOAD:
+            return await _download_to_file(
+                bucket,
+                obj,
+                action.filename,
+                obj.last_modified,
+                multiget_threshold,
+                part_size,
+                headers,
+            )
+        if action.action == SyncAction.DELETE_REMOTE:
+            return await bucket.delete_object(action.key)
+        return await aiofiles.os.remove(action.filename)
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    async for r in q.results():
+        yield r
+
+
+_MAX_BATCH_DELETE_KEYS = 1000
+
+
+async def delete_prefix(
+    bucket: "AsyncBucket",
+    prefix: str,
+    num_threads: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    headers: Optional[Union[dict, http.CaseInsensitiveDict]] = None,
+) -> int:
+    """删除 `prefix` 下的所有文件，返回删除的文件数。
+
+    列举出的文件名每凑满1000个就组成一批，由 `num_threads` 个协程并发调用 `batch_delete_objects` ，
+    列举后续的文件和删除前面的文件同时进行。一批中没有删除成功的文件，以及因为网络错误或5xx错误而整批失败的请求，
+    会以指数退避的方式重试最多 `max_retries` 次。重试之后仍有文件删除失败时，抛出
+    :class:`ClientError <oss2.exceptions.ClientError>` 。
+
+    :param bucket: :class:`AsyncBucket <ossx.AsyncBucket>` 对象
+    :param str prefix: 文件名前缀。为空串时会删除Bucket下的所有文件，请谨慎使用。
+    :param num_threads: 同时进行的批量删除请求数，如不指定则为 `bucket` 连接池的大小。
+    :param max_retries: 最大重试次数，如不指定则为 `oss2.defaults.request_retries` 。
+    :param headers: HTTP头部
+    """
+    num_threads = defaults.get(num_threads, bucket.session.pool_size)
+    max_retries = defaults.get(max_retries, defaults.request_retries)
+    logger.debug(
+        "Start to delete prefix, bucket: {0}, prefix: {1}, num_threads: {2}".format(
+            bucket.bucket_name, prefix, num_threads
+        )
+    )
+
+    deleted_count = 0
+    failed_keys = []
+
+    async def producer(q):
+        batch = []
+        async with ObjectIteratorV2(
+            bucket, prefix=prefix, max_keys=_MAX_BATCH_DELETE_KEYS, headers=headers, prefetch=1
+        ) as it:
+            async for obj in it:
+                batch.append(obj.key)
+                if len(batch) == _MAX_BATCH_DELETE_KEYS:
+                    await q.put(batch)
+                    batch = []
+
+        if batch:
+            await q.put(batch)
+
+    async def consumer(q):
+        nonlocal deleted_count
+        while True:
+            batch = await q.get()
+            if batch is None:
+                break
+
+            remaining = await _batch_delete_with_retry(bucket, batch, max_retries, headers)
+            deleted_count += len(batch) - len(remaining)
+            failed_keys.extend(remaining)
+
+    q = TaskQueue(producer, [consumer] * num_threads, maxsize=num_threads)
+    await q.run()
+
+    if failed_keys:
+        raise exceptions.ClientError(
+            "Failed to delete {0} objects under prefix: {1}, e.g. {2}".format(
+                len(failed_keys), prefix, failed_keys[:10]
+            )
+        )
+
+    logger.debug("Delete prefix done, prefix: {0}, deleted: {1}".format(prefix, deleted_count))
+    return deleted_count
+
+
+async def _batch_delete_with_retry(bucket, key_list, max_retries, headers) -> List[str]:
+    """删除一批文件，返回重试之后仍然没有删除的文件名。"""
+    for i in range(max_retries + 1):
+        if i > 0:
+            await asyncio.sleep(0.1 * 2 ** (i - 1) * (1 + random.random()))
+
+        try:
+            result = await bucket.batch_delete_objects(key_list, headers=headers)
+        except (exceptions.OssError, httpx.HTTPError) as e:
+            # 发送请求时的网络错误没有被包装为RequestError，直接抛出httpx的异常
+            if not _is_retryable(e) or i == max_retries:
+                raise
+            logger.warning("Batch delete failed, retry {0}: {1!r}".format(i + 1, e))
+            continue
+
+        deleted = set(result.deleted_keys)
+        key_list = [key for key in key_list if key not in deleted]
+        if not key_list:
+            break
+        logger.warning("{0} objects were not deleted, retry {1}".format(len(key_list), i + 1))
+
+    return key_list
+
+
+def _is_retryable(e):
+    if isinstance(e, (httpx.HTTPError, exceptions.RequestError)):
+        return True
+    return e.status >= 500
@@ -166,7 +166,7 @@ class AwaitReadAdapter(object):
         if self.read_all:
             raise StopAsyncIteration
 
-        content = await self.read(_CHUNK_SIZE)
+        content = await self.read(getattr(self.fileobj, "chunk_size", _CHUNK_SIZE))
 
         if content:
             return content
@@ -181,25 +181,47 @@ class AwaitReadAdapter(object):
         content = self.fileobj.read(amt)
         if isawaitable(content):
             content = await content
+        return await self.__consume(content)
+
+    async def readinto(self, b) -> int:
+        """读取数据直接填充 `b` ，返回读取的字节数。
+
+        `fileobj` 支持 `readinto` 且不需要解密时，数据不经过中间的bytes对象。
+        """
+        view = memoryview(b).cast("B")
+        readinto = getattr(self.fileobj, "readinto", None)
+        if readinto is None or self.cipher_callback:
+            content = await self.read(len(view))
+            view[: len(content)] = content
+            return len(content)
+
+        n = readinto(view)
+        if isawaitable(n):
+            n = await n
+        await self.__consume(view[:n])
+        return n
+
+    async def __consume(self, content):
+        """对读到的 `content` 调用进度回调、CRC回调和解密回调，返回解密后的内容。"""
+        await _invoke_progress_callback(self.progress_callback, self.offset, None)
         if not content:
             self.read_all = True
-            await _invoke_progress_callback(self.progress_callback, self.offset, None)
-        else:
-            await _invoke_progress_callback(self.progress_callback, self.offset, None)
+            return content
 
-            self.offset += len(content)
+        offset_start = self.offset
+        self.offset += len(content)
 
-            real_discard = 0
-            if offset_start < self.discard:
-                if len(content) <= self.discard:
-                    real_discard = len(content)
-                else:
-                    real_discard = self.discard
+        real_discard = 0
+        if offset_start < self.discard:
+            if len(content) <= self.discard:
+                real_discard = len(content)
+            else:
+                real_discard = self.discard
 
-            _invoke_crc_callback(self.crc_callback, content, real_discard)
-            content = _invoke_cipher_callback(self.cipher_callback, content, real_discard)
+        _invoke_crc_callback(self.crc_callback, content, real_discard)
+        content = _invoke_cipher_callback(self.cipher_callback, content, real_discard)
 
-            self.discard -= real_discard
+        self.discard -= real_discard
         return content
 
     @property
@@ -210,3 +232,31 @@ class AwaitReadAdapter(object):
             return self.fileobj.crc
         else:
             return None
+
+
+class AsyncSizedFileAdapter(object):
+    """通过这个适配器（Adapter），可以把原先的 `file_object` 的长度限制到等于 `size`。
+
+    与 :class:`oss2.utils.SizedFileAdapter` 相同，只是 `file_object` 的 `read` 是协程，例如 aiofiles 打开的文件。
+    """
+
+    def __init__(self, file_object, size):
+        self.file_object = file_object
+        self.size = size
+        self.offset = 0
+
+    async def read(self, amt=None):
+        if self.offset >= self.size:
+            return b""
+
+        if (amt is None or amt < 0) or (amt + self.offset >= self.size):
+            data = await self.file_object.read(self.size - self.offset)
+            self.offset = self.size
+            return data
+
+        self.offset += amt
+        return await self.file_object.read(amt)
+
+    @property
+    def len(self):
+        return self.size
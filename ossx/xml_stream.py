@@ -0,0 +1,123 @@
+from typing import AsyncIterator, List, Optional
+from xml.etree import ElementTree
+
+from oss2 import xml_utils
+from oss2.models import Owner, SimplifiedObjectInfo
+from oss2.utils import iso8601_to_unixtime
+
+from ._http import AwaitResponse
+
+__all__ = ["ListObjectsParser", "iter_list_objects"]
+
+
+class ListObjectsParser(object):
+    """增量解析 `list_objects` / `list_objects_v2` 的XML响应。
+
+    每次 :meth:`feed` 一段响应数据，返回这段数据里解析完成的 :class:`SimplifiedObjectInfo` ，
+    公共前缀以 `is_prefix()` 为True的 `SimplifiedObjectInfo` 返回，顺序和XML中的一致。
+    每个Contents节点解析后就从树上删除，不需要缓存完整的响应体和整棵XML树。
+
+    IsTruncated、分页标记等字段会写入 `result` ，分页标记在 :meth:`close` 时才写入。
+    OSS总是在Contents之前返回EncodingType，所以解析到的文件名可以直接做URL解码。
+
+    :param result: :class:`ListObjectsResult <oss2.models.ListObjectsResult>` 或
+        :class:`ListObjectsV2Result <oss2.models.ListObjectsV2Result>` 对象
+    """
+
+    def __init__(self, result):
+        self.result = result
+        if hasattr(result, "next_continuation_token"):
+            self._marker_tag, self._marker_attr = "NextContinuationToken", "next_continuation_token"
+        else:
+            self._marker_tag, self._marker_attr = "NextMarker", "next_marker"
+
+        self._parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self._root = None
+        self._depth = 0
+        self._url_encoded = False
+        self._next_marker = None
+
+    def feed(self, data: bytes) -> List[SimplifiedObjectInfo]:
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self) -> List[SimplifiedObjectInfo]:
+        self._parser.close()
+        entries = self._read_events()
+
+        if self._root is None:
+            raise RuntimeError("parse xml: empty list objects response")
+        if self.result.is_truncated and self._next_marker is not None:
+            setattr(self.result, self._marker_attr, self._next_marker)
+        return entries
+
+    def _read_events(self):
+        entries = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._depth == 0:
+                    self._root = elem
+                self._depth += 1
+                continue
+
+            self._depth -= 1
+            if self._depth != 1:
+                continue
+
+            entry = self._parse_child(elem)
+            if entry is not None:
+                entries.append(entry)
+            self._root.remove(elem)
+
+        return entries
+
+    def _parse_child(self, elem) -> Optional[SimplifiedObjectInfo]:
+        tag = elem.tag
+        if tag == "Contents":
+            return self._parse_contents(elem)
+        if tag == "CommonPrefixes":
+            return SimplifiedObjectInfo(self._decode(elem, "Prefix"), None, None, None, None, None)
+
+        if tag == "EncodingType":
+            self._url_encoded = elem.text == "url"
+        elif tag == "IsTruncated":
+            self.result.is_truncated = xml_utils._find_bool(self._root, "IsTruncated")
+        elif tag == self._marker_tag:
+            self._next_marker = self._decode(self._root, self._marker_tag)
+        return None
+
+    def _parse_contents(self, node):
+        owner = None
+        if node.find("Owner") is not None:
+            owner = Owner(
+                xml_utils._find_tag(node, "Owner/DisplayName"),
+                xml_utils._find_tag(node, "Owner/ID"),
+            )
+
+        return SimplifiedObjectInfo(
+            self._decode(node, "Key"),
+            iso8601_to_unixtime(xml_utils._find_tag(node, "LastModified")),
+            xml_utils._find_tag(node, "ETag").strip('"'),
+            xml_utils._find_tag(node, "Type"),
+            int(xml_utils._find_tag(node, "Size")),
+            xml_utils._find_tag(node, "StorageClass"),
+            owner,
+            xml_utils._find_tag_with_default(node, "RestoreInfo", None),
+        )
+
+    def _decode(self, parent, path):
+        return xml_utils._find_object(parent, path, self._url_encoded)
+
+
+async def iter_list_objects(resp: AwaitResponse, result) -> AsyncIterator[SimplifiedObjectInfo]:
+    """边接收 `resp` 的响应体边解析，逐个返回文件和公共前缀，参见 :class:`ListObjectsParser` 。
+
+    迭代结束后 `result` 的IsTruncated、分页标记等字段才是完整的，`object_list` 和 `prefix_list` 不会被填充。
+    """
+    parser = ListObjectsParser(result)
+    async for chunk in resp:
+        for entry in parser.feed(chunk):
+            yield entry
+
+    for entry in parser.close():
+        yield entry
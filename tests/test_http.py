@@ -32,6 +32,48 @@ class TestSession:
         assert len(await response.read()) == len(b"test") * count
         assert await response.read() == b""
 
+    @pytest.mark.asyncio
+    async def test_read_chunk_boundary(self, session):
+        req = http.Request("GET", "http://example.com")
+        response = await session.do_request(req, 5.0)
+
+        data = b""
+        while True:
+            chunk = await response.read(4096)
+            if not chunk:
+                break
+            data += chunk
+        assert data == b"test" * 10244
+
+    @pytest.mark.asyncio
+    async def test_iter_chunks(self, session):
+        req = http.Request("GET", "http://example.com")
+        response = await session.do_request(req, 5.0)
+
+        assert await response.read(3) == b"tes"
+        sizes = [len(chunk) async for chunk in response.iter_chunks(10000)]
+        assert sizes == [10000] * 4 + [40976 - 3 - 40000]
+
+    @pytest.mark.asyncio
+    async def test_readinto(self, session):
+        req = http.Request("GET", "http://example.com")
+        response = await session.do_request(req, 5.0)
+
+        buf = bytearray(5)
+        assert await response.readinto(buf) == 5
+        assert buf == b"testt"
+        assert await response.read(3) == b"est"
+        buf = bytearray(50000)
+        assert await response.readinto(buf) == 40976 - 8
+        assert buf[:8] == b"testtest"
+        assert await response.readinto(buf) == 0
+
+
+def test_session_chunk_size():
+    session = http.Session(adapter=httpx.MockTransport(handler), chunk_size=1024 * 1024)
+    response = session.do_request(http.Request("GET", "http://example.com"), 5.0)
+    assert response.chunk_size == 1024 * 1024
+
 
 def test_http_header():
     headers = CaseInsensitiveDict({"Oss-Test": "test"})
@@ -10,7 +10,9 @@ from ossx.iterators import (
     LiveChannelIterator,
     MultipartUploadIterator,
     ObjectIterator,
+    ObjectIteratorV2,
     ObjectUploadIterator,
+    ParallelObjectIterator,
     PartIterator,
 )
 
@@ -67,6 +69,69 @@ async def test_object_iterator(bucket):
     await delete_keys(bucket, object_list)
 
 
+@pytest.mark.asyncio
+async def test_object_iterator_prefetch(bucket):
+    prefix = random_key(suffix="/")
+    object_list = [prefix + random_string(8) for i in range(30)]
+    await asyncio.gather(*[bucket.put_object(key, random_bytes(3)) for key in object_list])
+
+    for iterator_class in (ObjectIterator, ObjectIteratorV2):
+        async with iterator_class(bucket, prefix, max_keys=2, prefetch=2) as it:
+            assert [info.key async for info in it] == sorted(object_list)
+            assert 2 <= it.max_keys <= 1000
+
+        async with iterator_class(bucket, prefix, max_keys=2, prefetch=1) as it:
+            async for info in it:
+                break
+
+    await delete_keys(bucket, object_list)
+
+
+@pytest.mark.asyncio
+async def test_object_iterator_pages(bucket):
+    prefix = random_key(suffix="/")
+    object_list = [prefix + random_string(8) for i in range(9)]
+    dir_list = [prefix + random_string(5) + "/" for i in range(3)]
+    dir_object_list = [d + random_string(5) for d in dir_list]
+    await asyncio.gather(
+        *[bucket.put_object(key, random_bytes(3)) for key in object_list + dir_object_list]
+    )
+
+    for prefetch in (0, 1):
+        it = ObjectIterator(bucket, prefix, delimiter="/", max_keys=4, prefetch=prefetch)
+        first = await it.__anext__()
+        pages = [page async for page in it.pages()]
+        assert all(0 < len(page) <= 4 for page in pages)
+        assert [first.key] + [info.key for page in pages for info in page] == sorted(
+            object_list + dir_list
+        )
+        await it.aclose()
+
+    await delete_keys(bucket, object_list + dir_object_list)
+
+
+@pytest.mark.asyncio
+async def test_parallel_object_iterator(bucket):
+    prefix = random_key(suffix="/")
+    object_list = [prefix + random_string(8) for i in range(10)]
+    for i in range(5):
+        sub_dir = prefix + random_string(5) + "/"
+        object_list.extend(sub_dir + random_string(8) for j in range(6))
+        object_list.extend(sub_dir + "x/" + random_string(8) for j in range(2))
+    await asyncio.gather(*[bucket.put_object(key, random_bytes(3)) for key in object_list])
+
+    expected = [info.key async for info in ObjectIteratorV2(bucket, prefix)]
+    assert expected == sorted(object_list)
+    for depth in (1, 2):
+        it = ParallelObjectIterator(bucket, prefix, depth=depth, num_threads=3, max_keys=4)
+        assert [info.key async for info in it] == expected
+
+        it = ParallelObjectIterator(bucket, prefix, depth=depth, ordered=False, max_keys=4)
+        assert sorted([info.key async for info in it]) == expected
+
+    await delete_keys(bucket, object_list)
+
+
 @pytest.mark.asyncio
 async def test_object_iterator_chinese(bucket):
     for prefix in [random_key(suffix="中+文"), random_key(suffix="中+文")]:
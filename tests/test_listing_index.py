@@ -0,0 +1,120 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from oss2 import Auth
+
+from ossx import AsyncBucket
+from ossx import _http as http
+from ossx.listing_index import ListingIndex
+
+from .common import bucket, delete_keys, random_bytes, random_key, random_string
+
+
+@pytest.mark.asyncio
+async def test_listing_index(bucket: AsyncBucket):
+    path = "tests/mock_data/listing_index.db"
+    prefix = random_key(suffix="/")
+    dir_list = [prefix + random_string(5) + "/" for i in range(3)]
+    object_list = [d + random_string(8) for d in dir_list for i in range(4)]
+    object_list.append(prefix + random_string(8))
+    await asyncio.gather(*[bucket.put_object(key, random_bytes(10)) for key in object_list])
+
+    async with ListingIndex(bucket, path, prefix, max_keys=3) as index:
+        assert await index.refresh() == sorted(dir_list + [prefix])
+        assert await index.stat() == (len(object_list), 10 * len(object_list))
+        assert await index.stat(dir_list[0]) == (4, 40)
+        assert await index.exists(object_list[0])
+        assert [info.key async for info in index.iter_objects(batch_size=5)] == sorted(object_list)
+
+        checksum = await index.checksum()
+        assert await index.refresh() == []
+        assert await index.checksum() == checksum
+
+        new_key = dir_list[1] + "~" + random_string(8)
+        await bucket.put_object(new_key, random_bytes(3))
+        assert await index.refresh(append_only=True) == [dir_list[1]]
+        assert await index.exists(new_key)
+
+        await bucket.delete_object(object_list[0])
+        await bucket.put_object(object_list[1], random_bytes(20))
+        assert await index.refresh(append_only=True) == []
+        assert await index.exists(object_list[0])
+        assert await index.refresh() == [dir_list[0]]
+        assert not await index.exists(object_list[0])
+        assert (await index.get(object_list[1])).size == 20
+
+    await delete_keys(bucket, object_list[1:] + [new_key])
+    os.remove(path)
+
+
+def make_listing_bucket(objects):
+    def handler(request):
+        params = request.url.params
+        prefix, delimiter = params.get("prefix", ""), params.get("delimiter", "")
+        after = params.get("continuation-token") or params.get("start-after", "")
+        max_keys = int(params.get("max-keys", 100))
+
+        entries = []
+        for key in sorted(objects):
+            if not key.startswith(prefix) or key <= after:
+                continue
+            i = key.find(delimiter, len(prefix)) if delimiter else -1
+            entry = (key[: i + 1], True) if i >= 0 else (key, False)
+            if not entries or entries[-1] != entry:
+                entries.append(entry)
+        page, truncated = entries[:max_keys], len(entries) > max_keys
+
+        body = ["<ListBucketResult><Prefix>{0}</Prefix>".format(prefix)]
+        for key, is_prefix in page:
+            if is_prefix:
+                body.append("<CommonPrefixes><Prefix>{0}</Prefix></CommonPrefixes>".format(key))
+            else:
+                body.append(
+                    "<Contents><Key>{0}</Key><LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+                    '<ETag>"{1}"</ETag><Type>Normal</Type><Size>{2}</Size>'
+                    "<StorageClass>Standard</StorageClass></Contents>".format(
+                        key, objects[key], len(objects[key])
+                    )
+                )
+        body.append("<IsTruncated>{0}</IsTruncated>".format(str(truncated).lower()))
+        if truncated:
+            # 公共前缀之后的文件都属于同一个前缀，用前缀的上界作为continuation-token
+            last, is_prefix = page[-1]
+            token = last[:-1] + chr(ord(last[-1]) + 1) if is_prefix else last
+            body.append("<NextContinuationToken>{0}</NextContinuationToken>".format(token))
+        body.append("</ListBucketResult>")
+        return httpx.Response(200, content="".join(body).encode("utf-8"))
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    return AsyncBucket(
+        Auth("ak", "sk"), "http://oss-cn-hangzhou.aliyuncs.com", "bucket", session=session
+    )
+
+
+@pytest.mark.asyncio
+async def test_listing_index_changes():
+    path = "tests/mock_data/listing_index_changes.db"
+    objects = {"p/a/{0}".format(i): "v1" for i in range(5)}
+    objects.update({"p/b/{0}".format(i): "v1" for i in range(5)})
+    bucket = make_listing_bucket(objects)
+
+    async with ListingIndex(bucket, path, "p/", max_keys=2) as index:
+        assert await index.refresh() == ["p/a/", "p/b/"]
+
+        objects["p/a/1"] = "v2"
+        del objects["p/a/3"]
+        objects["p/b/0a"] = "v1"
+        assert await index.refresh(append_only=True) == []
+        assert await index.refresh() == ["p/a/", "p/b/"]
+        assert (await index.get("p/a/1")).etag == "v2"
+        assert not await index.exists("p/a/3")
+        assert await index.exists("p/b/0a")
+        assert await index.stat() == (10, 20)
+
+        objects["p/b/9"] = "v1"
+        assert await index.refresh(append_only=True) == ["p/b/"]
+        assert await index.refresh() == []
+
+    os.remove(path)
@@ -1,9 +1,14 @@
 import os
+import shutil
 
+import httpx
 import pytest
+from oss2 import Auth
 from oss2.headers import OSS_TRAFFIC_LIMIT
 
 from ossx import AsyncBucket
+from ossx import _http as http
+from ossx.cache import BlockCache, MetadataCache, ObjectCache
 from tests.common import OSS_PREFIX, bucket
 
 
@@ -29,6 +34,22 @@ async def test_list_objects_v2(bucket: AsyncBucket):
     assert count <= max_keys
 
 
+@pytest.mark.asyncio
+async def test_list_objects_v2_stream(bucket: AsyncBucket):
+    max_keys = 10
+    objs = await bucket.list_objects_v2(prefix=OSS_PREFIX, delimiter="/", max_keys=max_keys)
+    async with await bucket.list_objects_v2_stream(
+        prefix=OSS_PREFIX, delimiter="/", max_keys=max_keys
+    ) as result:
+        entries = [info async for info in result]
+    assert [info.key for info in entries if not info.is_prefix()] == [
+        obj.key for obj in objs.object_list
+    ]
+    assert [info.key for info in entries if info.is_prefix()] == objs.prefix_list
+    assert result.is_truncated == objs.is_truncated
+    assert result.next_continuation_token == objs.next_continuation_token
+
+
 @pytest.mark.asyncio
 async def test_put_object(bucket: AsyncBucket):
     key = f"{OSS_PREFIX}/test.txt"
@@ -120,6 +141,23 @@ async def test_get_object(bucket: AsyncBucket):
     assert await obj.read() == data[byte_range[0] : byte_range[1] + 1]
 
 
+@pytest.mark.asyncio
+async def test_get_object_readinto(bucket: AsyncBucket):
+    key = f"{OSS_PREFIX}/get_object_readinto.bin"
+    data = os.urandom(100 * 1024 + 7)
+    await bucket.put_object(key, data)
+    obj = await bucket.get_object(key)
+    buf = bytearray(len(data) + 10)
+    view = memoryview(buf)
+    n = await obj.readinto(view[:1000])
+    assert n == 1000
+    n += await obj.readinto(view[n:])
+    assert n == len(data)
+    assert buf[:n] == data
+    assert await obj.readinto(view) == 0
+    await bucket.delete_object(key)
+
+
 @pytest.mark.asyncio
 async def test_get_object_to_file(bucket: AsyncBucket):
     key = f"{OSS_PREFIX}/get_object_to_file.txt"
@@ -205,6 +243,191 @@ async def test_copy_object(bucket: AsyncBucket):
     assert await obj.read() == data
 
 
+@pytest.mark.asyncio
+async def test_meta_cache(bucket: AsyncBucket):
+    bucket.meta_cache = MetadataCache(max_size=10, ttl=60)
+    key = f"{OSS_PREFIX}/meta-cache.txt"
+    await bucket.put_object(key, b"hello world")
+    obj = await bucket.head_object(key)
+    assert await bucket.head_object(key) is obj
+    assert await bucket.object_exists(key)
+
+    await bucket.put_object(key, b"hello ossx")
+    assert (await bucket.head_object(key)).content_length == len(b"hello ossx")
+
+    await bucket.delete_object(key)
+    assert not await bucket.object_exists(key)
+    await bucket.put_object(key, b"hello world")
+    assert await bucket.object_exists(key)
+    await bucket.delete_object(key)
+
+
+@pytest.mark.asyncio
+async def test_meta_cache_shared():
+    cache = MetadataCache()
+
+    async def head(bucket_name):
+        return bucket_name
+
+    assert await cache.fetch("head_object", "bucket-a", "key", head, "bucket-a") == "bucket-a"
+    assert await cache.fetch("head_object", "bucket-b", "key", head, "bucket-b") == "bucket-b"
+    assert await cache.fetch("head_object", "bucket-a", "key", head, "other") == "bucket-a"
+
+    cache.invalidate("bucket-a", "key")
+    assert len(cache) == 1
+    assert await cache.fetch("head_object", "bucket-b", "key", head, "other") == "bucket-b"
+
+
+@pytest.mark.asyncio
+async def test_object_cache(bucket: AsyncBucket):
+    bucket.object_cache = ObjectCache("tests/mock_data/object_cache", max_size=1024 * 1024)
+    key = f"{OSS_PREFIX}/object-cache.txt"
+    await bucket.put_object(key, b"hello world")
+    for _ in range(2):
+        obj = await bucket.get_object(key)
+        assert await obj.read() == b"hello world"
+    entry = await bucket.object_cache.lookup(bucket.bucket_name, key)
+    assert entry["etag"] == obj.headers["ETag"]
+
+    await bucket.put_object(key, b"hello ossx")
+    obj = await bucket.get_object(key)
+    assert await obj.read() == b"hello ossx"
+
+    filename = "tests/mock_data/object-cache.txt"
+    await bucket.get_object_to_file(key, filename)
+    with open(filename, "rb") as f:
+        assert f.read() == b"hello ossx"
+
+    await bucket.delete_object(key)
+    os.remove(filename)
+    shutil.rmtree(bucket.object_cache.root)
+
+
+@pytest.mark.asyncio
+async def test_block_cache(bucket: AsyncBucket):
+    bucket.block_cache = BlockCache(block_size=1024, max_size=8 * 1024)
+    key = f"{OSS_PREFIX}/block-cache.bin"
+    data = os.urandom(10 * 1024)
+    await bucket.put_object(key, data)
+
+    for byte_range in [(100, 200), (150, 3000), (0, 1023), (9000, 20000), (10239, 10239)]:
+        obj = await bucket.get_object(key, byte_range=byte_range)
+        assert await obj.read() == data[byte_range[0] : byte_range[1] + 1]
+    assert 0 < bucket.block_cache.size <= 8 * 1024
+
+    await bucket.put_object(key, b"hello ossx")
+    obj = await bucket.get_object(key, byte_range=(0, 4))
+    assert await obj.read() == b"hello"
+    await bucket.delete_object(key)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ttl", [0, None])
+async def test_block_cache_revalidate(ttl):
+    state = {"data": b"hello world!", "etag": '"v1"'}
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == state["etag"]:
+            return httpx.Response(304, headers={"ETag": state["etag"]})
+        start, end = map(int, request.headers["Range"][len("bytes=") :].split("-"))
+        end = min(end, len(state["data"]) - 1)
+        content_range = "bytes {0}-{1}/{2}".format(start, end, len(state["data"]))
+        return httpx.Response(
+            206,
+            content=state["data"][start : end + 1],
+            headers={"ETag": state["etag"], "Content-Range": content_range},
+        )
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    bucket = AsyncBucket(
+        Auth("ak", "sk"),
+        "http://oss-cn-hangzhou.aliyuncs.com",
+        "bucket",
+        session=session,
+        enable_crc=False,
+        block_cache=BlockCache(block_size=4, ttl=ttl),
+    )
+    for _ in range(2):
+        obj = await bucket.get_object("key", byte_range=(0, 4))
+        assert await obj.read() == b"hello"
+    assert requests == ([None, '"v1"'] if ttl == 0 else [None])
+
+    state.update(data=b"HELLO WORLD!", etag='"v2"')
+    obj = await bucket.get_object("key", byte_range=(0, 4))
+    assert await obj.read() == (b"HELLO" if ttl == 0 else b"hello")
+
+
+@pytest.mark.asyncio
+async def test_block_cache_range_behavior():
+    data = os.urandom(10 * 1024 * 1024 + 7)
+    transferred = []
+
+    def handler(request):
+        start, end = map(int, request.headers["Range"][len("bytes=") :].split("-"))
+        if start >= len(data):
+            return httpx.Response(416, content=b"", headers={"x-oss-request-id": "id"})
+        if end >= len(data) and request.headers.get("x-oss-range-behavior") != "standard":
+            # 默认的范围行为，忽略无效的范围并返回整个文件
+            transferred.append(len(data))
+            return httpx.Response(200, content=data, headers={"ETag": '"v1"'})
+        end = min(end, len(data) - 1)
+        content_range = "bytes {0}-{1}/{2}".format(start, end, len(data))
+        transferred.append(end - start + 1)
+        return httpx.Response(
+            206,
+            content=data[start : end + 1],
+            headers={"ETag": '"v1"', "Content-Range": content_range},
+        )
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    bucket = AsyncBucket(
+        Auth("ak", "sk"),
+        "http://oss-cn-hangzhou.aliyuncs.com",
+        "bucket",
+        session=session,
+        enable_crc=False,
+        block_cache=BlockCache(block_size=1024 * 1024),
+    )
+    obj = await bucket.get_object("key", byte_range=(len(data) - 8, len(data) - 1))
+    assert await obj.read() == data[-8:]
+    assert sum(transferred) <= 2 * 1024 * 1024
+
+    obj = await bucket.get_object("key", byte_range=(len(data) - 4, len(data) + 100))
+    assert await obj.read() == data[-4:]
+    assert len(transferred) == 1
+
+
+@pytest.mark.asyncio
+async def test_open_object(bucket: AsyncBucket):
+    key = f"{OSS_PREFIX}/open-object.bin"
+    data = os.urandom(1024 * 1024 + 123)
+    await bucket.put_object(key, data)
+
+    async with await bucket.open(key, min_readahead=64 * 1024, max_readahead=256 * 1024) as f:
+        assert f.size == len(data)
+        chunks = []
+        while True:
+            chunk = await f.read(10000)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        assert b"".join(chunks) == data
+        assert await f.tell() == len(data)
+
+        for pos in [5, 700000, 100, len(data) - 10]:
+            await f.seek(pos)
+            assert await f.read(50) == data[pos : pos + 50]
+
+        await f.seek(-100, os.SEEK_END)
+        buf = bytearray(200)
+        assert await f.readinto(buf) == 100
+        assert buf[:100] == data[-100:]
+
+    await bucket.delete_object(key)
+
+
 @pytest.mark.asyncio
 async def test_update_object_meta(bucket: AsyncBucket):
     key = f"{OSS_PREFIX}/test.txt"
@@ -0,0 +1,320 @@
+import os
+import shutil
+
+import httpx
+import pytest
+from oss2 import Auth
+from oss2.exceptions import ServerError
+
+from ossx import AsyncBucket
+from ossx import _http as http
+from ossx.cache import MetadataCache
+from ossx.iterators import MultipartUploadIterator, PartIterator
+from ossx.resumable import (
+    ResumableDownloadStore,
+    ResumableStore,
+    multipart_copy,
+    multipart_upload_stream,
+    resumable_download,
+    resumable_upload,
+)
+
+from .common import bucket, random_bytes, random_key
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload(bucket: AsyncBucket):
+    key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+    filename = "tests/mock_data/resumable_upload.bin"
+    with open(filename, "wb") as f:
+        f.write(content)
+
+    progress = []
+    result = await resumable_upload(
+        bucket,
+        key,
+        filename,
+        multipart_threshold=200 * 1024,
+        part_size=100 * 1024,
+        num_threads=4,
+        progress_callback=lambda consumed, total: progress.append((consumed, total)),
+    )
+    assert result.status == 200
+    assert progress[-1] == (len(content), len(content))
+
+    obj = await bucket.get_object(key)
+    assert await obj.read() == content
+
+    result = await resumable_upload(bucket, key, filename)
+    assert result.status == 200
+    obj = await bucket.head_object(key)
+    assert obj.content_length == len(content)
+
+    await bucket.delete_object(key)
+    os.remove(filename)
+
+
+@pytest.mark.asyncio
+async def test_resumable_download(bucket: AsyncBucket):
+    key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+    await bucket.put_object(key, content)
+
+    filename = "tests/mock_data/resumable_download.bin"
+    progress = []
+    await resumable_download(
+        bucket,
+        key,
+        filename,
+        multiget_threshold=200 * 1024,
+        part_size=100 * 1024,
+        num_threads=4,
+        progress_callback=lambda consumed, total: progress.append((consumed, total)),
+    )
+    assert progress[-1] == (len(content), len(content))
+    with open(filename, "rb") as f:
+        assert f.read() == content
+
+    await resumable_download(bucket, key, filename)
+    with open(filename, "rb") as f:
+        assert f.read() == content
+
+    await bucket.delete_object(key)
+    os.remove(filename)
+
+
+def interrupt_after(n):
+    def progress_callback(consumed, total):
+        if consumed >= n:
+            raise RuntimeError("interrupted")
+
+    return progress_callback
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload_resume(bucket: AsyncBucket):
+    key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+    filename = "tests/mock_data/resumable_upload_resume.bin"
+    with open(filename, "wb") as f:
+        f.write(content)
+
+    store = ResumableStore(root="tests/mock_data", dir="resumable_store")
+    store_key = store.make_store_key(bucket.bucket_name, key, os.path.abspath(filename))
+    with pytest.raises(RuntimeError):
+        await resumable_upload(
+            bucket,
+            key,
+            filename,
+            store=store,
+            multipart_threshold=200 * 1024,
+            part_size=100 * 1024,
+            num_threads=1,
+            progress_callback=interrupt_after(300 * 1024),
+        )
+
+    record = await store.get(store_key)
+    assert len(record["parts"]) == 3
+    parts = [p async for p in PartIterator(bucket, key, record["upload_id"])]
+    assert [p.part_number for p in parts] == [1, 2, 3]
+    assert [p.etag for p in parts] == [p["etag"] for p in record["parts"]]
+
+    result = await resumable_upload(
+        bucket,
+        key,
+        filename,
+        store=store,
+        multipart_threshold=200 * 1024,
+        part_size=100 * 1024,
+    )
+    assert result.status == 200
+    assert await store.get(store_key) is None
+    obj = await bucket.get_object(key)
+    assert await obj.read() == content
+
+    await bucket.delete_object(key)
+    os.remove(filename)
+    shutil.rmtree(store.dir)
+
+
+@pytest.mark.asyncio
+async def test_resumable_download_resume(bucket: AsyncBucket):
+    key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+    await bucket.put_object(key, content)
+
+    filename = "tests/mock_data/resumable_download_resume.bin"
+    store = ResumableDownloadStore(root="tests/mock_data", dir="resumable_store")
+    store_key = store.make_store_key(bucket.bucket_name, key, os.path.abspath(filename))
+    with pytest.raises(RuntimeError):
+        await resumable_download(
+            bucket,
+            key,
+            filename,
+            multiget_threshold=200 * 1024,
+            part_size=100 * 1024,
+            num_threads=1,
+            store=store,
+            progress_callback=interrupt_after(300 * 1024),
+        )
+
+    record = await store.get(store_key)
+    assert len(record["parts"]) == 3
+    assert os.path.exists(filename + record["tmp_suffix"])
+
+    await resumable_download(
+        bucket,
+        key,
+        filename,
+        multiget_threshold=200 * 1024,
+        part_size=100 * 1024,
+        store=store,
+    )
+    assert await store.get(store_key) is None
+    assert not os.path.exists(filename + record["tmp_suffix"])
+    with open(filename, "rb") as f:
+        assert f.read() == content
+
+    await bucket.delete_object(key)
+    os.remove(filename)
+    shutil.rmtree(store.dir)
+
+
+@pytest.mark.asyncio
+async def test_multipart_copy(bucket: AsyncBucket):
+    src_key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+    await bucket.put_object(src_key, content, headers={"x-oss-meta-foo": "bar"})
+
+    key = random_key(suffix=".bin")
+    progress = []
+    result = await multipart_copy(
+        bucket,
+        bucket.bucket_name,
+        src_key,
+        key,
+        multipart_threshold=200 * 1024,
+        part_size=100 * 1024,
+        num_threads=4,
+        progress_callback=lambda consumed, total: progress.append((consumed, total)),
+    )
+    assert result.status == 200
+    assert progress[-1] == (len(content), len(content))
+    obj = await bucket.get_object(key)
+    assert await obj.read() == content
+
+    small_key = random_key(suffix=".bin")
+    result = await multipart_copy(bucket, bucket.bucket_name, src_key, small_key)
+    assert result.status == 200
+    obj = await bucket.head_object(small_key)
+    assert obj.content_length == len(content)
+    assert obj.headers["x-oss-meta-foo"] == "bar"
+
+    await bucket.batch_delete_objects([src_key, key, small_key])
+
+
+@pytest.mark.asyncio
+async def test_multipart_copy_cache():
+    hosts = []
+
+    def handler(request):
+        hosts.append((request.method, request.url.host))
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Content-Length": "10", "ETag": '"etag"'})
+        body = (
+            b'<CopyObjectResult><ETag>"etag"</ETag>'
+            b"<LastModified>2024-01-01T00:00:00.000Z</LastModified></CopyObjectResult>"
+        )
+        return httpx.Response(200, content=body)
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    bucket = AsyncBucket(
+        Auth("ak", "sk"),
+        "http://oss-cn-hangzhou.aliyuncs.com",
+        "target",
+        session=session,
+        meta_cache=MetadataCache(),
+    )
+    result = await multipart_copy(bucket, "source", "key", "key")
+    assert result.status == 200
+    assert hosts == [
+        ("HEAD", "source.oss-cn-hangzhou.aliyuncs.com"),
+        ("PUT", "target.oss-cn-hangzhou.aliyuncs.com"),
+    ]
+    assert len(bucket.meta_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_stream(bucket: AsyncBucket):
+    key = random_key(suffix=".bin")
+    content = random_bytes(1024 * 1024 + 123)
+
+    async def stream(content):
+        for i in range(0, len(content), 7 * 1024):
+            yield content[i : i + 7 * 1024]
+
+    progress = []
+    result = await multipart_upload_stream(
+        bucket,
+        key,
+        stream(content),
+        part_size=100 * 1024,
+        num_threads=4,
+        progress_callback=lambda consumed, total: progress.append((consumed, total)),
+    )
+    assert result.status == 200
+    assert progress[-1] == (len(content), None)
+    obj = await bucket.get_object(key)
+    assert await obj.read() == content
+
+    result = await multipart_upload_stream(bucket, key, stream(content[:1000]))
+    assert result.status == 200
+    obj = await bucket.get_object(key)
+    assert await obj.read() == content[:1000]
+
+    async def broken_stream():
+        yield content[: 300 * 1024]
+        raise RuntimeError("broken")
+
+    with pytest.raises(RuntimeError):
+        await multipart_upload_stream(bucket, key, broken_stream(), part_size=100 * 1024)
+    uploads = [u async for u in MultipartUploadIterator(bucket, prefix=key)]
+    assert uploads == []
+
+    await bucket.delete_object(key)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("abort_fails", [False, True])
+async def test_multipart_upload_stream_complete_failed(abort_fails):
+    requests = []
+
+    def handler(request):
+        params = request.url.params
+        if request.method == "POST" and "uploads" in params:
+            body = b"<InitiateMultipartUploadResult><UploadId>id</UploadId></InitiateMultipartUploadResult>"
+            return httpx.Response(200, content=body)
+        if request.method == "PUT":
+            return httpx.Response(200, headers={"ETag": '"etag"'})
+
+        requests.append(request.method)
+        if request.method == "DELETE" and abort_fails:
+            raise httpx.ConnectError("connection reset", request=request)
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        body = b"<Error><Code>InvalidPart</Code><Message>invalid part</Message></Error>"
+        return httpx.Response(400, content=body, headers={"x-oss-request-id": "id"})
+
+    async def stream():
+        for _ in range(3):
+            yield b"x" * 100 * 1024
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    bucket = AsyncBucket(
+        Auth("ak", "sk"), "http://oss-cn-hangzhou.aliyuncs.com", "bucket", session=session
+    )
+    with pytest.raises(ServerError) as e:
+        await multipart_upload_stream(bucket, "key", stream(), part_size=100 * 1024)
+    assert e.value.code == "InvalidPart"
+    assert requests == ["POST", "DELETE"]
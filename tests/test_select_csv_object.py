@@ -550,6 +550,51 @@ async def test_select_csv_object_with_output_header(bucket):
     assert content == "name\nabc\n".encode("utf-8")
 
 
+@pytest.mark.asyncio
+async def test_select_csv_object_records(bucket):
+    key = "test_select_csv_object_records"
+    content = 'name,job\nabc,def\n"x,y","multi\nline"\n'
+    await bucket.put_object(key, content.encode("utf_8"))
+    select_params = {"CsvHeaderInfo": "Use"}
+    result = await bucket.select_object(key, "select * from ossobject", None, select_params)
+    rows = [row async for row in result.records(batch_size=1)]
+
+    assert rows == [["abc", "def"], ["x,y", "multi\nline"]]
+
+
+@pytest.mark.asyncio
+async def test_select_csv_object_parallel(bucket):
+    key = f"{OSS_PREFIX}/city_sample_data.csv"
+    await bucket.put_object_from_file(key, "tests/mock_data/sample_data.csv")
+    sql = "select * from ossobject where _4 like '%Chicago%'"
+    select_params = {"CsvHeaderInfo": "None"}
+
+    result = await bucket.select_object(key, sql, None, select_params)
+    expected = await result.read()
+
+    chunks = [c async for c in bucket.select_object_parallel(key, sql, select_params, 4)]
+    assert b"".join(chunks) == expected
+
+    chunks = bucket.select_object_parallel(key, sql, select_params, 4, ordered=False)
+    lines = [line async for chunk in chunks for line in chunk.splitlines()]
+    assert sorted(lines) == sorted(expected.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_select_prefix(bucket):
+    prefix = f"{OSS_PREFIX}/select_prefix/"
+    for i in range(5):
+        content = "".join("{0},{1}\n".format(i, j) for j in range(10))
+        await bucket.put_object(f"{prefix}{i}.csv", content.encode("utf-8"))
+
+    sql = "select * from ossobject where _2 like '%3%'"
+    rows = [r async for r in bucket.select_prefix(prefix, sql, num_threads=2)]
+    assert sorted(rows) == [(f"{prefix}{i}.csv", [str(i), "3"]) for i in range(5)]
+
+    for i in range(5):
+        await bucket.delete_object(f"{prefix}{i}.csv")
+
+
 @pytest.mark.asyncio
 async def test_select_csv_object_with_invalid_parameters(bucket):
     key = "test_select_csv_object_with_invalid_parameters"
@@ -0,0 +1,243 @@
+import struct
+import zlib
+
+import httpx
+import pytest
+from oss2.exceptions import (
+    ClientError,
+    InconsistentError,
+    SelectOperationClientError,
+    SelectOperationFailed,
+)
+
+from ossx import _http as http
+from ossx.models import SelectObjectResult
+from ossx.select_executor import select_object_parallel
+from ossx.select_records import SelectColumnParser, SelectRecordParser
+from ossx.select_response import AsyncSelectResponseAdapter
+
+
+def make_frame(frame_type, payload):
+    header = struct.pack(">III", frame_type | (1 << 24), len(payload), 0)
+    return header + payload + struct.pack(">I", zlib.crc32(payload))
+
+
+def make_body(records):
+    frames = []
+    offset = 0
+    for record in records:
+        offset += len(record)
+        frames.append(make_frame(8388609, struct.pack(">Q", offset) + record))
+        frames.append(make_frame(8388612, struct.pack(">Q", offset)))
+    frames.append(make_frame(8388613, struct.pack(">QQI", offset, offset, 206)))
+    return b"".join(frames)
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        for i in range(0, len(self.data), self.chunk_size):
+            yield self.data[i : i + self.chunk_size]
+
+
+async def make_response(body, chunk_size=7):
+    async def co():
+        return httpx.Response(206, stream=ChunkedStream(body, chunk_size))
+
+    return await http.AwaitResponse(co)
+
+
+async def make_adapter(body, chunk_size=7):
+    return AsyncSelectResponseAdapter(await make_response(body, chunk_size), enable_crc=True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+async def test_read_frames(chunk_size):
+    records = [b"a,b,c\n", b"1,2,3\n" * 100, b"x"]
+    adapter = await make_adapter(make_body(records), chunk_size)
+    assert await adapter.read() == b"".join(records)
+    assert adapter.file_offset == sum(len(r) for r in records)
+    assert await adapter.read() == b""
+
+
+@pytest.mark.asyncio
+async def test_meta_end_frame():
+    payload = struct.pack(">QQIIQI", 10, 10, 200, 3, 42, 5)
+    adapter = await make_adapter(make_frame(8388614, payload))
+    assert await adapter.read() == b""
+    assert (adapter.splits, adapter.rows, adapter.columns) == (3, 42, 5)
+
+
+@pytest.mark.asyncio
+async def test_end_frame_error():
+    payload = struct.pack(">QQI", 0, 0, 400) + b"InvalidSql.bad sql"
+    adapter = await make_adapter(make_frame(8388613, payload))
+    with pytest.raises(SelectOperationFailed) as e:
+        await adapter.read()
+    assert e.value.code == b"InvalidSql"
+
+
+@pytest.mark.asyncio
+async def test_bad_checksum():
+    body = bytearray(make_body([b"hello"]))
+    body[22] ^= 1
+    adapter = await make_adapter(bytes(body))
+    with pytest.raises(InconsistentError):
+        await adapter.read()
+
+
+@pytest.mark.asyncio
+async def test_truncated_response():
+    adapter = await make_adapter(make_body([b"hello"])[:-3])
+    with pytest.raises(SelectOperationClientError):
+        await adapter.read()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_size", [1, 10, 1024])
+async def test_csv_records(batch_size):
+    records = [b"a,b\n1,", b'"x\ny",3\n', b'4,""""\n5,6']
+    resp = await make_response(make_body(records))
+    result = SelectObjectResult(resp, crc_enabled=True)
+    rows = [row async for row in result.records(batch_size=batch_size)]
+    assert rows == [["a", "b"], ["1", "x\ny", "3"], ["4", '"'], ["5", "6"]]
+
+
+@pytest.mark.asyncio
+async def test_json_records():
+    records = [b'{"a": 1}\n{"a"', b': "x\\ny"}\n\n{"a": [2]}\n']
+    resp = await make_response(make_body(records))
+    result = SelectObjectResult(resp, select_params={"Json_Type": "LINES"})
+    rows = [row async for row in result.records(batch_size=4, executor_threshold=1)]
+    assert rows == [{"a": 1}, {"a": "x\ny"}, {"a": [2]}]
+
+
+def test_record_parser_custom_delimiters():
+    parser = SelectRecordParser({"OutputRecordDelimiter": ";", "OutputFieldDelimiter": "|"})
+    assert parser.cut(b"a|b;c|") == b"a|b;"
+    assert parser.cut(b"d;e", final=True) == b"c|d;e"
+    assert parser.parse(b"a|b;c|d;e") == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def make_csv_body(rows, header=None):
+    lines = [",".join(map(str, row)) + "\n" for row in ([header] if header else []) + rows]
+    text = "".join(lines).encode("utf-8")
+    return make_body([text[i : i + 10] for i in range(0, len(text), 10)])
+
+
+@pytest.mark.asyncio
+async def test_python_batches():
+    rows = [[i, i / 2, "s{0}".format(i)] for i in range(25)]
+    resp = await make_response(make_csv_body(rows, header=["a", "b", "c"]))
+    result = SelectObjectResult(resp, select_params={"OutputHeader": True})
+    batches = [b async for b in result.batches(batch_rows=10, output="python", batch_size=16)]
+
+    assert [len(b["a"]) for b in batches] == [10, 10, 5]
+    assert batches[1] == {
+        "a": list(range(10, 20)),
+        "b": [i / 2 for i in range(10, 20)],
+        "c": ["s{0}".format(i) for i in range(10, 20)],
+    }
+
+
+@pytest.mark.asyncio
+async def test_numpy_batches():
+    numpy = pytest.importorskip("numpy")
+    rows = [[i, i / 2, "s{0}".format(i)] for i in range(25)]
+    resp = await make_response(make_csv_body(rows))
+    result = SelectObjectResult(resp)
+    batches = [b async for b in result.batches(batch_rows=10, output="numpy", batch_size=16)]
+
+    assert [len(b["_1"]) for b in batches] == [10, 10, 5]
+    assert batches[2]["_1"].dtype == numpy.int64
+    assert batches[2]["_2"].tolist() == [i / 2 for i in range(20, 25)]
+    assert batches[2]["_3"].tolist() == ["s{0}".format(i) for i in range(20, 25)]
+
+
+@pytest.mark.asyncio
+async def test_arrow_batches():
+    pyarrow = pytest.importorskip("pyarrow")
+    rows = [[i, i / 2, "s{0}".format(i)] for i in range(25)]
+    resp = await make_response(make_csv_body(rows, header=["a", "b", "c"]))
+    result = SelectObjectResult(resp, select_params={"OutputHeader": "true"})
+    batches = [b async for b in result.batches(batch_rows=10, output="arrow", batch_size=16)]
+
+    assert [b.num_rows for b in batches] == [10, 10, 5]
+    assert batches[0].schema.types == [pyarrow.int64(), pyarrow.float64(), pyarrow.string()]
+    assert pyarrow.concat_tables(batches).column("a").to_pylist() == list(range(25))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("output", ["numpy", "python"])
+async def test_batch_types_fixed(output):
+    if output == "numpy":
+        pytest.importorskip("numpy")
+    rows = [[i, "" if i == 3 else i * 2, "x" if i < 10 else 1] for i in range(25)]
+    resp = await make_response(make_csv_body(rows))
+    result = SelectObjectResult(resp)
+    batches = [b async for b in result.batches(batch_rows=10, output=output, batch_size=16)]
+
+    columns = {name: [v for b in batches for v in list(b[name])] for name in ("_1", "_2", "_3")}
+    assert columns["_1"] == list(range(25))
+    assert columns["_3"] == ["x"] * 10 + ["1"] * 15
+    if output == "numpy":
+        assert [b["_2"].dtype.kind for b in batches] == ["f", "f", "f"]
+        assert [b["_3"].dtype.kind for b in batches] == ["U", "U", "U"]
+        assert str(columns["_2"][3]) == "nan"
+    else:
+        assert columns["_2"][3] is None
+        assert [type(v) for v in columns["_2"][10:]] == [int] * 15
+
+
+@pytest.mark.asyncio
+async def test_numpy_batches_quoted():
+    pytest.importorskip("numpy")
+    text = b'1,"a,b"\n2,"c\nd"\n3,e\n'
+    resp = await make_response(make_body([text]))
+    result = SelectObjectResult(resp)
+    batches = [b async for b in result.batches(output="numpy")]
+    assert batches[0]["_1"].tolist() == [1, 2, 3]
+    assert batches[0]["_2"].tolist() == ["a,b", "c\nd", "e"]
+
+
+@pytest.mark.asyncio
+async def test_numpy_batches_empty_int():
+    pytest.importorskip("numpy")
+    rows = [[i if i < 20 else ""] for i in range(25)]
+    resp = await make_response(make_csv_body(rows))
+    result = SelectObjectResult(resp)
+    with pytest.raises(ClientError):
+        async for _ in result.batches(batch_rows=10, output="numpy", batch_size=16):
+            pass
+
+
+def test_numpy_parse_ragged():
+    pytest.importorskip("numpy")
+    with pytest.raises(ClientError):
+        SelectColumnParser({}, output="numpy").parse(b"1,2,3\n4\n")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("output", ["numpy", "python"])
+async def test_batches_ragged(output):
+    if output == "numpy":
+        pytest.importorskip("numpy")
+    for rows in ([[1, 2, 3], [4]], [[1, 2]] * 12 + [[3]] + [[4, 5]] * 12):
+        resp = await make_response(make_csv_body(rows))
+        result = SelectObjectResult(resp)
+        with pytest.raises(ClientError):
+            async for _ in result.batches(batch_rows=10, output=output, batch_size=16):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_select_parallel_json_document():
+    stream = select_object_parallel(
+        None, "key", "select * from ossobject", {"Json_Type": "DOCUMENT"}
+    )
+    with pytest.raises(ClientError):
+        await stream.__anext__()
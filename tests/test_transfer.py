@@ -0,0 +1,309 @@
+import asyncio
+import os
+import re
+import shutil
+
+import httpx
+import pytest
+from oss2 import Auth
+from oss2.exceptions import ClientError
+
+from ossx import AsyncBucket
+from ossx import _http as http
+from ossx.iterators import ObjectIteratorV2
+
+from .common import bucket, delete_keys, random_bytes, random_key, random_string
+
+
+def make_tree(root, files):
+    for rel_path, content in files.items():
+        filename = os.path.join(root, *rel_path.split("/"))
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "wb") as f:
+            f.write(content)
+
+
+@pytest.mark.asyncio
+async def test_upload_directory(bucket: AsyncBucket):
+    local_dir = "tests/mock_data/upload_directory"
+    files = {
+        "a.txt": random_bytes(10),
+        "b/c.txt": random_bytes(100),
+        "b/d/e.bin": random_bytes(300 * 1024),
+        "f/g.txt": b"",
+    }
+    make_tree(local_dir, files)
+
+    prefix = random_key(suffix="/")
+    results = [
+        r
+        async for r in bucket.upload_directory(
+            local_dir, prefix, multipart_threshold=200 * 1024, part_size=100 * 1024, num_threads=2
+        )
+    ]
+    assert all(r.ok for r in results)
+    assert sorted(r.key for r in results) == sorted(prefix + k for k in files)
+    for rel_path, content in files.items():
+        obj = await bucket.get_object(prefix + rel_path)
+        assert await obj.read() == content
+
+    await delete_keys(bucket, [prefix + k for k in files])
+    shutil.rmtree(local_dir)
+
+
+@pytest.mark.asyncio
+async def test_upload_directory_break(bucket: AsyncBucket):
+    local_dir = "tests/mock_data/upload_directory_break"
+    files = {"{0}.txt".format(random_string(8)): random_bytes(10) for _ in range(20)}
+    make_tree(local_dir, files)
+
+    prefix = random_key(suffix="/")
+    async for r in bucket.upload_directory(local_dir, prefix, num_threads=2):
+        assert r.ok
+        break
+
+    await delete_keys(bucket, [prefix + k for k in files])
+    shutil.rmtree(local_dir)
+
+
+@pytest.mark.asyncio
+async def test_download_directory(bucket: AsyncBucket):
+    prefix = random_key(suffix="/")
+    files = {
+        "a.txt": random_bytes(10),
+        "b/c.txt": random_bytes(100),
+        "b/d/e.bin": random_bytes(300 * 1024),
+    }
+    for rel_path, content in files.items():
+        await bucket.put_object(prefix + rel_path, content)
+    await bucket.put_object(prefix + "f/", b"")
+
+    local_dir = "tests/mock_data/download_directory"
+    results = [
+        r
+        async for r in bucket.download_directory(
+            prefix, local_dir, multiget_threshold=200 * 1024, part_size=100 * 1024, num_threads=2
+        )
+    ]
+    assert all(r.ok and not r.skipped for r in results)
+    assert sorted(r.key for r in results) == sorted(prefix + k for k in files)
+    assert os.path.isdir(os.path.join(local_dir, "f"))
+    for rel_path, content in files.items():
+        with open(os.path.join(local_dir, *rel_path.split("/")), "rb") as f:
+            assert f.read() == content
+
+    results = [r async for r in bucket.download_directory(prefix, local_dir)]
+    assert all(r.ok and r.skipped for r in results)
+
+    filename = os.path.join(local_dir, "a.txt")
+    os.utime(filename, (0, 0))
+    results = [r async for r in bucket.download_directory(prefix, local_dir, check_crc=True)]
+    assert all(r.ok and r.skipped for r in results)
+    assert int(os.path.getmtime(filename)) != 0
+
+    with open(filename, "wb") as f:
+        f.write(random_bytes(10))
+    os.utime(filename, (0, 0))
+    results = [r async for r in bucket.download_directory(prefix, local_dir, check_crc=True)]
+    assert [r.key for r in results if not r.skipped] == [prefix + "a.txt"]
+    with open(filename, "rb") as f:
+        assert f.read() == files["a.txt"]
+
+    await delete_keys(bucket, [prefix + k for k in files] + [prefix + "f/"])
+    shutil.rmtree(local_dir)
+
+
+@pytest.mark.asyncio
+async def test_delete_prefix(bucket: AsyncBucket):
+    prefix = random_key(suffix="/")
+    keys = [prefix + "{0:04d}".format(i) for i in range(1234)]
+    for i in range(0, len(keys), 100):
+        await asyncio.gather(*[bucket.put_object(key, b"") for key in keys[i : i + 100]])
+
+    assert await bucket.delete_prefix(prefix, num_threads=2) == len(keys)
+    assert [obj async for obj in ObjectIteratorV2(bucket, prefix=prefix)] == []
+    assert await bucket.delete_prefix(prefix) == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_directory(bucket: AsyncBucket):
+    local_dir = "tests/mock_data/sync_directory"
+    files = {
+        "a.txt": random_bytes(10),
+        "b/c.txt": random_bytes(100),
+        "b/d/e.bin": random_bytes(300 * 1024),
+    }
+    make_tree(local_dir, files)
+    prefix = random_key(suffix="/")
+    await bucket.put_object(prefix + "extra.txt", b"extra")
+
+    actions = [a async for a in bucket.sync_directory(local_dir, prefix, delete=True, dry_run=True)]
+    assert sorted((a.action, a.key, a.reason) for a in actions) == sorted(
+        [("upload", prefix + k, "missing") for k in files]
+        + [("delete_remote", prefix + "extra.txt", "extra")]
+    )
+    obj = await bucket.head_object(prefix + "extra.txt")
+    assert obj.content_length == 5
+
+    results = [r async for r in bucket.sync_directory(local_dir, prefix, delete=True)]
+    assert all(r.ok for r in results)
+    assert len(results) == 4
+    assert not await bucket.object_exists(prefix + "extra.txt")
+    assert [r async for r in bucket.sync_directory(local_dir, prefix, delete=True)] == []
+
+    filename = os.path.join(local_dir, "a.txt")
+    os.utime(filename, (0, 0))
+    results = [r async for r in bucket.sync_directory(local_dir, prefix, check_crc=True)]
+    assert results == []
+    with open(filename, "wb") as f:
+        f.write(random_bytes(10))
+    results = [r async for r in bucket.sync_directory(local_dir, prefix, check_crc=True)]
+    assert [(r.key, r.action.reason) for r in results] == [(prefix + "a.txt", "crc")]
+
+    shutil.rmtree(local_dir)
+    download_dir = "tests/mock_data/sync_directory_download"
+    make_tree(download_dir, {"stale.txt": b"stale"})
+    results = [
+        r
+        async for r in bucket.sync_directory(
+            download_dir, prefix, direction="download", delete=True
+        )
+    ]
+    assert all(r.ok for r in results)
+    assert sorted((r.action.action, r.key) for r in results) == sorted(
+        [("download", prefix + k) for k in files] + [("delete_local", prefix + "stale.txt")]
+    )
+    assert not os.path.exists(os.path.join(download_dir, "stale.txt"))
+    assert [
+        r async for r in bucket.sync_directory(download_dir, prefix, direction="download")
+    ] == []
+
+    await delete_keys(bucket, [prefix + k for k in files])
+    shutil.rmtree(download_dir)
+
+
+def make_listing_bucket(keys, handler=None):
+    def dispatch(request):
+        if request.url.params.get("list-type") != "2":
+            if handler is not None:
+                return handler(request)
+            return httpx.Response(200, content=b"data", headers={"ETag": '"etag"'})
+
+        contents = "".join(
+            "<Contents><Key>{0}</Key><LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+            '<ETag>"etag"</ETag><Type>Normal</Type><Size>4</Size>'
+            "<StorageClass>Standard</StorageClass></Contents>".format(key)
+            for key in keys
+        )
+        body = (
+            "<ListBucketResult><Name>bucket</Name><Prefix></Prefix><MaxKeys>1000</MaxKeys>"
+            "<KeyCount>{0}</KeyCount><IsTruncated>false</IsTruncated>{1}</ListBucketResult>"
+        ).format(len(keys), contents)
+        return httpx.Response(200, content=body.encode("utf-8"))
+
+    session = http.Session(adapter=httpx.MockTransport(dispatch))
+    return AsyncBucket(
+        Auth("ak", "sk"), "http://oss-cn-hangzhou.aliyuncs.com", "bucket", session=session
+    )
+
+
+@pytest.mark.asyncio
+async def test_delete_prefix_retry():
+    keys = ["p/{0}".format(i) for i in range(10)]
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection reset", request=request)
+        deleted = re.findall(r"<Key>(.*?)</Key>", request.content.decode("utf-8"))
+        body = "".join("<Deleted><Key>{0}</Key></Deleted>".format(key) for key in deleted)
+        return httpx.Response(200, content="<DeleteResult>{0}</DeleteResult>".format(body).encode())
+
+    bucket = make_listing_bucket(keys, handler)
+    assert await bucket.delete_prefix("p/", max_retries=3) == len(keys)
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_download_directory_traversal():
+    local_dir = "tests/mock_data/download_directory_traversal"
+    keys = ["p/a.txt", "p/../download_directory_traversal.txt", "p/b/../../../traversal.txt"]
+    bucket = make_listing_bucket(keys)
+
+    results = {r.key: r async for r in bucket.download_directory("p/", local_dir)}
+    assert results["p/a.txt"].ok
+    for key in keys[1:]:
+        assert isinstance(results[key].exception, ClientError)
+    assert not os.path.exists("tests/mock_data/download_directory_traversal.txt")
+    assert not os.path.exists("tests/traversal.txt")
+
+    shutil.rmtree(local_dir)
+
+
+@pytest.mark.asyncio
+async def test_sync_directory_traversal():
+    local_dir = "tests/mock_data/sync_directory_traversal"
+    victim = "tests/mock_data/sync_directory_traversal.txt"
+    make_tree(local_dir, {"a.txt": b"data"})
+    with open(victim, "wb") as f:
+        f.write(b"victim")
+
+    keys = ["p/a.txt", "p/../sync_directory_traversal.txt"]
+    bucket = make_listing_bucket(keys)
+    for dry_run in (True, False):
+        results = {
+            r.key: r
+            async for r in bucket.sync_directory(
+                local_dir, "p/", direction="download", delete=True, dry_run=dry_run
+            )
+        }
+        assert isinstance(results[keys[1]].exception, ClientError)
+
+    with open(victim, "rb") as f:
+        assert f.read() == b"victim"
+    assert os.path.exists(os.path.join(local_dir, "a.txt"))
+
+    os.remove(victim)
+    shutil.rmtree(local_dir)
+
+
+@pytest.mark.asyncio
+async def test_upload_directory_concurrency():
+    local_dir = "tests/mock_data/upload_directory_concurrency"
+    make_tree(local_dir, {"{0}.bin".format(i): random_bytes(300 * 1024) for i in range(4)})
+    active = peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+        if request.method == "POST" and "uploads" in request.url.params:
+            return httpx.Response(
+                200,
+                content=b"<InitiateMultipartUploadResult><Bucket>bucket</Bucket><Key>key</Key>"
+                b"<UploadId>upload-id</UploadId></InitiateMultipartUploadResult>",
+            )
+        return httpx.Response(200, headers={"ETag": '"etag"'})
+
+    session = http.Session(adapter=httpx.MockTransport(handler))
+    bucket = AsyncBucket(
+        Auth("ak", "sk"),
+        "http://oss-cn-hangzhou.aliyuncs.com",
+        "bucket",
+        session=session,
+        enable_crc=False,
+    )
+    results = [
+        r
+        async for r in bucket.upload_directory(
+            local_dir, "p/", multipart_threshold=100 * 1024, part_size=100 * 1024, num_threads=2
+        )
+    ]
+    assert all(r.ok for r in results)
+    assert peak == 2
+
+    shutil.rmtree(local_dir)